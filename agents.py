@@ -1,30 +1,54 @@
 import random
-import pygame
 
 from entity import Entity
-from pathFinding import AStar
-
-# CONFIG
-MAX_ENERGY = 5
-ENERGY_REGEN = 0.01
-ENERGY_DRAIN = 0.002
-
+import dstar
+import entity_store
+import flow_field
+import fov
+import hpa
+import path_queue
+import path_service
+import spatial_index
+from grid_search import manhattan
+
+# CONFIG (energy / hunger rates live in entity_store, which updates them for every agent at once)
 BASE_SPEED = 1
 SPRINT_SPEED = 1.2
 
+VISION_RANGE = (5, 7)
+
+# Explore goals farther than this (tiles) are walked over the HPA* cluster graph, refined
+# one segment at a time; nearer ones are planned with D* like a chase
+LONG_RANGE = 2 * hpa.CLUSTER_TILES
+
 # Parent Agent class
-class Agent(Entity):
+class Agent(entity_store.Stored, Entity):
+   # Needs live in the map's EntityStore, advanced by its tick() once per tick for all agents
+   energy = entity_store.Column()
+   hunger = entity_store.Column()
+   recovering = entity_store.Column(bool)
+
    def __init__(self, x, y, image, map_ref):
+      self.bind(map_ref, entity_store.AGENT)
       super().__init__(x, y, image, map_ref)
 
-      self.pathfinder = AStar(map_ref)
+      # Shared, cached pathfinder for everything on this map
+      self.pathfinder = path_service.for_map(map_ref)
+      # Entity index of this map; kept current after every step
+      self.index = spatial_index.for_map(map_ref)
+      self.index.insert(self)
+      # D* Lite search state of the current goal (explore / chase), repaired when terrain changes
+      self.route = None
+      # HPA* route of a long explore walk and the map version its current segment was checked at
+      self.leg = None
+      self.leg_seen = None
 
       # Needs
-      self.energy = random.uniform(2.5, MAX_ENERGY)
+      self.energy = random.uniform(2.5, entity_store.MAX_ENERGY)
       self.hunger = 5
 
       # Perception
-      self.vision = random.randint(5, 7)
+      self.vision = random.randint(*VISION_RANGE)
 
       # State
       self.state = "idle"
@@ -35,32 +59,99 @@ class Agent(Entity):
 
    # Core update func
    def update(self, context):
-      self._update_needs()
-
-      action = self.decide(context)
-      self.execute(action, context)
-
+      # Re-decides only on an event: what it perceives changed, a need crossed a threshold
+      # (flagged by the entity store) or its path ran out; otherwise it keeps its action
+      if self.take_events(context):
+         action = self.decide(context)
+         self.execute(action, context)
+      self.walk()
+
+   def walk(self):
+      # One step of the current path with no decision (the tick scheduler runs just this on
+      # frames an entity skips, so it covers the same ground as a full update)
+      self._repair_route()
       self.move_along_path()
-
-   def _update_needs(self):
-      # Energy
-      if self.recovering:
-         self.energy = min(MAX_ENERGY, self.energy + ENERGY_REGEN)
-
-         if self.energy >= MAX_ENERGY:
-               self.recovering = False
-
-         return
-
-      if self.path:
-         self.energy = max(0, self.energy - ENERGY_DRAIN)
-         self.hunger = max(0, self.hunger - 0.001)
-      else:
-         self.energy = min(MAX_ENERGY, self.energy + ENERGY_REGEN)
-
-      if self.energy <= 0.1:
-         self.recovering = True
-         self.speed = 0
+      if not self.path and self.leg is not None:
+         # Reached a waypoint of a long walk: refine the segment to the next one
+         self.set_path(self._next_leg() or [])
+      self.sync_moving()
+      self.index.move(self)
+
+   # Nearby entities of a kind within vision, from the map's spatial index
+   def nearby(self, kind=None, radius=None):
+      return self.index.query_radius(self.get_tile_pos(), radius or self.vision, kind, exclude=self)
+
+   def nearest(self, kind=None, radius=None):
+      return self.index.nearest(self.get_tile_pos(), kind, radius or self.vision, exclude=self)
+
+   # Routes
+   def travel(self, goal, kind="explore"):
+      # Plans to goal keeping the search state, so later changes only patch it.
+      # Queued behind the map's path scheduler when it has one; the current path is kept meanwhile
+      if not self.map.is_walkable(*goal):
+         return False
+
+      self.leg = None
+      self.route = dstar.for_map(self.map).track(self, self.get_tile_pos(), goal)
+      path_queue.request(self, kind, self._route_path, Agent._set_route_path)
+      return True
+
+   def _route_path(self):
+      if self.route is None:
+         return None
+      self.route.move_to(self.get_tile_pos())
+      return self.route.path()
+
+   def _set_route_path(self, path):
+      self.set_path(path or [])
+
+   def roam(self, goal, kind="explore"):
+      # Long walk planned over the map's HPA* graph; only the first segment is refined now,
+      # each later one when the walker reaches its waypoint
+      if not self.map.is_walkable(*goal):
+         return False
+
+      self.drop_route()
+      path_queue.request(self, kind, lambda: self._plan_leg(goal), Agent._set_route_path)
+      return True
+
+   def _plan_leg(self, goal):
+      self.leg = hpa.for_map(self.map).plan(self.get_tile_pos(), goal)
+      return self._next_leg()
+
+   def _next_leg(self):
+      # Tiles of the walk's next segment; one cut off since planning replans the rest from
+      # here. A finished or unreachable walk is dropped
+      if self.leg is None or self.leg.done():
+         self.leg = None
+         return None
+      seg = self.leg.next_segment()
+      if seg is None:
+         self.leg = hpa.for_map(self.map).plan(self.get_tile_pos(), self.leg.goal)
+         seg = self.leg.next_segment() if self.leg is not None else None
+      self.leg_seen = self.map.version
+      return seg
+
+   def drop_route(self):
+      self.leg = None
+      if self.route is not None:
+         dstar.for_map(self.map).release(self)
+         self.route = None
+      if self.map.path_queue is not None:
+         self.map.path_queue.cancel(self)
+
+   def _repair_route(self):
+      # A tile flipped somewhere this route's search reached
+      if self.route is not None and self.route.dirty and self.path:
+         self.route.move_to(self.get_tile_pos())
+         self.set_path(self.route.path() or [])
+
+      # The terrain changed under a long walk: replan the rest if its segment got blocked
+      elif self.leg is not None and self.path and self.leg_seen != self.map.version:
+         self.leg_seen = self.map.version
+         if not all(self.map.is_walkable(*t) for t in self.path):
+            self.leg = hpa.for_map(self.map).plan(self.get_tile_pos(), self.leg.goal)
+            self.set_path(self._next_leg() or [])
 
    # Decision making function
    def decide(self, context):
@@ -73,7 +164,7 @@ class Agent(Entity):
          return "react"
 
       # 3. Hunger
-      if self.hunger <= 1:
+      if self.hunger <= entity_store.HUNGRY_AT:
          return "hunt"
 
       # 4. Default
@@ -105,20 +196,19 @@ class Agent(Entity):
       pass
 
    def explore(self, context):
-      if self.path:
+      if self.path or path_queue.waiting(self):
          return
 
-      cx, cy = self.get_tile_pos()
-
+      here = self.get_tile_pos()
       for _ in range(5):
          tx = random.randint(0, self.map.cols - 1)
          ty = random.randint(0, self.map.rows - 1)
 
-         if self.map.is_walkable(tx, ty):
-            path = self.pathfinder.find_path((cx, cy), (tx, ty))
-            if path:
-               self.set_path(path)
-               return
+         go = self.roam if manhattan(here, (tx, ty)) > LONG_RANGE else self.travel
+         if go((tx, ty)):
+            return
+
+      self.retry()
 
    def get_speed(self):
       if self.energy < 1:
@@ -133,6 +223,15 @@ class Villager(Agent):
       self.state = "idle"
       self.caught = False
 
+   # A caught villager leaves play: its row stops ticking
+   @property
+   def caught(self):
+      return not self.store.active[self.slot]
+
+   @caught.setter
+   def caught(self, value):
+      self.store.active[self.slot] = not value
+
    def decide(self, context):
       if self.recovering:
          return "rest"
@@ -140,7 +239,7 @@ class Villager(Agent):
       if context.get("enemy_visible"):
          return "flee"
 
-      if self.hunger <= 1:
+      if self.hunger <= entity_store.HUNGRY_AT:
          return "hunt"
 
       return "explore"
@@ -155,18 +254,14 @@ class Villager(Agent):
          super().execute(action, context)
 
    def flee(self, enemy_pos):
-      cx, cy = self.get_tile_pos()
-
-      dx = cx - enemy_pos[0]
-      dy = cy - enemy_pos[1]
-
-      tx = cx + int(dx * 3)
-      ty = cy + int(dy * 3)
+      # Queued at flee priority; solved from wherever the villager is by then
+      self.drop_route()
+      path_queue.request(self, "flee", lambda: self._flee_path(enemy_pos))
 
-      if self.map.is_walkable(tx, ty):
-         path = self.pathfinder.find_path((cx, cy), (tx, ty))
-         if path:
-               self.set_path(path)
+   def _flee_path(self, enemy_pos):
+      # One flee field per enemy tile, shared by every villager running from it
+      field = flow_field.for_map(self.map).away_from(enemy_pos)
+      return field.path_from(*self.get_tile_pos())
 
 # Seeker tries to survive and hunts villagers
 class Seeker(Agent):
@@ -175,6 +270,25 @@ class Seeker(Agent):
 
       self.state = "exploring"
 
+   def update(self, context):
+      # Marks what it sees as explored; fills in the enemy from its own sight when not given.
+      # Villagers it could never walk to (across water) are seen but not chased.
+      hiders = self.look()
+      if hiders:
+         walk, me = dstar.for_map(self.map).walk, self.get_tile_pos()
+         hiders = [h for h in hiders if walk.reachable(me, h)]
+      if "enemy_visible" not in context and hiders:
+         me = self.get_tile_pos()
+         target = min(hiders, key=lambda h: (h[0] - me[0]) ** 2 + (h[1] - me[1]) ** 2)
+         context = {**context, "enemy_visible": True, "enemy_pos": target}
+      super().update(context)
+
+   def look(self):
+      # Tiles of the villagers in line of sight, after marking the seen tiles explored
+      sight = fov.for_map(self.map)
+      self.map.mark_explored(sight.visible(self.get_tile_pos(), self.vision))
+      return [self.index.position(v) for v in sight.visible_entities(self, Villager)]
+
    def decide(self, context):
       if self.recovering:
          return "rest"
@@ -182,7 +296,7 @@ class Seeker(Agent):
       if context.get("enemy_visible"):
          return "chase"
 
-      if self.hunger <= 1:
+      if self.hunger <= entity_store.HUNGRY_AT:
          return "hunt"
 
       return "explore"
@@ -197,8 +311,5 @@ class Seeker(Agent):
          super().execute(action, context)
 
    def chase(self, target_pos):
-      cx, cy = self.get_tile_pos()
-
-      path = self.pathfinder.find_path((cx, cy), target_pos)
-      if path:
-         self.set_path(path)
\ No newline at end of file
+      # The target moves every tick; the tracked route follows it instead of replanning
+      self.travel(tuple(target_pos), "chase")
\ No newline at end of file
@@ -1,26 +1,33 @@
 import random
 
 from entity import Entity
-from pathFinding import AStar
+import entity_store
+import flow_field
+import path_queue
+import path_service
+import spatial_index
 
-# CONFIG
+# CONFIG (stamina rates live in entity_store, which updates them for every animal at once)
 BASE_SPEED = 1
 SPRINT_SPEED = 1.3
 
-MAX_STAMINA = 5
-STAMINA_DRAIN = 0.02
-STAMINA_REGEN = 0.01
-
-
 # Base animal class
-class Animal(Entity):
+class Animal(entity_store.Stored, Entity):
+   # Stamina lives in the map's EntityStore, advanced by its tick() once per tick for all animals
+   stamina = entity_store.Column()
+
    def __init__(self, x, y, image, map_ref):
+      self.bind(map_ref, entity_store.ANIMAL)
       super().__init__(x, y, image, map_ref)
 
-      self.pathfinder = AStar(map_ref)
+      # Shared, cached pathfinder for everything on this map
+      self.pathfinder = path_service.for_map(map_ref)
+      # Entity index of this map; kept current after every step
+      self.index = spatial_index.for_map(map_ref)
+      self.index.insert(self)
 
       # Needs
-      self.stamina = MAX_STAMINA
+      self.stamina = entity_store.MAX_STAMINA
 
       # State
       self.state = "idle"
@@ -31,18 +38,17 @@ class Animal(Entity):
 
    # Main update func
    def update(self, context):
-      self._update_stamina()
-
-      action = self.decide(context)
-      self.execute(action, context)
-
+      # Re-decides only on an event (see Agent.update)
+      if self.take_events(context):
+         action = self.decide(context)
+         self.execute(action, context)
+      self.walk()
+
+   def walk(self):
+      # One step of the current path with no decision (see Agent.walk)
       self.move_along_path()
-
-   def _update_stamina(self):
-      if self.state == "fleeing":
-         self.stamina = max(0, self.stamina - STAMINA_DRAIN)
-      else:
-         self.stamina = min(MAX_STAMINA, self.stamina + STAMINA_REGEN)
+      self.sync_moving()
+      self.index.move(self)
 
    # Decisions
    def decide(self, context):
@@ -51,7 +57,7 @@ class Animal(Entity):
          return "flee"
 
       # 2. Exhaustion
-      if self.stamina <= 0.5:
+      if self.stamina <= entity_store.EXHAUSTED_AT:
          return "rest"
 
       # 3. Default behavior
@@ -76,7 +82,7 @@ class Animal(Entity):
 
    # Behaviors
    def wander(self):
-      if self.path:
+      if self.path or path_queue.waiting(self):
          return
 
       cx, cy = self.get_tile_pos()
@@ -87,30 +93,21 @@ class Animal(Entity):
          ty = cy + random.randint(-3, 3)
 
          if self.map.is_walkable(tx, ty):
-            path = self.pathfinder.find_path((cx, cy), (tx, ty))
-            if path:
-               self.set_path(path)
-               return
+            path_queue.request(self, "wander", goal=(tx, ty))
+            return
 
-   def flee(self, danger_pos):
-      cx, cy = self.get_tile_pos()
-
-      dx = cx - danger_pos[0]
-      dy = cy - danger_pos[1]
+      self.retry()
 
-      # Normalize direction
-      length = max(1, abs(dx) + abs(dy))
-      dx //= length
-      dy //= length
-
-      # Run away multiple tiles
-      tx = cx + dx * random.randint(3, 6)
-      ty = cy + dy * random.randint(3, 6)
-
-      if self.map.is_walkable(tx, ty):
-         path = self.pathfinder.find_path((cx, cy), (tx, ty))
-         if path:
-               self.set_path(path)
+   def flee(self, danger_pos):
+      # Queued at flee priority; the run length is drawn now so the random sequence does
+      # not depend on when the queue gets to it
+      steps = random.randint(3, 6)
+      path_queue.request(self, "flee", lambda: self._flee_path(danger_pos, steps))
+
+   def _flee_path(self, danger_pos, steps):
+      # Run away multiple tiles down the shared flee field of this danger
+      field = flow_field.for_map(self.map).away_from(danger_pos)
+      return field.path_from(*self.get_tile_pos(), max_steps=steps)
 
 class Cow(Animal):
    def __init__(self, x, y, image, map_ref):
@@ -0,0 +1,128 @@
+import os
+from pathlib import Path
+from collections.abc import Mapping, Sequence
+
+# Files counted as images (pygame.image.load would accept them).
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tga", ".webp")
+
+class AssetManager:
+   # Loads images from asset_dir on first use and keeps them, so every Map (and anything
+   # else drawing sprites) shares one decoded, scaled copy per (file, size).
+   # With cache_dir set, scaled pixels are also written there as raw RGBA and read back on
+   # later runs instead of decoding and rescaling the source; entries are keyed by the
+   # source file's mtime, so an edited asset is picked up.
+   # pygame is imported by the first decode, so listing names() works without it.
+   def __init__(self, asset_dir="assets", cache_dir=None):
+      self.asset_dir = Path(asset_dir)
+      self.cache_dir = Path(cache_dir) if cache_dir else None
+      self.images    = {}           # (name, (w, h)) -> Surface
+      self._names    = None
+      self.decoded   = 0            # source images decoded (not served from memory or disk)
+
+   def names(self):
+      # Image file names in asset_dir, sorted; nothing is decoded.
+      if self._names is None:
+         self._names = sorted(f.name for f in self.asset_dir.iterdir()
+                              if f.is_file() and f.suffix.lower() in IMAGE_SUFFIXES)
+      return self._names
+
+   def image(self, name, size):
+      key = (name, (int(size[0]), int(size[1])))
+      surf = self.images.get(key)
+      if surf is None:
+         surf = self.images[key] = self._load(name, key[1])
+      return surf
+
+   # ── loading ───────────────────────────────────────────────────────────────
+   def _cache_file(self, name, size):
+      w, h = size
+      mtime = (self.asset_dir / name).stat().st_mtime_ns
+      return self.cache_dir / f"{Path(name).stem}-{w}x{h}-{mtime}.rgba"
+
+   def _load(self, name, size):
+      import pygame
+      cached = self._cache_file(name, size) if self.cache_dir else None
+      surf = None
+      if cached is not None and cached.exists():
+         try:
+            surf = pygame.image.frombytes(cached.read_bytes(), size, "RGBA")
+         except (ValueError, pygame.error):
+            surf = None
+      if surf is None:
+         surf = pygame.transform.scale(pygame.image.load(str(self.asset_dir / name)), size)
+         self.decoded += 1
+         if cached is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            cached.write_bytes(pygame.image.tobytes(surf, "RGBA"))
+      if pygame.display.get_surface() is not None:
+         surf = surf.convert_alpha()
+      return surf
+
+class SpriteSheet(Mapping):
+   # key -> sprite for a group of files. Nothing is decoded until the first lookup, which
+   # loads the whole group and packs it into its own TextureAtlas.
+   # headless sheets map keys to file names, like the headless tile pools.
+   def __init__(self, manager, files, size, headless=False):
+      self.manager  = manager
+      self.files    = dict(files)       # key -> file name
+      self.size     = size
+      self.headless = headless
+      self.sprites  = None
+
+   def _loaded(self):
+      if self.sprites is None:
+         if self.headless:
+            self.sprites = dict(self.files)
+         else:
+            from atlas import TextureAtlas
+            surfs = [self._image(name) for name in self.files.values()]
+            self.sprites = dict(zip(self.files, TextureAtlas(self.size).pack(surfs)))
+      return self.sprites
+
+   def _image(self, name):
+      # An unreadable file becomes a blank sprite, so a bad asset never crashes the game.
+      s = self.size
+      try:
+         return self.manager.image(name, (s, s))
+      except Exception:
+         import pygame
+         return pygame.Surface((s, s), pygame.SRCALPHA)
+
+   def __getitem__(self, key):
+      return self._loaded()[key]
+
+   def __iter__(self):
+      return iter(self.files)
+
+   def __len__(self):
+      return len(self.files)
+
+class SpritePool(Sequence):
+   # A tile pool: the sprites of a list of files, decoded and packed like a SpriteSheet on
+   # the first lookup. len() needs no decode, so generation can size its picks up front.
+   def __init__(self, manager, files, size, headless=False):
+      self.sheet = SpriteSheet(manager, dict(enumerate(files)), size, headless)
+
+   def __getitem__(self, i):
+      if isinstance(i, slice):
+         return [self[j] for j in range(len(self))[i]]
+      if i < 0:
+         i += len(self)
+      if not 0 <= i < len(self):
+         raise IndexError(i)
+      return self.sheet[i]
+
+   def __len__(self):
+      return len(self.sheet)
+
+_shared = {}
+
+def shared(asset_dir="assets", cache_dir=None):
+   # The process-wide manager of asset_dir; cache_dir turns on its disk cache.
+   key = os.path.abspath(asset_dir)
+   manager = _shared.get(key)
+   if manager is None:
+      manager = _shared[key] = AssetManager(asset_dir, cache_dir)
+   elif cache_dir and manager.cache_dir is None:
+      manager.cache_dir = Path(cache_dir)
+   return manager
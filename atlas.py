@@ -0,0 +1,33 @@
+import pygame
+
+# Sprites per atlas row.
+ATLAS_COLUMNS = 16
+
+class TextureAtlas:
+   # Packs equally sized sprites into one surface, row by row. Each sprite is handed back
+   # as a subsurface of the atlas, so code holding "a surface" keeps working while every
+   # draw of it can be batched as (atlas, dest, region) in a single Surface.blits call.
+   def __init__(self, size, columns=ATLAS_COLUMNS):
+      self.size    = size
+      self.columns = columns
+      self.surface = None
+      self.rects   = []
+
+   def pack(self, sprites):
+      # Returns the subsurfaces standing in for sprites, in the same order.
+      n = len(sprites)
+      rows = max(1, -(-n // self.columns))
+      s = self.size
+      self.surface = pygame.Surface((self.columns * s, rows * s), pygame.SRCALPHA)
+      if pygame.display.get_surface() is not None:
+         self.surface = self.surface.convert_alpha()
+      self.surface.fill((0, 0, 0, 0))
+
+      self.rects = [pygame.Rect(i % self.columns * s, i // self.columns * s, s, s) for i in range(n)]
+      self.surface.blits([(sprite, rect) for sprite, rect in zip(sprites, self.rects)], doreturn=False)
+      return [self.surface.subsurface(rect) for rect in self.rects]
+
+def region(surf):
+   # (source surface, area) to blit surf from: its atlas and rect for packed sprites,
+   # itself and its full rect for anything else.
+   return surf.get_abs_parent(), pygame.Rect(surf.get_abs_offset(), surf.get_size())
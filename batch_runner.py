@@ -0,0 +1,203 @@
+import os
+import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Sweepable constants: name -> (module, attribute, changes the generated map).
+PARAMS = {
+   "ENERGY_DRAIN":         ("entity_store", "ENERGY_DRAIN", False),
+   "ENERGY_REGEN":         ("entity_store", "ENERGY_REGEN", False),
+   "HUNGER_DRAIN":         ("entity_store", "HUNGER_DRAIN", False),
+   "SPRINT_SPEED":         ("agents", "SPRINT_SPEED", False),
+   "VISION_RANGE":         ("agents", "VISION_RANGE", False),
+   "ANIMAL_SPRINT_SPEED":  ("animals", "SPRINT_SPEED", False),
+   "STAMINA_DRAIN":        ("entity_store", "STAMINA_DRAIN", False),
+   "STAMINA_REGEN":        ("entity_store", "STAMINA_REGEN", False),
+   "CATCH_DISTANCE":       ("simulation", "CATCH_DISTANCE", False),
+   "COW_ALERT":            ("simulation", "COW_ALERT", False),
+   "_WATER_T":             ("map_core", "_WATER_T", True),
+   "_SAND_T":              ("map_core", "_SAND_T", True),
+   "_HIGH_T":              ("map_core", "_HIGH_T", True),
+   "_OAK_T":               ("map_core", "_OAK_T", True),
+   "_DARKPINE_T":          ("map_core", "_DARKPINE_T", True),
+}
+# Episodes handed to a worker at once; a task shares one generated map.
+TASK_EPISODES = 16
+
+# ── sweep description ─────────────────────────────────────────────────────────
+#   {"params": {"ENERGY_DRAIN": [0.001, 0.002], "_OAK_T": [0.55, 0.6]},
+#    "seeds": [1, 2, 3] or {"start": 0, "count": 1000},
+#    "rounds": 4,
+#    "sim": {"villagers": 8, "seekers": 1, "cows": 6, "max_steps": 10800}}
+# Every combination of params is played on every seed for `rounds` rounds.
+
+def configs(sweep):
+   params = sweep.get("params", {})
+   unknown = set(params) - set(PARAMS)
+   if unknown:
+      raise ValueError(f"unknown sweep parameters: {sorted(unknown)}")
+   names = sorted(params)
+   for values in itertools.product(*(params[n] for n in names)):
+      yield dict(zip(names, values))
+
+def seeds(sweep):
+   s = sweep.get("seeds", [0])
+   if isinstance(s, dict):
+      return list(range(s.get("start", 0), s.get("start", 0) + s["count"]))
+   return list(s)
+
+def episode_key(config, seed, rnd):
+   return json.dumps([config, seed, rnd], sort_keys=True)
+
+def plan(sweep, done=()):
+   # Tasks of (map config, seed, [(agent config, [rounds])]) for every episode not in done.
+   # Episodes sharing map-affecting values and a seed are grouped so the map is built once.
+   done = set(done)
+   groups = {}
+   for config in configs(sweep):
+      map_cfg = {k: v for k, v in config.items() if PARAMS[k][2]}
+      agent_cfg = {k: v for k, v in config.items() if not PARAMS[k][2]}
+      for seed in seeds(sweep):
+         rounds = [r for r in range(sweep.get("rounds", 1)) if episode_key(config, seed, r) not in done]
+         if rounds:
+            key = (json.dumps(map_cfg, sort_keys=True), seed)
+            groups.setdefault(key, (map_cfg, seed, []))[2].append((agent_cfg, rounds))
+
+   tasks = []
+   for map_cfg, seed, work in groups.values():
+      batch, size = [], 0
+      for agent_cfg, rounds in work:
+         for i in range(0, len(rounds), TASK_EPISODES):
+            part = rounds[i:i + TASK_EPISODES]
+            if size + len(part) > TASK_EPISODES and batch:
+               tasks.append((map_cfg, seed, batch))
+               batch, size = [], 0
+            batch.append((agent_cfg, part))
+            size += len(part)
+      if batch:
+         tasks.append((map_cfg, seed, batch))
+   return tasks
+
+# ── worker side ───────────────────────────────────────────────────────────────
+_defaults = None
+_sim = (None, None)     # (map key, Simulation) kept by each worker between tasks
+
+def _apply(config):
+   # Sets every sweepable constant: the given value or the module's original default.
+   global _defaults
+   import importlib
+   mods = {name: importlib.import_module(mod) for name, (mod, _, _) in PARAMS.items()}
+   if _defaults is None:
+      _defaults = {name: getattr(mods[name], attr) for name, (_, attr, _) in PARAMS.items()}
+   for name, (_, attr, _) in PARAMS.items():
+      value = config.get(name, _defaults[name])
+      setattr(mods[name], attr, tuple(value) if isinstance(value, list) else value)
+
+def run_task(task, sim_kwargs):
+   # Plays every (agent config, round) of the task on one map; the worker keeps that
+   # map for its next task when the map config, seed and sim settings match.
+   global _sim
+   from simulation import Simulation
+
+   map_cfg, seed, work = task
+   key = json.dumps([map_cfg, seed, sim_kwargs], sort_keys=True)
+   if _sim[0] != key:
+      _apply(map_cfg)
+      _sim = (key, Simulation(seed=seed, **sim_kwargs))
+   sim = _sim[1]
+   out = []
+   for agent_cfg, rounds in work:
+      _apply({**map_cfg, **agent_cfg})
+      for r in rounds:
+         sim.round = r
+         res = sim.run_round()
+         out.append({
+            "key": episode_key({**map_cfg, **agent_cfg}, seed, r),
+            "config": {**map_cfg, **agent_cfg},
+            "seed": seed,
+            "round": r,
+            "catch_time": sum(res["catch_times"]) / len(res["catch_times"]) if res["catch_times"] else None,
+            "first_catch": res["first_catch"],
+            "survival_rate": res["survival_rate"],
+            "distance": res["distance"],
+            "steps": res["steps"],
+         })
+   return out
+
+# ── driver ────────────────────────────────────────────────────────────────────
+def _finished(path):
+   # Keys of episodes already in the results file; a torn last line is ignored.
+   done = set()
+   if os.path.exists(path):
+      with open(path) as f:
+         for line in f:
+            try:
+               done.add(json.loads(line)["key"])
+            except (ValueError, KeyError):
+               continue
+   return done
+
+def run(sweep, results_path, workers=None):
+   # Plays every episode of the sweep not yet in results_path, appending one JSON line
+   # per episode as tasks finish; rerunning after an interruption picks up where it stopped.
+   tasks = plan(sweep, _finished(results_path))
+   sim_kwargs = sweep.get("sim", {})
+   written = 0
+   with open(results_path, "a+") as out, ProcessPoolExecutor(workers) as pool:
+      if out.tell():
+         # Close off a line torn by an interruption so the next row starts clean.
+         out.seek(out.tell() - 1)
+         if out.read(1) != "\n":
+            out.write("\n")
+      futures = [pool.submit(run_task, task, sim_kwargs) for task in tasks]
+      for fut in as_completed(futures):
+         for row in fut.result():
+            out.write(json.dumps(row) + "\n")
+            written += 1
+         out.flush()
+   return written
+
+def summarize(results_path):
+   # Mean metrics per config: catch time, survival rate, distance travelled.
+   acc = {}
+   with open(results_path) as f:
+      for line in f:
+         try:
+            row = json.loads(line)
+         except ValueError:
+            continue
+         a = acc.setdefault(json.dumps(row["config"], sort_keys=True),
+                            {"episodes": 0, "catch_time": [], "survival_rate": 0.0, "distance": 0})
+         a["episodes"] += 1
+         a["survival_rate"] += row["survival_rate"]
+         a["distance"] += sum(row["distance"].values())
+         if row["catch_time"] is not None:
+            a["catch_time"].append(row["catch_time"])
+
+   out = []
+   for cfg, a in acc.items():
+      n = a["episodes"]
+      out.append({
+         "config": json.loads(cfg),
+         "episodes": n,
+         "catch_time": sum(a["catch_time"]) / len(a["catch_time"]) if a["catch_time"] else None,
+         "survival_rate": a["survival_rate"] / n,
+         "distance": a["distance"] / n,
+      })
+   return out
+
+if __name__ == "__main__":
+   import argparse
+
+   parser = argparse.ArgumentParser(description="Run a parameter sweep of headless episodes.")
+   parser.add_argument("sweep", help="sweep description (JSON)")
+   parser.add_argument("results", help="JSON-lines results file; appended to and resumed from")
+   parser.add_argument("--workers", type=int, default=None)
+   parser.add_argument("--summary", action="store_true", help="print per-config means and exit")
+   args = parser.parse_args()
+
+   if not args.summary:
+      with open(args.sweep) as f:
+         print(f"{run(json.load(f), args.results, args.workers)} episodes written")
+   for row in summarize(args.results):
+      print(json.dumps(row))
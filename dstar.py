@@ -0,0 +1,195 @@
+import heapq
+
+from grid_search import WalkGrid
+
+INF = float("inf")
+# Tiles a moving goal may drift past the planner's root before the search is re-rooted.
+MAX_TAIL = 8
+
+class DStarLite:
+   # D* Lite for one agent: searches backwards from the goal and keeps its g / rhs values,
+   # so the agent walking (move_to) or a tile flipping walkability (tile_changed) only
+   # repairs the states whose distance actually changed.
+   # A goal that drifts a few tiles (a chased villager) is followed by extending a short
+   # tail past the root instead of searching again; past MAX_TAIL the search re-roots.
+   # Works on WalkGrid flat indices; path() returns tiles for Entity.set_path.
+   def __init__(self, walk, start, goal):
+      self.walk = walk
+      self.rebuilds = walk.rebuilds
+      self._root(walk.index(*start), walk.index(*goal))
+
+   def _root(self, start, goal):
+      self.start = self.last = start
+      self.goal  = goal
+      self.tail  = []             # flat indices appended after goal
+      self.km    = 0
+      self.g     = {}
+      self.rhs   = {goal: 0}
+      self.open  = {}             # index -> current key
+      self.heap  = []
+      self.dirty = True           # path has to be re-extracted
+      self._push(goal)
+
+   # ── priority queue ────────────────────────────────────────────────────────
+   def _key(self, u):
+      m = min(self.g.get(u, INF), self.rhs.get(u, INF))
+      return (m + self.walk.distance(self.start, u) + self.km, m)
+
+   def _push(self, u):
+      k = self.open[u] = self._key(u)
+      heapq.heappush(self.heap, (k, u))
+
+   def _top(self):
+      heap, open_ = self.heap, self.open
+      while heap:
+         k, u = heap[0]
+         if open_.get(u) == k:
+            return k, u
+         heapq.heappop(heap)
+      return (INF, INF), None
+
+   def _neighbours(self, u):
+      s = self.walk.stride
+      return (u - s, u + s, u - 1, u + 1)
+
+   def _update(self, u):
+      g, grid = self.g, self.walk.grid
+      if u != self.goal:
+         best = INF
+         for v in self._neighbours(u):
+            if grid[v]:
+               best = min(best, g.get(v, INF) + 1)
+         self.rhs[u] = best
+      self.open.pop(u, None)
+      if g.get(u, INF) != self.rhs.get(u, INF):
+         self._push(u)
+
+   def compute(self):
+      g, rhs, grid = self.g, self.rhs, self.walk.grid
+      while True:
+         k_old, u = self._top()
+         start = self.start
+         if u is None or not (k_old < self._key(start) or rhs.get(start, INF) != g.get(start, INF)):
+            return
+         heapq.heappop(self.heap)
+         del self.open[u]
+         k_new = self._key(u)
+         if k_old < k_new:
+            self._push(u)
+         elif g.get(u, INF) > rhs.get(u, INF):
+            g[u] = rhs[u]
+            for p in self._neighbours(u):
+               if grid[p] or p == start:
+                  self._update(p)
+         else:
+            g[u] = INF
+            self._update(u)
+            for p in self._neighbours(u):
+               if grid[p] or p == start:
+                  self._update(p)
+
+   # ── changes ───────────────────────────────────────────────────────────────
+   def move_to(self, start):
+      i = self.walk.index(*start)
+      if i != self.start:
+         self.km += self.walk.distance(self.last, i)
+         self.start = self.last = i
+         self.dirty = True
+
+   def retarget(self, goal):
+      i = self.walk.index(*goal)
+      end = self.tail[-1] if self.tail else self.goal
+      if i == end:
+         return
+      if i == self.goal:
+         self.tail = []
+      elif i in self.tail:
+         del self.tail[self.tail.index(i) + 1:]
+      elif self.walk.distance(end, i) == 1 and self.walk.grid[i] and len(self.tail) < MAX_TAIL:
+         self.tail.append(i)
+      else:
+         self._root(self.start, i)
+      self.dirty = True
+
+   def touches(self, i):
+      # Whether a flip of tile i can change anything this search has seen.
+      return i in self.tail or i in self.rhs or any(p in self.rhs for p in self._neighbours(i))
+
+   def tile_changed(self, i):
+      # A flip on the tail, or of the root while the goal has drifted onto the tail,
+      # re-roots the search at the goal; the old root can't be searched from once blocked.
+      if i in self.tail or (i == self.goal and self.tail):
+         self._root(self.start, self.tail[-1])
+         return
+      self.km += self.walk.distance(self.last, self.start)
+      self.last = self.start
+      # Edges into i changed cost: its neighbours' rhs, and its own if it was skipped while blocked.
+      grid = self.walk.grid
+      self._update(i)
+      for p in self._neighbours(i):
+         if grid[p] or p == self.start:
+            self._update(p)
+      self.dirty = True
+
+   # ── queries ───────────────────────────────────────────────────────────────
+   def path(self):
+      # Tiles from start to the (possibly drifted) goal, or None when unreachable.
+      self.compute()
+      self.dirty = False
+      g, grid, walk = self.g, self.walk.grid, self.walk
+      # Walked out onto the tail: the rest of it leads to the goal, whatever g says
+      # about a start the search never had to reach
+      if self.start in self.tail:
+         return [walk.tile(i) for i in self.tail[self.tail.index(self.start) + 1:]]
+      u = self.start
+      if g.get(u, INF) == INF:
+         return None
+      out = []
+      while u != self.goal:
+         best, bg = None, INF
+         for v in self._neighbours(u):
+            if grid[v] and g.get(v, INF) < bg:
+               best, bg = v, g[v]
+         if best is None or len(out) > len(g):
+            return None
+         u = best
+         out.append(walk.tile(u))
+      out += [walk.tile(i) for i in self.tail]
+      return out
+
+class Replanner:
+   # Per-map registry of D* Lite planners, one per agent that asked for a tracked route.
+   # The map's walk_listeners tell it which tiles flipped; only planners whose search
+   # reached that tile are repaired (and flagged dirty so their owner re-reads the path).
+   def __init__(self, map_ref):
+      self.map      = map_ref
+      self.walk     = WalkGrid(map_ref)
+      self.planners = {}          # owner -> DStarLite
+      map_ref.walk_listeners.append(self.walk_changed)
+
+   def walk_changed(self, x, y, walkable):
+      self.walk.sync()
+      i = self.walk.index(x, y)
+      for planner in self.planners.values():
+         if planner.rebuilds == self.walk.rebuilds and planner.touches(i):
+            planner.tile_changed(i)
+
+   def track(self, owner, start, goal):
+      # The owner's planner, moved to start and pointed at goal.
+      self.walk.sync()
+      planner = self.planners.get(owner)
+      if planner is None or planner.rebuilds != self.walk.rebuilds:
+         planner = self.planners[owner] = DStarLite(self.walk, start, goal)
+      else:
+         planner.move_to(start)
+         planner.retarget(goal)
+      return planner
+
+   def release(self, owner):
+      self.planners.pop(owner, None)
+
+def for_map(map_ref):
+   # The map's shared Replanner, created on first use.
+   if map_ref.replanner is None:
+      map_ref.replanner = Replanner(map_ref)
+   return map_ref.replanner
@@ -0,0 +1,53 @@
+import math
+
+# Base of everything that walks the map (agents, animals). Pure logic: pygame is only
+# imported by draw(), so headless simulations never load it.
+class Entity:
+   # Pixel position (x, y) of the top-left corner, the tiles still to walk (path) and the
+   # pixels covered per step (speed). A path never contains the tile the entity stands on.
+   def __init__(self, x, y, image, map_ref):
+      self.x     = x
+      self.y     = y
+      self.image = image
+      self.map   = map_ref
+      self.path  = []
+      self.speed = 1
+
+      # (zoom, surface) of the last scaled sprite
+      self._scaled = None
+
+   def get_tile_pos(self):
+      # Tile under the entity's centre.
+      ts = self.map.tile_size
+      return (int((self.x + ts / 2) // ts), int((self.y + ts / 2) // ts))
+
+   def set_path(self, path):
+      self.path = list(path)
+
+   def move_along_path(self):
+      # One step of `speed` pixels toward the next tile; the tile is popped on arrival.
+      if not self.path or self.speed <= 0:
+         return
+      ts = self.map.tile_size
+      tx, ty = self.path[0][0] * ts, self.path[0][1] * ts
+      dx, dy = tx - self.x, ty - self.y
+      dist = math.hypot(dx, dy)
+      if dist <= self.speed:
+         self.x, self.y = tx, ty
+         self.path.pop(0)
+      else:
+         self.x += dx / dist * self.speed
+         self.y += dy / dist * self.speed
+
+   # ── drawing ───────────────────────────────────────────────────────────────
+   def draw(self, screen, camera, zoom=1.0):
+      if self.image is None:
+         return
+      image = self.image
+      if zoom != 1.0:
+         if self._scaled is None or self._scaled[0] != zoom:
+            import pygame
+            size = math.ceil(self.map.tile_size * zoom)
+            self._scaled = (zoom, pygame.transform.scale(image, (size, size)))
+         image = self._scaled[1]
+      screen.blit(image, (int(self.x * zoom - camera.x), int(self.y * zoom - camera.y)))
@@ -0,0 +1,202 @@
+import numpy as np
+
+# Needs of agents (villagers / seekers)
+MAX_ENERGY = 5
+ENERGY_REGEN = 0.01
+ENERGY_DRAIN = 0.002
+HUNGER_DRAIN = 0.001
+# An agent at or below this energy stops to recover until it is full again
+RECOVER_AT = 0.1
+# An agent at or below this hunger goes hunting
+HUNGRY_AT = 1
+
+# Stamina of animals
+MAX_STAMINA = 5
+STAMINA_DRAIN = 0.02
+STAMINA_REGEN = 0.01
+# An animal at or below this stamina rests
+EXHAUSTED_AT = 0.5
+
+# Rows reserved up front; the arrays double when full.
+INITIAL_CAPACITY = 256
+
+# Kinds of rows; tick() applies needs to agents and stamina to animals.
+AGENT, ANIMAL = 0, 1
+
+# Event bits: what happened since an entity last decided. It re-decides only when one is set.
+PERCEIVED = 1      # its update context changed (enemy / danger seen, lost or moved)
+THRESHOLD = 2      # a need crossed a decision threshold in tick()
+PATH_DONE = 4      # its path ran out, or a request for one came back empty
+ALL_EVENTS = PERCEIVED | THRESHOLD | PATH_DONE
+
+# State names <-> codes in the state column; new names get the next code.
+STATES = ["idle", "resting", "hunting", "reacting", "exploring", "fleeing", "chasing", "wandering"]
+STATE_CODES = {name: code for code, name in enumerate(STATES)}
+
+def state_code(name):
+   code = STATE_CODES.get(name)
+   if code is None:
+      code = STATE_CODES[name] = len(STATES)
+      STATES.append(name)
+   return code
+
+# Column name -> dtype
+COLUMNS = {
+   "x":          np.float64,
+   "y":          np.float64,
+   "speed":      np.float64,
+   "energy":     np.float64,
+   "hunger":     np.float64,
+   "stamina":    np.float64,
+   "state":      np.int16,
+   "recovering": np.bool_,
+   "moving":     np.bool_,     # has a path; refreshed after each move and on set_path
+   "active":     np.bool_,     # false once removed from play (a caught villager)
+   "events":     np.uint8,     # pending event bits
+   "kind":       np.int8,
+}
+
+class EntityStore:
+   # Struct of arrays holding the per-entity numbers of every entity on a map, one row
+   # each. Entities are handles (see Stored) whose attributes read and write their row.
+   # tick() advances energy / hunger / recovery of all agents and stamina of all animals
+   # in a handful of array operations, so the per-tick cost of needs no longer grows with
+   # Python work per entity, and flags THRESHOLD on the rows whose needs crossed one of the
+   # levels decide() looks at. Call it once per tick, before the entities' update().
+   def __init__(self, capacity=INITIAL_CAPACITY):
+      self.size = 0
+      self.capacity = capacity
+      self.handles = []          # slot -> entity
+      for name, dtype in COLUMNS.items():
+         setattr(self, name, np.zeros(capacity, dtype))
+
+   def __len__(self):
+      return self.size
+
+   def _grow(self):
+      self.capacity *= 2
+      for name in COLUMNS:
+         old = getattr(self, name)
+         new = np.zeros(self.capacity, old.dtype)
+         new[:self.size] = old[:self.size]
+         setattr(self, name, new)
+
+   def add(self, kind, handle=None):
+      # Reserves a row for a new entity and returns its slot.
+      if self.size == self.capacity:
+         self._grow()
+      slot = self.size
+      self.size += 1
+      self.handles.append(handle)
+      self.kind[slot] = kind
+      self.active[slot] = True
+      self.events[slot] = ALL_EVENTS
+      return slot
+
+   # ── per tick ──────────────────────────────────────────────────────────────
+   def tick(self):
+      n = self.size
+      if not n:
+         return
+      active, kind = self.active[:n], self.kind[:n]
+      energy, hunger, stamina = self.energy[:n], self.hunger[:n], self.stamina[:n]
+      recovering, speed, events = self.recovering[:n], self.speed[:n], self.events[:n]
+
+      # Agents: recovering ones refill until full; the rest drain while walking a path
+      # and refill while standing, dropping into recovery when run down.
+      agent = active & (kind == AGENT)
+      resting = agent & recovering
+      walking = agent & ~recovering & self.moving[:n]
+      refill = resting | (agent & ~recovering & ~walking)
+      fed = hunger > HUNGRY_AT
+      np.minimum(energy + ENERGY_REGEN, MAX_ENERGY, out=energy, where=refill)
+      np.maximum(energy - ENERGY_DRAIN, 0, out=energy, where=walking)
+      np.maximum(hunger - HUNGER_DRAIN, 0, out=hunger, where=walking)
+
+      rested = resting & (energy >= MAX_ENERGY)
+      recovering[rested] = False
+      tired = agent & ~resting & (energy <= RECOVER_AT)
+      recovering[tired] = True
+      speed[tired] = 0
+      events[rested | tired | (fed & (hunger <= HUNGRY_AT))] |= THRESHOLD
+
+      # Animals: stamina drains while fleeing, refills otherwise.
+      animal = active & (kind == ANIMAL)
+      fleeing = animal & (self.state[:n] == STATE_CODES["fleeing"])
+      fresh = stamina > EXHAUSTED_AT
+      np.maximum(stamina - STAMINA_DRAIN, 0, out=stamina, where=fleeing)
+      np.minimum(stamina + STAMINA_REGEN, MAX_STAMINA, out=stamina, where=animal & ~fleeing)
+      events[animal & (fresh != (stamina > EXHAUSTED_AT))] |= THRESHOLD
+
+# ── handles ───────────────────────────────────────────────────────────────────
+class Column:
+   # Attribute kept in the owner's row of one store column.
+   def __init__(self, cast=float):
+      self.cast = cast
+
+   def __set_name__(self, owner, name):
+      self.name = name
+
+   def __get__(self, obj, owner=None):
+      if obj is None:
+         return self
+      return self.cast(getattr(obj.store, self.name)[obj.slot])
+
+   def __set__(self, obj, value):
+      getattr(obj.store, self.name)[obj.slot] = value
+
+class StateColumn(Column):
+   # State name stored as its code.
+   def __get__(self, obj, owner=None):
+      if obj is None:
+         return self
+      return STATES[obj.store.state[obj.slot]]
+
+   def __set__(self, obj, value):
+      obj.store.state[obj.slot] = state_code(value)
+
+class Stored:
+   # Mixin placed before Entity: position, speed and state live in the map's EntityStore.
+   # bind() must run before Entity.__init__ assigns x / y.
+   x = Column()
+   y = Column()
+   speed = Column()
+   state = StateColumn()
+
+   def bind(self, map_ref, kind):
+      self.store = for_map(map_ref)
+      self.slot = self.store.add(kind, self)
+      self.percept = None
+
+   def set_path(self, path):
+      super().set_path(path)
+      self.store.moving[self.slot] = bool(self.path)
+      if not self.path:
+         self.store.events[self.slot] |= PATH_DONE
+
+   def sync_moving(self):
+      # After a move: flags PATH_DONE when that step finished the path.
+      moving = bool(self.path)
+      if self.store.moving[self.slot] and not moving:
+         self.store.events[self.slot] |= PATH_DONE
+      self.store.moving[self.slot] = moving
+
+   # ── events ────────────────────────────────────────────────────────────────
+   def retry(self):
+      # Decide again next tick (an action found nothing to do yet).
+      self.store.events[self.slot] |= PATH_DONE
+
+   def take_events(self, context):
+      # Pending event bits, cleared; PERCEIVED is added when context differs from the last one.
+      events = int(self.store.events[self.slot])
+      if context != self.percept:
+         self.percept = context
+         events |= PERCEIVED
+      self.store.events[self.slot] = 0
+      return events
+
+def for_map(map_ref):
+   # The map's shared entity store, created on first use.
+   if map_ref.entity_store is None:
+      map_ref.entity_store = EntityStore()
+   return map_ref.entity_store
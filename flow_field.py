@@ -0,0 +1,124 @@
+import heapq
+from collections import OrderedDict, deque
+
+from grid_search import WalkGrid
+
+# Cached fields per map (goal sets and danger spots together).
+MAX_CACHED_FIELDS = 64
+# Tiles around a danger source covered by a flee field.
+FLEE_RADIUS = 12
+# Flee fields scale the distance from danger by this before relaxing, so fleeing agents
+# prefer open ground over dead ends next to the danger (the classic "Dijkstra map" trick).
+FLEE_FACTOR = 1.2
+
+class FlowField:
+   # Step cost from every reached tile to the field's sources; agents roll downhill.
+   # next_step / path_from are O(1) per tile, so any number of agents can share one field.
+   def __init__(self, walk, cost):
+      self.walk = walk
+      self.cost = cost            # flat WalkGrid index -> cost
+
+   def value(self, x, y):
+      return self.cost.get(self.walk.index(x, y))
+
+   def _down(self, i):
+      cost, s = self.cost, self.walk.stride
+      best, here = None, cost.get(i)
+      if here is None:
+         return None
+      for j in (i - s, i + s, i - 1, i + 1):
+         c = cost.get(j)
+         if c is not None and c < here:
+            best, here = j, c
+      return best
+
+   def next_step(self, x, y):
+      # Neighbour to move to, or None at a source / local minimum / outside the field.
+      j = self._down(self.walk.index(x, y))
+      return self.walk.tile(j) if j is not None else None
+
+   def path_from(self, x, y, max_steps=None):
+      # Tiles followed from (x, y) downhill; a path for Entity.set_path.
+      path = []
+      i = self.walk.index(x, y)
+      while max_steps is None or len(path) < max_steps:
+         i = self._down(i)
+         if i is None:
+            break
+         path.append(self.walk.tile(i))
+      return path
+
+class FlowFields:
+   # Per-map cache of flow fields, dropped when map.version moves.
+   #   toward(goals)        distance field to the nearest of a goal set (BFS)
+   #   away_from(danger)    flee field around one danger tile within FLEE_RADIUS
+   def __init__(self, map_ref, max_entries=MAX_CACHED_FIELDS):
+      self.map         = map_ref
+      self.walk        = WalkGrid(map_ref)
+      self.max_entries = max_entries
+      self.cache       = OrderedDict()
+      self.version     = map_ref.version
+
+   def _cached(self, key, build):
+      if self.version != self.map.version:
+         self.cache.clear()
+         self.version = self.map.version
+      field = self.cache.get(key)
+      if field is None:
+         self.walk.sync()
+         field = self.cache[key] = FlowField(self.walk, build())
+         while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+      else:
+         self.cache.move_to_end(key)
+      return field
+
+   def _bfs(self, sources, limit=None):
+      # Multi-source BFS over walkable tiles (sources themselves may be blocked); limit caps the distance.
+      g, s = self.walk.grid, self.walk.stride
+      cost = {i: 0 for i in sources}
+      q = deque(cost)
+      while q:
+         i = q.popleft()
+         d = cost[i] + 1
+         if limit is not None and d > limit:
+            continue
+         for j in (i - s, i + s, i - 1, i + 1):
+            if g[j] and j not in cost:
+               cost[j] = d
+               q.append(j)
+      return cost
+
+   def toward(self, goals, max_distance=None):
+      goals = frozenset(tuple(g) for g in goals)
+      def build():
+         sources = [self.walk.index(*g) for g in goals if self.map.is_walkable(*g)]
+         return self._bfs(sources, max_distance)
+      return self._cached(("toward", goals, max_distance), build)
+
+   def away_from(self, danger, radius=FLEE_RADIUS):
+      danger = tuple(danger)
+      def build():
+         # Negated, scaled distance from danger, then relaxed so downhill leads around
+         # obstacles to the far edge of the radius instead of into the nearest corner.
+         g, s = self.walk.grid, self.walk.stride
+         base = self._bfs([self.walk.index(*danger)], radius)
+         cost = {i: -FLEE_FACTOR * d for i, d in base.items()}
+         heap = [(c, i) for i, c in cost.items()]
+         heapq.heapify(heap)
+         while heap:
+            c, i = heapq.heappop(heap)
+            if c > cost[i]:
+               continue
+            for j in (i - s, i + s, i - 1, i + 1):
+               if j in cost and c + 1 < cost[j]:
+                  cost[j] = c + 1
+                  heapq.heappush(heap, (c + 1, j))
+         return cost
+      return self._cached(("away", danger, radius), build)
+
+def for_map(map_ref):
+   # The map's shared FlowFields, created on first use.
+   if map_ref.flow_fields is None:
+      map_ref.flow_fields = FlowFields(map_ref)
+   return map_ref.flow_fields
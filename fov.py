@@ -0,0 +1,154 @@
+import numpy as np
+from collections import OrderedDict
+
+from terrain_gen import TREE, ROCK, MOUNTAIN_PEAK, MOUNTAIN_ROCK, MOUNTAIN
+
+# Obstacles that block sight (water and open ground do not); mountain biome tiles block too.
+OPAQUE_OBSTACLES = (TREE, ROCK, MOUNTAIN_PEAK, MOUNTAIN_ROCK)
+# Cached (origin, radius) visibility sets per map.
+MAX_CACHED_VIEWS = 4096
+# Tiles per side of the regions cached views are filed under for invalidation.
+REGION_TILES = 8
+
+# (xx, xy, yx, yy) transforms of the eight octants.
+_OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+            (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+class FieldOfView:
+   # Recursive shadowcasting over the map's opacity grid. Opaque tiles are seen themselves
+   # but hide what lies behind them; the viewer's own tile never blocks.
+   # Results are cached per (origin, radius). A mutation that flips a tile's opacity only
+   # drops the cached views whose radius reaches that tile, found through a region index.
+   def __init__(self, map_ref, max_entries=MAX_CACHED_VIEWS):
+      if not map_ref.bounded:
+         raise TypeError(f"FieldOfView needs a bounded map, not a {type(map_ref).__name__}")
+      self.map         = map_ref
+      self.max_entries = max_entries
+      self.cache       = OrderedDict()   # (origin, radius) -> frozenset of tiles
+      self.regions     = {}              # region -> set of cache keys with origin inside
+      self.max_radius  = 0
+      self.version     = None
+      map_ref.tile_listeners.append(self.tile_changed)
+
+   def detach(self):
+      if self.tile_changed in self.map.tile_listeners:
+         self.map.tile_listeners.remove(self.tile_changed)
+
+   # ── opacity grid ──────────────────────────────────────────────────────────
+   def _opaque_at(self, store, x, y):
+      return bool(store.obstacle[x, y] in OPAQUE_OBSTACLES or store.biome[x, y] == MOUNTAIN)
+
+   def _sync(self):
+      if self.version != self.map.version:
+         store = self.map.store
+         opaque = np.isin(store.obstacle, OPAQUE_OBSTACLES) | (store.biome == MOUNTAIN)
+         self.opaque  = bytearray(opaque.astype(np.uint8).tobytes())
+         self.clear()
+         self.version = self.map.version
+
+   def clear(self):
+      self.cache.clear()
+      self.regions.clear()
+
+   def tile_changed(self, x, y):
+      if self.version != self.map.version - 1:
+         self.version = None
+         return
+      self.version = self.map.version
+      i = x * self.map.rows + y
+      now = self._opaque_at(self.map.store, x, y)
+      if bool(self.opaque[i]) == now:
+         return
+      self.opaque[i] = now
+
+      # Drop every cached view whose radius reaches (x, y).
+      s = REGION_TILES
+      reach = self.max_radius // s + 1
+      rx, ry = x // s, y // s
+      for gx in range(rx - reach, rx + reach + 1):
+         for gy in range(ry - reach, ry + reach + 1):
+            keys = self.regions.get((gx, gy))
+            if not keys:
+               continue
+            for key in [k for k in keys if max(abs(k[0][0] - x), abs(k[0][1] - y)) <= k[1]]:
+               keys.discard(key)
+               self.cache.pop(key, None)
+
+   # ── shadowcasting ─────────────────────────────────────────────────────────
+   def _cast(self, cx, cy, row, start, end, radius, xx, xy, yx, yy, out):
+      if start < end:
+         return
+      cols, rows, opaque = self.map.cols, self.map.rows, self.opaque
+      r2 = radius * radius
+      new_start = 0.0
+      for j in range(row, radius + 1):
+         dx, dy = -j - 1, -j
+         blocked = False
+         while dx <= 0:
+            dx += 1
+            x, y = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
+            l_slope = (dx - 0.5) / (dy + 0.5)
+            r_slope = (dx + 0.5) / (dy - 0.5)
+            if start < r_slope:
+               continue
+            if end > l_slope:
+               break
+
+            inside = 0 <= x < cols and 0 <= y < rows
+            if inside and dx * dx + dy * dy <= r2:
+               out.add((x, y))
+            wall = not inside or opaque[x * rows + y]
+            if blocked:
+               if wall:
+                  new_start = r_slope
+               else:
+                  blocked = False
+                  start = new_start
+            elif wall and j < radius:
+               blocked = True
+               self._cast(cx, cy, j + 1, start, l_slope, radius, xx, xy, yx, yy, out)
+               new_start = r_slope
+         if blocked:
+            break
+
+   # ── queries ───────────────────────────────────────────────────────────────
+   def visible(self, origin, radius):
+      # Frozen set of tiles seen from origin within radius (euclidean).
+      self._sync()
+      key = (tuple(origin), int(radius))
+      seen = self.cache.get(key)
+      if seen is not None:
+         self.cache.move_to_end(key)
+         return seen
+
+      (cx, cy), r = key
+      out = {(cx, cy)}
+      for octant in _OCTANTS:
+         self._cast(cx, cy, 1, 1.0, 0.0, r, *octant, out)
+      seen = frozenset(out)
+
+      self.cache[key] = seen
+      self.regions.setdefault((cx // REGION_TILES, cy // REGION_TILES), set()).add(key)
+      self.max_radius = max(self.max_radius, r)
+      while len(self.cache) > self.max_entries:
+         old, _ = self.cache.popitem(last=False)
+         self.regions[(old[0][0] // REGION_TILES, old[0][1] // REGION_TILES)].discard(old)
+      return seen
+
+   def can_see(self, origin, target, radius):
+      return tuple(target) in self.visible(origin, radius)
+
+   def visible_entities(self, viewer, kind=None, radius=None):
+      # Entities of kind the viewer can see: spatial index candidates within the radius,
+      # filtered by the viewer's (cached) visible set.
+      radius = radius or viewer.vision
+      seen = self.visible(viewer.get_tile_pos(), radius)
+      index = viewer.index
+      return [e for e in index.query_radius(viewer.get_tile_pos(), radius, kind, exclude=viewer)
+              if index.position(e) in seen]
+
+def for_map(map_ref):
+   # The map's shared FieldOfView, created on first use.
+   if map_ref.fov is None:
+      map_ref.fov = FieldOfView(map_ref)
+   return map_ref.fov
@@ -0,0 +1,170 @@
+import heapq
+import numpy as np
+from collections import deque
+
+# Small grid search helpers shared by the pathfinding backends.
+# Movement is 4-connected with unit cost, like the map's own flood fills.
+# Paths are lists of tiles from the first step up to and including the goal.
+
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+def manhattan(a, b):
+   return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+def _inside(bounds, x, y):
+   return bounds is None or (bounds[0] <= x < bounds[2] and bounds[1] <= y < bounds[3])
+
+def trace(came, start, goal):
+   # Walks the parent links back from goal; returns the path without start.
+   path = []
+   node = goal
+   while node != start:
+      path.append(node)
+      node = came[node]
+   path.reverse()
+   return path
+
+def astar(walkable, start, goal, bounds=None):
+   # walkable(x, y) -> bool; bounds = (x0, y0, x1, y1) with exclusive ends limits the search.
+   start, goal = tuple(start), tuple(goal)
+   if start == goal:
+      return []
+   if not walkable(*goal) or not _inside(bounds, *goal):
+      return None
+
+   came = {start: None}
+   cost = {start: 0}
+   heap = [(manhattan(start, goal), 0, start)]
+   while heap:
+      _, g, node = heapq.heappop(heap)
+      if node == goal:
+         return trace(came, start, goal)
+      if g > cost[node]:
+         continue
+      x, y = node
+      for dx, dy in NEIGHBOURS:
+         nxt = (x + dx, y + dy)
+         ng = g + 1
+         if ng < cost.get(nxt, ng + 1) and _inside(bounds, *nxt) and walkable(*nxt):
+            cost[nxt] = ng
+            came[nxt] = node
+            heapq.heappush(heap, (ng + manhattan(nxt, goal), ng, nxt))
+   return None
+
+def bfs_distances(walkable, start, bounds=None, targets=None):
+   # Unit-cost distances from start to every reachable tile (inside bounds).
+   # Stops early once every tile in `targets` has been reached.
+   start = tuple(start)
+   dist = {start: 0}
+   left = set(targets) - {start} if targets is not None else None
+   q = deque([start])
+   while q:
+      if left is not None and not left:
+         break
+      x, y = node = q.popleft()
+      d = dist[node] + 1
+      for dx, dy in NEIGHBOURS:
+         nxt = (x + dx, y + dy)
+         if nxt not in dist and _inside(bounds, *nxt) and walkable(*nxt):
+            dist[nxt] = d
+            q.append(nxt)
+            if left is not None:
+               left.discard(nxt)
+   return dist
+
+class AStar:
+   # Plain A* over map.is_walkable behind the find_path(start, goal) call every backend
+   # exposes. Needs nothing but is_walkable, so streamed maps can use it too.
+   def __init__(self, map_ref):
+      self.map = map_ref
+
+   def find_path(self, start, goal):
+      return astar(self.map.is_walkable, start, goal)
+
+def _components(grid, stride):
+   # Connected-component labels of a padded walk grid (see WalkGrid), blocked indices get
+   # len(grid). Walkable runs along a column are merged first, then runs touching across
+   # columns are hooked onto the smaller root and pointers jumped until nothing moves.
+   walk  = np.frombuffer(bytes(grid), np.uint8).astype(bool)
+   n     = len(walk)
+   start = walk.copy()
+   start[1:] &= ~walk[:-1]
+   run   = np.cumsum(start) - 1
+   count = int(run[-1]) + 2
+   i     = np.flatnonzero(walk[:-stride] & walk[stride:])
+   edge  = np.unique(run[i] * count + run[i + stride])
+   u, v  = edge // count, edge % count
+   parent = np.arange(count - 1)
+   while True:
+      pu, pv = parent[u], parent[v]
+      moved  = pu != pv
+      if not moved.any():
+         break
+      pu, pv = pu[moved], pv[moved]
+      np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+      while True:
+         jumped = parent[parent]
+         if np.array_equal(jumped, parent):
+            break
+         parent = jumped
+   return np.append(np.where(walk, parent[run], n), n)
+
+class WalkGrid:
+   # Padded flat copy of a bounded map's walkable mask, one byte per tile with a blocked
+   # border around it, for searches that scan tiles in tight loops. Tile (x, y) sits at
+   # index (x + 1) * stride + y + 1, so +-1 is a vertical step and +-stride a horizontal one.
+   # Single tile mutations patch it through map.tile_listeners; anything else rebuilds it.
+   def __init__(self, map_ref):
+      if not map_ref.bounded:
+         raise TypeError(f"WalkGrid needs a bounded map, not a {type(map_ref).__name__}")
+      self.map     = map_ref
+      self.version = None
+      self.grid    = bytearray()
+      self.stride  = map_ref.rows + 2
+      self.rebuilds = 0          # bumped whenever the grid is replaced wholesale
+      self.labels   = None       # component label per index, built by reachable()
+      self.labelled = None       # map version the labels belong to
+      map_ref.tile_listeners.append(self.tile_changed)
+
+   def detach(self):
+      if self.tile_changed in self.map.tile_listeners:
+         self.map.tile_listeners.remove(self.tile_changed)
+
+   def sync(self):
+      # Up-to-date grid bytes; call once before a search.
+      if self.version != self.map.version:
+         walk = np.zeros((self.map.cols + 2, self.map.rows + 2), dtype=np.uint8)
+         walk[1:-1, 1:-1] = self.map.store.walkable_mask()
+         self.grid    = bytearray(walk.tobytes())
+         self.stride  = self.map.rows + 2
+         self.version = self.map.version
+         self.rebuilds += 1
+      return self.grid
+
+   def tile_changed(self, x, y):
+      if self.version != self.map.version - 1:
+         self.version = None
+         return
+      self.grid[self.index(x, y)] = self.map.is_walkable(x, y)
+      self.version = self.map.version
+
+   def index(self, x, y):
+      return (x + 1) * self.stride + y + 1
+
+   def reachable(self, a, b):
+      # Whether tiles a and b are walkable and connected. Components are labelled once
+      # per map version, so many checks between mutations cost one lookup each.
+      self.sync()
+      if self.labelled != self.map.version:
+         self.labels   = _components(self.grid, self.stride)
+         self.labelled = self.map.version
+      ia, ib = self.index(*a), self.index(*b)
+      return bool(self.grid[ia] and self.grid[ib]) and self.labels[ia] == self.labels[ib]
+
+   def tile(self, i):
+      x, y = divmod(i, self.stride)
+      return (x - 1, y - 1)
+
+   def distance(self, a, b):
+      (ax, ay), (bx, by) = divmod(a, self.stride), divmod(b, self.stride)
+      return abs(ax - bx) + abs(ay - by)
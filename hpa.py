@@ -0,0 +1,256 @@
+import heapq
+
+from grid_search import astar, bfs_distances, manhattan
+
+# Tiles per side of one HPA* cluster.
+CLUSTER_TILES = 16
+# Border runs longer than this get a transition every this many tiles and at both ends
+# instead of one in the middle, so a route never bends far along a border to cross it.
+MAX_SINGLE_ENTRANCE = 6
+
+class HpaRoute:
+   # An abstract route: waypoints (border transitions) from start to goal. Segments
+   # between consecutive waypoints are refined into tiles only when asked for, so a walker
+   # only pays for the part it is about to walk. first is an already refined first segment.
+   def __init__(self, finder, waypoints, first=None):
+      self.finder    = finder
+      self.waypoints = waypoints
+      self.goal      = waypoints[-1]
+      self.next      = 1
+      self.first     = first
+
+   def done(self):
+      return self.next >= len(self.waypoints)
+
+   def next_segment(self):
+      # Tiles from the current waypoint to the next one; None once the route is done or
+      # when that segment has been cut off since planning (the route then stays there).
+      if self.done():
+         return None
+      a, b = self.waypoints[self.next - 1], self.waypoints[self.next]
+      seg = self.first if self.next == 1 and self.first is not None else self.finder.refine(a, b)
+      if seg is not None:
+         self.next += 1
+      return seg
+
+   def tiles(self):
+      # The rest of the route, fully refined.
+      out = []
+      while not self.done():
+         seg = self.next_segment()
+         if seg is None:
+            return None
+         out.extend(seg)
+      return out
+
+class HierarchicalPathfinder:
+   # HPA*: the map is cut into square clusters; walkable runs across each cluster border
+   # become entrances (a pair of transition tiles, one per side), and transitions inside a
+   # cluster are linked by their walking distance within it. Queries plan over that small
+   # abstract graph and refine to tiles one cluster at a time. cut_tree / add_rock /
+   # remove_rock reach it through map.tile_listeners and only rebuild the touched cluster's
+   # borders and the clusters next to it.
+   # find_path(start, goal) matches AStar and returns a fully refined tile list;
+   # plan(start, goal) returns an HpaRoute for lazy refinement. Needs a bounded map.
+   def __init__(self, map_ref, cluster_tiles=CLUSTER_TILES):
+      if not map_ref.bounded:
+         raise TypeError(f"HierarchicalPathfinder needs a bounded map, not a {type(map_ref).__name__}")
+      self.map     = map_ref
+      self.size    = cluster_tiles
+      self.version = None
+      map_ref.tile_listeners.append(self.tile_changed)
+      self.build()
+
+   def detach(self):
+      # Stops listening to the map's tile changes.
+      if self.tile_changed in self.map.tile_listeners:
+         self.map.tile_listeners.remove(self.tile_changed)
+
+   # ── abstract graph ────────────────────────────────────────────────────────
+   def cluster_of(self, x, y):
+      return (x // self.size, y // self.size)
+
+   def bounds(self, c):
+      s = self.size
+      return (c[0] * s, c[1] * s, min((c[0] + 1) * s, self.map.cols), min((c[1] + 1) * s, self.map.rows))
+
+   def build(self):
+      m, s = self.map, self.size
+      self.ccols = -(-m.cols // s)
+      self.crows = -(-m.rows // s)
+      self.borders = {}   # (cluster, cluster to the right / below) -> [(tile, tile)]
+      self.nodes   = {}   # cluster -> set of transition tiles in it
+      self.inter   = {}   # transition tile -> set of transition tiles across a border
+      self.intra   = {}   # transition tile -> {tile: distance} inside its cluster
+      for cx in range(self.ccols):
+         for cy in range(self.crows):
+            for other in ((cx + 1, cy), (cx, cy + 1)):
+               if other[0] < self.ccols and other[1] < self.crows:
+                  self._scan_border((cx, cy), other)
+      for cx in range(self.ccols):
+         for cy in range(self.crows):
+            self._link_cluster((cx, cy))
+      self.version = m.version
+
+   def _border_pairs(self, a, b):
+      # Facing tile pairs along the border between clusters a and b (b right of / below a).
+      x0, y0, x1, y1 = self.bounds(a)
+      if b[0] > a[0]:
+         return [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+      return [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+
+   def _scan_border(self, a, b):
+      walk = self.map.is_walkable
+      runs, run = [], []
+      for p, q in self._border_pairs(a, b):
+         if walk(*p) and walk(*q):
+            run.append((p, q))
+         elif run:
+            runs.append(run)
+            run = []
+      if run:
+         runs.append(run)
+
+      pairs = []
+      for run in runs:
+         if len(run) > MAX_SINGLE_ENTRANCE:
+            pairs += run[::MAX_SINGLE_ENTRANCE]
+            if (len(run) - 1) % MAX_SINGLE_ENTRANCE:
+               pairs.append(run[-1])
+         else:
+            pairs.append(run[len(run) // 2])
+      self.borders[(a, b)] = pairs
+      for p, q in pairs:
+         self.nodes.setdefault(a, set()).add(p)
+         self.nodes.setdefault(b, set()).add(q)
+         self.inter.setdefault(p, set()).add(q)
+         self.inter.setdefault(q, set()).add(p)
+
+   def _borders_of(self, c):
+      cx, cy = c
+      keys = (((cx - 1, cy), c), ((cx, cy - 1), c), (c, (cx + 1, cy)), (c, (cx, cy + 1)))
+      return [k for k in keys if k in self.borders]
+
+   def _drop_border(self, a, b):
+      for p, q in self.borders.pop((a, b), ()):
+         self.inter.get(p, set()).discard(q)
+         self.inter.get(q, set()).discard(p)
+      # A tile may sit on two borders (cluster corners); keep it while any border uses it.
+      for c in (a, b):
+         used = set()
+         for key in self._borders_of(c):
+            side = 0 if key[0] == c else 1
+            used.update(pair[side] for pair in self.borders[key])
+         for n in self.nodes.get(c, set()) - used:
+            self.nodes[c].discard(n)
+            self.inter.pop(n, None)
+            self.intra.pop(n, None)
+
+   def _link_cluster(self, c):
+      # Walking distances between every pair of transitions inside cluster c.
+      nodes = self.nodes.get(c, set())
+      box = self.bounds(c)
+      for n in nodes:
+         dist = bfs_distances(self.map.is_walkable, n, box, nodes)
+         self.intra[n] = {o: dist[o] for o in nodes if o != n and o in dist}
+
+   def tile_changed(self, x, y):
+      # Rebuilds the borders of the cluster holding (x, y) and relinks it and its neighbours.
+      if self.version != self.map.version - 1:
+         self.version = None          # missed a change; rebuild on next query
+         return
+      c = self.cluster_of(x, y)
+      touched = {c}
+      for a, b in self._borders_of(c):
+         self._drop_border(a, b)
+         self._scan_border(a, b)
+         touched.update((a, b))
+      for t in touched:
+         self._link_cluster(t)
+      self.version = self.map.version
+
+   # ── queries ───────────────────────────────────────────────────────────────
+   def refine(self, a, b):
+      # Tiles from a to b: facing across a border, or searched inside the block of
+      # clusters spanning both (one cluster for consecutive transitions).
+      if manhattan(a, b) == 1:
+         return [tuple(b)] if self.map.is_walkable(*b) else None
+      (ax, ay), (bx, by) = self.cluster_of(*a), self.cluster_of(*b)
+      x0, y0, _, _ = self.bounds((min(ax, bx), min(ay, by)))
+      _, _, x1, y1 = self.bounds((max(ax, bx), max(ay, by)))
+      return astar(self.map.is_walkable, a, b, (x0, y0, x1, y1))
+
+   def _attach(self, p):
+      # Distances from an endpoint to the transitions of its cluster.
+      c = self.cluster_of(*p)
+      nodes = self.nodes.get(c, set())
+      dist = bfs_distances(self.map.is_walkable, p, self.bounds(c), nodes)
+      return {n: dist[n] for n in nodes if n in dist}
+
+   def plan(self, start, goal):
+      start, goal = tuple(start), tuple(goal)
+      if self.version != self.map.version:
+         self.build()
+      if not self.map.is_walkable(*goal):
+         return None
+      if start == goal:
+         return HpaRoute(self, [start])
+
+      # Same or neighbouring clusters: the path inside them is a candidate (going through
+      # transitions there can cost a detour as long as the query), kept unless the
+      # abstract search finds a shorter way, possibly around outside those clusters.
+      local = None
+      (sx, sy), (gx, gy) = self.cluster_of(*start), self.cluster_of(*goal)
+      if abs(sx - gx) <= 1 and abs(sy - gy) <= 1:
+         local = self.refine(start, goal)
+      best = HpaRoute(self, [start, goal], local) if local is not None else None
+      if local is not None and len(local) == manhattan(start, goal):
+         return best
+
+      from_start = self._attach(start)
+      to_goal    = self._attach(goal)
+      if not from_start or not to_goal:
+         return best
+
+      def edges(n):
+         out = [(o, 1) for o in self.inter.get(n, ())]
+         if n == start:
+            return out + list(from_start.items())
+         out += self.intra.get(n, {}).items()
+         if n in to_goal:
+            out.append((goal, to_goal[n]))
+         return out
+
+      came = {start: None}
+      cost = {start: 0}
+      heap = [(manhattan(start, goal), 0, start)]
+      while heap:
+         f, g, n = heapq.heappop(heap)
+         if best is not None and f >= len(local):
+            return best
+         if n == goal:
+            waypoints = []
+            while n is not None:
+               waypoints.append(n)
+               n = came[n]
+            waypoints.reverse()
+            return HpaRoute(self, waypoints)
+         if g > cost[n]:
+            continue
+         for o, d in edges(n):
+            ng = g + d
+            if ng < cost.get(o, ng + 1):
+               cost[o] = ng
+               came[o] = n
+               heapq.heappush(heap, (ng + manhattan(o, goal), ng, o))
+      return best
+
+   def find_path(self, start, goal):
+      route = self.plan(start, goal)
+      return route.tiles() if route is not None else None
+
+def for_map(map_ref):
+   # The map's shared HPA* graph, created on first use; agents plan long walks over it.
+   if map_ref.hpa is None:
+      map_ref.hpa = HierarchicalPathfinder(map_ref)
+   return map_ref.hpa
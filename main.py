@@ -4,11 +4,17 @@ import random
 from map_generator import Map
 from agents import Villager, Seeker
 from animals import Cow
+import asset_manager
+import entity_store
+import fov
+import path_queue
+import simulation
+import tick_scheduler
 
-pygame.init()
-pygame.font.init()
+ASSET_CACHE = ".asset_cache"
 
-DEBUGING_FONT = pygame.font.SysFont(None, 18)
+# Entities spawned on start and the sprite each kind is drawn with.
+SPAWN = ((Villager, 8, "army-spearman-team1"), (Seeker, 1, "army-knight-team2"), (Cow, 6, "animal-deer"))
 
 class Game():
    def __init__(self):
@@ -16,17 +22,60 @@ class Game():
       self.height = 640
       self.debug_mode = False
 
+      # pygame starts with the window, not when this module is imported
+      pygame.init()
+      pygame.font.init()
+      self.debug_font = pygame.font.SysFont(None, 18)
+
       flags = pygame.HWSURFACE | pygame.DOUBLEBUF # If hardware acceleration is possible use it
       self.screen = pygame.display.set_mode((self.width, self.height), flags)
       pygame.display.set_caption('Hide&Seek')
 
       # WORLD
+      # Scaled sprites are kept on disk so later runs skip decoding the assets
+      asset_manager.shared("assets", ASSET_CACHE)
       self.gameMap = Map(self.width, self.height)
       self.gameMap.generate_map()
 
       self.camera_offset = self.gameMap.camera_offset
       self.zoom = self.gameMap.zoom_factor
 
+      # Path requests are solved a few per frame instead of inside each entity update
+      self.path_queue = path_queue.for_map(self.gameMap)
+      # Needs and stamina of every entity, advanced together once per frame
+      self.entity_store = entity_store.for_map(self.gameMap)
+      # Entities near the camera or busy decide every frame, the rest every few frames
+      self.tick_scheduler = tick_scheduler.for_map(self.gameMap)
+
+      # ENTITIES
+      self.villagers, self.seekers, self.cows = (self.spawn(cls, n, sprite) for cls, n, sprite in SPAWN)
+
+   def spawn(self, cls, n, sprite):
+      walkable = list(zip(*self.gameMap.store.walkable_mask().nonzero()))
+      image = self.gameMap.assets["entities"][sprite]
+      ts = self.gameMap.tile_size
+      out = []
+      for _ in range(n):
+         x, y = random.choice(walkable)
+         out.append(cls(int(x) * ts, int(y) * ts, image, self.gameMap))
+      return out
+
+   def entities(self):
+      return self.villagers + self.seekers + self.cows
+
+   def update_entities(self):
+      # Decisions go through the tick scheduler: full detail around the camera and the seekers
+      sight = fov.for_map(self.gameMap)
+      self.tick_scheduler.focus([tick_scheduler.view_rect(self.gameMap, self.width, self.height)],
+                                [s.get_tile_pos() for s in self.seekers])
+      self.tick_scheduler.run(lambda e: simulation.context(e, sight))
+      simulation.catch(self.seekers, self.gameMap.entity_index)
+
+   def draw_entities(self):
+      for e in self.entities():
+         if not getattr(e, "caught", False):
+            e.draw(self.screen, self.gameMap.camera_offset, self.gameMap.zoom_factor)
+
    # Debugging info logic for the agents
    def debugging(self, agents):
       """Draw debug paths and info for all agents if debug mode is enabled."""
@@ -68,7 +117,7 @@ class Game():
             lines.append(f"Caught: {getattr(agent, 'caught', False)}")
 
          for i, line in enumerate(lines):
-            text = DEBUGING_FONT.render(line, True, (0,0,0), (255,255,255))
+            text = self.debug_font.render(line, True, (0,0,0), (255,255,255))
             self.screen.blit(text, (10, offset_y + i * 16))
 
          offset_y += len(lines) * 16 + 10  # Space before next agent’s block
@@ -126,7 +175,9 @@ class Game():
          # -------------------------
          # UPDATE WORLD
          # -------------------------
-         #self.update_entities()
+         self.entity_store.tick()
+         self.update_entities()
+         self.path_queue.run()
 
          # -------------------------
          # RENDER WORLD
@@ -134,13 +185,14 @@ class Game():
          self.screen.fill((255, 255, 255))
          self.gameMap.draw(self.screen)
 
-         #self.draw_entities()
+         self.draw_entities()
 
          # -------------------------
          # DEBUG
          # -------------------------
          if self.debug_mode:
-            self.gameMap.paint_explored_tiles(self.screen, self.camera_offset, self.zoom)
+            self.gameMap.paint_explored_tiles(self.screen, self.gameMap.camera_offset, self.gameMap.zoom_factor)
+            self.debugging(self.seekers + self.villagers)
 
          pygame.display.flip()
       
@@ -0,0 +1,954 @@
+import os
+import random
+import numpy as np
+import json
+import math
+from pathlib import Path
+from collections import deque
+
+import asset_manager
+import map_format
+import terrain_gen
+from asset_manager import SpriteSheet
+from terrain_gen import TREE
+from tile_store import TileStore, SurfacePalette, WALKABLE, EXPLORED
+
+# Pure-logic map: tile grid, generation, walkability, gameplay mutations and saves.
+# Nothing here imports pygame or noise, so headless workers (simulation, batch_runner)
+# start without them; map_generator.Map adds surfaces, chunk rendering and the camera.
+
+# noise.pnoise2, imported by the first map generated with the python backend.
+_pnoise2 = None
+
+def _noise():
+   global _pnoise2
+   if _pnoise2 is None:
+      from noise import pnoise2
+      _pnoise2 = pnoise2
+   return _pnoise2
+
+# Placeholder tile pools, shared by every core map: (asset_dir, tile_size) -> buckets.
+_placeholders = {}
+
+def tile_pools(names, pool, fallback):
+   # Sorts asset file names into named pools, each built by pool(list of file names).
+   # Empty pools get one fallback(color) so the game never crashes on missing assets.
+   # Only oak and darkpine trees are active; the other variants are never loaded.
+   # Returns (buckets, entity files keyed by name without the "entity-" prefix).
+   buckets = {
+      "grass":         [],
+      "water_deep":    [],
+      "water_shallow": [],
+      "water_coast":   [],
+      "sand":          [],
+      "trees":         {"oak": [], "darkpine": []},
+      "rocks":         [],
+      "mountain_peak": [],
+      "mountain_rock": [],
+   }
+
+   def bucket(name):
+      if "grass" in name:
+         return buckets["grass"]
+      elif "deepwater" in name:
+         return buckets["water_deep"]
+      elif "shallowwater" in name:
+         return buckets["water_shallow"]
+      elif "oastwater" in name:
+         return buckets["water_coast"]
+      elif "sand" in name:
+         return buckets["sand"]
+      elif "mountain" in name and "rock" in name:
+         return buckets["mountain_rock"]
+      elif "mountain" in name:
+         return buckets["mountain_peak"]
+      elif "rock" in name:
+         return buckets["rocks"]
+      elif "tree" in name:
+         if "oak" in name:
+               return buckets["trees"]["oak"]
+         elif "darkpine" in name:
+               return buckets["trees"]["darkpine"]
+      return None
+
+   entities = {}
+   for name in names:
+      low = name.lower()
+      if low.startswith("entity-"):
+         entities[Path(name).stem[len("entity-"):]] = name
+         continue
+      files = bucket(low)
+      if files is not None:
+         files.append(name)
+
+   for key, files in list(buckets.items()):
+      if isinstance(files, list) and files:
+         buckets[key] = pool(files)
+   for key, files in buckets["trees"].items():
+      if files:
+         buckets["trees"][key] = pool(files)
+
+   fb = fallback
+   if not buckets["grass"]:         buckets["grass"]         = [fb((100, 140, 60))]
+   if not buckets["water_deep"]:    buckets["water_deep"]    = [fb((20, 60, 120))]
+   if not buckets["water_shallow"]: buckets["water_shallow"] = [fb((60, 120, 180))]
+   if not buckets["water_coast"]:   buckets["water_coast"]   = [fb((100, 160, 200))]
+   if not buckets["sand"]:          buckets["sand"]          = [fb((210, 190, 130))]
+   if not buckets["rocks"]:         buckets["rocks"]         = [fb((120, 110, 90))]
+   if not buckets["mountain_peak"]: buckets["mountain_peak"] = [fb((160, 160, 160))]
+   if not buckets["mountain_rock"]: buckets["mountain_rock"] = [fb((130, 120, 100))]
+   if not buckets["trees"]["oak"]:      buckets["trees"]["oak"]     = [fb((30, 90, 30))]
+   if not buckets["trees"]["darkpine"]: buckets["trees"]["darkpine"]= [fb((20, 60, 20))]
+   return buckets, entities
+
+def placeholder_assets(asset_dir="assets", tile_size=16):
+   # Tile pools holding file names in place of surfaces: pool sizes (and so every random
+   # pick of generation) match the drawn map's, but no image is decoded.
+   key = (os.path.abspath(asset_dir), tile_size)
+   if key not in _placeholders:
+      manager = asset_manager.shared(asset_dir)
+      buckets, entities = tile_pools(manager.names(), list, lambda color: ("fallback", color))
+      buckets["entities"] = SpriteSheet(manager, entities, tile_size, headless=True)
+      _placeholders[key] = buckets
+   return _placeholders[key]
+
+# Tile class
+class Tile:
+   # Lightweight view of one cell of a TileStore; all state lives in the store's arrays.
+   # bg_surface is always the ground (grass/sand/water).
+   # top_surface is the overlay (tree/rock/mountain) or None.
+   # render_offset shifts the top_surface for tall sprites (trees).
+   # A Tile built without a store owns a private 1x1 store (e.g. Tile.from_dict).
+   __slots__ = ("x", "y", "size", "_store", "_i", "_j")
+
+   def __init__(self, x, y, size, bg=None, top=None,
+               obstacle=None, walkable=True, biom="grassland", store=None, i=0, j=0):
+      self.x = x
+      self.y = y
+      self.size = size
+      if store is None:
+         store = TileStore(1, 1)
+         store.set_tile(0, 0, biom, obstacle, walkable, bg, top)
+      self._store = store
+      self._i = i
+      self._j = j
+
+   # ── fields ────────────────────────────────────────────────────────────────
+   @property
+   def biom(self):
+      return self._store.get_biome(self._i, self._j)
+
+   @biom.setter
+   def biom(self, name):
+      self._store.set_biome(self._i, self._j, name)
+
+   @property
+   def obstacle(self):
+      return self._store.get_obstacle(self._i, self._j)
+
+   @obstacle.setter
+   def obstacle(self, name):
+      self._store.set_obstacle(self._i, self._j, name)
+
+   @property
+   def walkable(self):
+      return self._store.get_flag(self._i, self._j, WALKABLE)
+
+   @walkable.setter
+   def walkable(self, on):
+      self._store.set_flag(self._i, self._j, WALKABLE, on)
+
+   @property
+   def explored(self):
+      return self._store.get_flag(self._i, self._j, EXPLORED)
+
+   @explored.setter
+   def explored(self, on):
+      self._store.set_flag(self._i, self._j, EXPLORED, on)
+
+   @property
+   def bg_surface(self):
+      return self._store.palette[self._store.bg[self._i, self._j]]
+
+   @bg_surface.setter
+   def bg_surface(self, surf):
+      self._store.bg[self._i, self._j] = self._store.palette.index(surf)
+
+   @property
+   def top_surface(self):
+      return self._store.palette[self._store.top[self._i, self._j]]
+
+   @top_surface.setter
+   def top_surface(self, surf):
+      self._store.top[self._i, self._j] = self._store.palette.index(surf)
+
+   @property
+   def render_offset(self):
+      # Only trees are drawn raised; derived instead of stored per tile.
+      import pygame
+      if self._store.obstacle[self._i, self._j] == TREE:
+         return pygame.Vector2(0, -self.size // 2)
+      return pygame.Vector2(0, 0)
+
+   def draw(self, screen):
+      px = self.x * self.size
+      py = self.y * self.size
+      if self.bg_surface:
+         screen.blit(self.bg_surface, (px, py))
+      if self.top_surface:
+         off = self.render_offset
+         screen.blit(self.top_surface, (px + off.x, py + off.y))
+
+   # Mutation helpers – each resets all relevant fields so nothing is left stale.
+   def _set(self, biom, obstacle, walkable, bg, top):
+      self._store.set_tile(self._i, self._j, biom, obstacle, walkable, bg, top)
+
+   def place_tree(self, surf):
+      self._set(self.biom, "tree", True, self.bg_surface, surf)
+
+   def remove_tree(self):
+      self._set(self.biom, None, True, self.bg_surface, None)
+
+   def place_rock(self, surf):
+      self._set(self.biom, "rock", False, self.bg_surface, surf)
+
+   def remove_rock(self):
+      self._set(self.biom, None, True, self.bg_surface, None)
+
+   def place_mountain_peak(self, surf):
+      self._set(self.biom, "mountain_peak", False, self.bg_surface, surf)
+
+   def place_mountain_rock(self, surf):
+      self._set(self.biom, "mountain_rock", False, self.bg_surface, surf)
+
+   def set_water(self, surf, depth="deep"):
+      self._set("lake", f"water_{depth}", False, surf, None)
+
+   def set_sand(self, surf):
+      self._set("shore", None, True, surf, None)
+
+   def set_grass(self, surf, biom="grassland"):
+      self._set(biom, None, True, surf, None)
+
+   def copy_from(self, other):
+      # Copies every field of another tile (possibly from a different store).
+      self._set(other.biom, other.obstacle, other.walkable, other.bg_surface, other.top_surface)
+      self.explored = other.explored
+
+   def to_dict(self):
+      return {
+         "x": self.x, "y": self.y,
+         "obstacle": self.obstacle,
+         "biom": self.biom,
+         "explored": self.explored,
+         "walkable": self.walkable,
+      }
+
+   @staticmethod
+   def from_dict(d, size=16):
+      t = Tile(d["x"], d["y"], size)
+      t.obstacle = d.get("obstacle")
+      t.biom     = d.get("biom", "grassland")
+      t.explored = d.get("explored", False)
+      t.walkable = d.get("walkable", True)
+      return t
+
+class TileGrid:
+   # map_data replacement: grid[x][y] yields Tile views over a TileStore, and
+   # grid[x][y] = tile copies the tile's fields into the store.
+   __slots__ = ("store", "size", "x0", "y0")
+
+   def __init__(self, store, size, x0=0, y0=0):
+      self.store = store
+      self.size  = size
+      self.x0    = x0
+      self.y0    = y0
+
+   def __len__(self):
+      return self.store.cols
+
+   def __getitem__(self, i):
+      if not 0 <= i < self.store.cols:
+         raise IndexError(i)
+      return _TileColumn(self, i)
+
+   def __iter__(self):
+      for i in range(self.store.cols):
+         yield _TileColumn(self, i)
+
+   def tile(self, i, j):
+      return Tile(self.x0 + i, self.y0 + j, self.size, store=self.store, i=i, j=j)
+
+class _TileColumn:
+   __slots__ = ("grid", "i")
+
+   def __init__(self, grid, i):
+      self.grid = grid
+      self.i    = i
+
+   def __len__(self):
+      return self.grid.store.rows
+
+   def __getitem__(self, j):
+      if not 0 <= j < self.grid.store.rows:
+         raise IndexError(j)
+      return self.grid.tile(self.i, j)
+
+   def __setitem__(self, j, tile):
+      self.grid.tile(self.i, j).copy_from(tile)
+
+   def __iter__(self):
+      for j in range(self.grid.store.rows):
+         yield self.grid.tile(self.i, j)
+
+
+# ── map configurations ──────────────────────────────────────────────────────────────────────
+# Elevation thresholds
+_WATER_T  = 0.45   # below → water 0.45
+_SAND_T   = 0.48 # water..sand → shore band 0.48
+_HIGH_T   = 0.61  # above → highland / mountain candidate 0.61
+
+# Moisture thresholds (within land)
+_OAK_T      = 0.60   # moisture above this → oak forest 0.60
+_DARKPINE_T = 0.55   # moisture below this → darkpine forest 0.55
+# between → open grassland
+
+# Water depth rings (Chebyshev distance to nearest land tile)
+_COAST_D   = 1 # 1
+_SHALLOW_D = 2 # 2
+
+# Mutation API methods recorded in Map.mutations and replayed by load_delta.
+MUTATIONS = ("cut_tree", "plant_tree", "add_rock", "remove_rock")
+
+class MapCore:
+   # Everything a map is apart from how it looks. Tile surfaces are placeholders (asset
+   # file names) unless a subclass supplies real ones through _tile_assets().
+   # Whole-map caches (WalkGrid, FieldOfView) need bounded maps: one TileStore of cols x rows.
+   bounded = True
+
+   def __init__(self, width, height, tile_size=16, seed=None, headless=True):
+      self.width     = width
+      self.height    = height
+      self.tile_size = tile_size
+      self.cols      = width  // tile_size
+      self.rows      = height // tile_size
+
+      # The whole map follows from this one seed: noise seeds and every random draw of
+      # generation come from self.rng, gameplay mutations from self.play_rng.
+      self.seed = random.randrange(2 ** 63) if seed is None else seed
+      self._reset_rng()
+      self.mutations = []
+
+      # Bumped on every terrain change; caches built from tile data compare against it.
+      self.version = 0
+      # Shared pathfinding service, created by path_service.for_map().
+      self.path_service = None
+      # Shared flow fields, created by flow_field.for_map().
+      self.flow_fields = None
+      # Shared D* Lite registry, created by dstar.for_map().
+      self.replanner = None
+      # Shared HPA* cluster graph for long walks, created by hpa.for_map().
+      self.hpa = None
+      # Per-frame path request scheduler, enabled by path_queue.for_map(); None solves inline.
+      self.path_queue = None
+      # Spatial index of the entities on this map, created by spatial_index.for_map().
+      self.entity_index = None
+      # Numeric per-entity state (position, needs, stamina), created by entity_store.for_map().
+      self.entity_store = None
+      # Level-of-detail update scheduler, created by tick_scheduler.for_map().
+      self.tick_scheduler = None
+      # Cached field of view over the obstacle data, created by fov.for_map().
+      self.fov = None
+      # Callbacks fn(x, y) run after a gameplay mutation changed tile (x, y), and
+      # fn(x, y, walkable) run only when that change flipped the tile's walkability.
+      self.tile_listeners = []
+      self.walk_listeners = []
+
+      # headless maps carry placeholder assets and are never drawn (see simulation.py).
+      self.headless = headless
+      self.assets   = self._tile_assets()
+      self.palette  = SurfacePalette()
+      self.store    = TileStore(self.cols, self.rows, self.palette)
+      self.map_data = TileGrid(self.store, tile_size)
+
+   def _tile_assets(self):
+      return placeholder_assets(tile_size=self.tile_size)
+
+   # -- Clean random water tile noise
+   def _prune_small_lakes(self, min_size=6, connectivity=4):
+    """
+    Convert small connected water components (biom == "lake") into land.
+    Call this AFTER initial water assignment in generate_map() and BEFORE
+    _apply_water_depth() / shore-depth processing.
+    """
+    cols = self.cols
+    rows = self.rows
+
+    visited = [[False] * rows for _ in range(cols)]
+
+    if connectivity == 8:
+        neigh = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
+    else:
+        neigh = [(-1,0),(1,0),(0,-1),(0,1)]
+
+    def is_water(x,y):
+        return 0 <= x < cols and 0 <= y < rows and self.map_data[x][y].biom == "lake"
+
+    for x in range(cols):
+        for y in range(rows):
+            if visited[x][y]:
+                continue
+            if not is_water(x,y):
+                visited[x][y] = True
+                continue
+
+            # BFS collect component
+            q = deque()
+            comp = []
+            q.append((x,y))
+            visited[x][y] = True
+
+            while q:
+                cx, cy = q.popleft()
+                comp.append((cx,cy))
+                for dx, dy in neigh:
+                    nx, ny = cx + dx, cy + dy
+                    if 0 <= nx < cols and 0 <= ny < rows and not visited[nx][ny]:
+                        if is_water(nx, ny):
+                            visited[nx][ny] = True
+                            q.append((nx, ny))
+                        else:
+                            visited[nx][ny] = True  # mark non-water so we skip later
+
+            # If component too small, convert to land
+            if len(comp) < min_size:
+                for cx, cy in comp:
+                    tile = self.map_data[cx][cy]
+                    # Convert to land: use your existing helpers so visuals/biome are consistent
+                    tile.set_grass(self._grass(cx, cy), "grassland")
+                    # If you also track elevation explicitly on tile, optionally bump it:
+                    # try:
+                    #     tile.elevation = max(tile.elevation, _WATER_T + 0.01)
+                    # except AttributeError:
+                    #     pass
+
+   # ── noise ────────────────────────────────────────────────────────────────
+   def _elev(self, x, y):
+      # Low-frequency base gives large water bodies; high-frequency detail adds natural edges.
+      nx = x / self.cols * 3.5 + self._ex
+      ny = y / self.rows * 3.5 + self._ey
+      return (_noise()(nx, ny, octaves=6, persistence=0.5, lacunarity=2.1) + 1) / 2
+
+   def _moist(self, x, y):
+      nx = x / self.cols * 2.8 + self._mx
+      ny = y / self.rows * 2.8 + self._my
+      return (_noise()(nx, ny, octaves=4, persistence=0.55, lacunarity=2.0) + 1) / 2
+
+   # ── asset pickers ────────────────────────────────────────────────────────
+   def _grass(self, x, y):
+      # Single grass type to avoid visual noise; index 0 always exists due to fallback.
+      return self.assets["grass"][0]
+
+   def _sand(self, x, y):
+      pool = self.assets["sand"]
+      return pool[(x * 2654435761 ^ y * 2246822519) % len(pool)]
+
+   def _tree(self, biom, rng=None):
+      pool = self.assets["trees"].get(biom, self.assets["trees"]["oak"])
+      return (rng or self.rng).choice(pool)
+
+   def _rock(self, rng=None):
+      return (rng or self.rng).choice(self.assets["rocks"])
+
+   # ── generation ───────────────────────────────────────────────────────────
+   def _reset_rng(self):
+      # Restarts both RNGs from self.seed; generation always begins from this state.
+      # A map loaded without a seed gets a fresh one when it is generated again.
+      if self.seed is None:
+         self.seed = random.randrange(2 ** 63)
+      self.rng      = random.Random(self.seed)
+      self.play_rng = random.Random(f"{self.seed}:play")
+      # Independent seeds for elevation and moisture so biomes don't mirror terrain
+      self._ex = self.rng.uniform(0, 10_000)
+      self._ey = self.rng.uniform(0, 10_000)
+      self._mx = self.rng.uniform(0, 10_000)
+      self._my = self.rng.uniform(0, 10_000)
+
+   def gen_config(self):
+      # Thresholds handed to the array backend.
+      return {
+         "water_t": _WATER_T, "sand_t": _SAND_T, "high_t": _HIGH_T,
+         "oak_t": _OAK_T, "darkpine_t": _DARKPINE_T,
+         "coast_d": _COAST_D, "shallow_d": _SHALLOW_D,
+      }
+
+   def _pool_sizes(self):
+      a = self.assets
+      return {
+         "water_deep": len(a["water_deep"]), "water_shallow": len(a["water_shallow"]),
+         "water_coast": len(a["water_coast"]), "rocks": len(a["rocks"]),
+         "oak": len(a["trees"]["oak"]), "darkpine": len(a["trees"]["darkpine"]),
+         "mountain_peak": len(a["mountain_peak"]), "mountain_rock": len(a["mountain_rock"]),
+      }
+
+   def generate_arrays(self, parallel=False, executor=None, workers=None):
+      # NumPy backend: returns terrain_gen.TerrainArrays without touching any Tile.
+      # parallel=True spreads the noise over a process pool (see terrain_gen.generate_parallel).
+      self._reset_rng()
+      seeds = (self._ex, self._ey, self._mx, self._my)
+      if parallel:
+         return terrain_gen.generate_parallel(self.cols, self.rows, seeds, self._pool_sizes(),
+                                              self.gen_config(), self.rng, executor=executor, workers=workers)
+      return terrain_gen.generate(self.cols, self.rows, seeds, self._pool_sizes(), self.gen_config(), self.rng)
+
+   def apply_arrays(self, arr):
+      # Materialize TerrainArrays into map_data, picking surfaces by variant index.
+      self._materialize(arr, self.store)
+      self._terrain_replaced()
+
+   def _materialize(self, arr, store, x0=0, y0=0):
+      # Writes arr into a TileStore, turning pool variant indices into palette indices.
+      # (x0, y0) is the tile coord of arr[0, 0] and only matters for the sand hash.
+      a, pal = self.assets, self.palette
+      ids = terrain_gen.OBSTACLE_ID
+
+      def lut(pool):
+         return np.array([pal.index(s) for s in pool], dtype=np.uint16)
+
+      store.biome[:]    = arr.biome
+      store.obstacle[:] = arr.obstacle
+      store.flags[:]    = (store.flags & EXPLORED) | np.where(arr.walkable, WALKABLE, 0)
+
+      # Ground: grass everywhere, then sand by position hash (same as _sand), then water.
+      store.bg[:] = pal.index(self._grass(x0, y0))
+      shore = arr.biome == terrain_gen.SHORE
+      xs, ys = np.nonzero(shore)
+      sand = lut(a["sand"])
+      store.bg[shore] = sand[((xs + x0) * 2654435761 ^ (ys + y0) * 2246822519) % len(sand)]
+      for name in ("water_deep", "water_shallow", "water_coast"):
+         m = arr.obstacle == ids[name]
+         store.bg[m] = lut(a[name])[arr.bg[m]]
+
+      # Overlays
+      store.top[:] = 0
+      tree = arr.obstacle == TREE
+      oak = tree & (arr.biome == terrain_gen.OAK_FOREST)
+      store.top[oak] = lut(a["trees"]["oak"])[arr.top[oak]]
+      pine = tree & ~oak
+      store.top[pine] = lut(a["trees"]["darkpine"])[arr.top[pine]]
+      for name, pool in (("rock", a["rocks"]), ("mountain_peak", a["mountain_peak"]),
+                         ("mountain_rock", a["mountain_rock"])):
+         m = arr.obstacle == ids[name]
+         store.top[m] = lut(pool)[arr.top[m]]
+
+   def generate_map(self, backend="python", executor=None, workers=None):
+      # backend="numpy" runs the vectorized pipeline in terrain_gen, backend="parallel" the same
+      # pipeline with noise computed across processes; both give the same output for the same seeds.
+      if backend in ("numpy", "parallel"):
+         parallel = backend == "parallel"
+         self.apply_arrays(self.generate_arrays(parallel, executor, workers))
+         self.mutations = []
+         return
+
+      self._reset_rng()
+      self.mutations = []
+
+      # Pass 1: assign biomes and base surfaces from noise values.
+      for x in range(self.cols):
+         for y in range(self.rows):
+            tile = self.map_data[x][y]
+            elev = self._elev(x, y)
+            mois = self._moist(x, y)
+
+            if elev < _WATER_T:
+               # Temporarily mark all water as deep; pass 2 refines depth from shore distance.
+               tile.set_water(self.rng.choice(self.assets["water_deep"]), "deep")
+
+            elif elev < _SAND_T:
+               tile.set_sand(self._sand(x, y))
+
+            elif elev > _HIGH_T:
+               tile.set_grass(self._grass(x, y), "highland")
+
+            elif mois > _OAK_T:
+               tile.set_grass(self._grass(x, y), "oak_forest")
+               if self.rng.random() < 0.65:
+                  tile.place_tree(self._tree("oak"))
+
+            elif mois < _DARKPINE_T:
+               tile.set_grass(self._grass(x, y), "darkpine_forest")
+               if self.rng.random() < 0.70:
+                  tile.place_tree(self._tree("darkpine"))
+
+            else:
+               tile.set_grass(self._grass(x, y), "grassland")
+
+      # Clean the random water tiles noise
+      self._prune_small_lakes(min_size=6, connectivity=4)
+
+      # Pass 2: water depth from distance to nearest land tile.
+      self._apply_water_depth()
+
+      # Pass 3: place mountains on highland tiles.
+      self._place_mountains()
+
+      # Pass 4: scatter small rock clusters on grassland / forest edges.
+      self._place_rock_clusters()
+
+      self._terrain_replaced()
+
+   def _apply_water_depth(self):
+      # Pre-compute a shore-distance grid using BFS from all land tiles.
+
+      dist = [[999] * self.rows for _ in range(self.cols)]
+      q = deque()
+
+      for x in range(self.cols):
+         for y in range(self.rows):
+            if self.map_data[x][y].biom != "lake":
+               dist[x][y] = 0
+               q.append((x, y))
+
+      while q:
+         cx, cy = q.popleft()
+         d = dist[cx][cy]
+         for dx, dy in ((-1,0),(1,0),(0,-1),(0,1)):
+            nx, ny = cx + dx, cy + dy
+            if 0 <= nx < self.cols and 0 <= ny < self.rows and dist[nx][ny] == 999:
+               dist[nx][ny] = d + 1
+               q.append((nx, ny))
+
+      for x in range(self.cols):
+         for y in range(self.rows):
+            tile = self.map_data[x][y]
+            if tile.biom != "lake":
+               continue
+            d = dist[x][y]
+            if d <= _COAST_D:
+               tile.set_water(self.rng.choice(self.assets["water_coast"]), "coast")
+            elif d <= _SHALLOW_D:
+               tile.set_water(self.rng.choice(self.assets["water_shallow"]), "shallow")
+            # deep water stays as-is
+
+   def _place_mountains(self):
+      # Groups highland tiles into blobs, picks the centroid as the peak,
+      # then rings the peak with mountain_rock tiles.
+      visited = set()
+
+      for sx in range(self.cols):
+         for sy in range(self.rows):
+            if self.map_data[sx][sy].biom != "highland" or (sx, sy) in visited:
+               continue
+
+            # Flood-fill this highland blob
+            blob = []
+            stack = [(sx, sy)]
+            while stack:
+               cx, cy = stack.pop()
+               if (cx, cy) in visited:
+                  continue
+               if not (0 <= cx < self.cols and 0 <= cy < self.rows):
+                  continue
+               if self.map_data[cx][cy].biom != "highland":
+                  continue
+               visited.add((cx, cy))
+               blob.append((cx, cy))
+               stack += [(cx-1,cy),(cx+1,cy),(cx,cy-1),(cx,cy+1)]
+
+            if len(blob) < 4:
+               # Too small for a mountain – turn into normal grassland
+               for bx, by in blob:
+                  self.map_data[bx][by].set_grass(self._grass(bx, by), "grassland")
+               continue
+
+            # Centroid as peak
+            cx = int(sum(p[0] for p in blob) / len(blob))
+            cy = int(sum(p[1] for p in blob) / len(blob))
+            cx = max(0, min(self.cols - 1, cx))
+            cy = max(0, min(self.rows - 1, cy))
+
+            peak_radius = max(1, int(math.sqrt(len(blob)) * 0.4))
+
+            for bx, by in blob:
+               tile = self.map_data[bx][by]
+               tile.set_grass(self._grass(bx, by), "mountain")
+               dist = math.hypot(bx - cx, by - cy)
+               if dist <= 1.0:
+                  tile.place_mountain_peak(self.rng.choice(self.assets["mountain_peak"]))
+               elif dist <= peak_radius:
+                  tile.place_mountain_rock(self.rng.choice(self.assets["mountain_rock"]))
+               else:
+                  tile.place_mountain_rock(self.rng.choice(self.assets["mountain_rock"]))
+
+   def _place_rock_clusters(self):
+      # Scatters small rock clusters (3-7 tiles) across walkable non-forest land.
+      # Rocks can bleed into forest edges for natural variety.
+      cluster_count = (self.cols * self.rows) // 400
+
+      for _ in range(cluster_count):
+         ox = self.rng.randint(0, self.cols - 1)
+         oy = self.rng.randint(0, self.rows - 1)
+         tile = self.map_data[ox][oy]
+
+         if tile.biom not in ("grassland", "oak_forest", "darkpine_forest"):
+            continue
+
+         cluster_size = self.rng.randint(3, 7)
+         cx, cy = ox, oy
+
+         for _ in range(cluster_size):
+            cx = max(0, min(self.cols - 1, cx + self.rng.randint(-1, 1)))
+            cy = max(0, min(self.rows - 1, cy + self.rng.randint(-1, 1)))
+            t = self.map_data[cx][cy]
+            if t.walkable and t.obstacle in (None, "tree"):
+               if t.obstacle == "tree":
+                  t.remove_tree()
+               t.place_rock(self._rock())
+
+
+   # ── tile access ───────────────────────────────────────────────────────────
+   def get_tile_at(self, x, y):
+      if 0 <= x < self.cols and 0 <= y < self.rows:
+         return self.map_data.tile(x, y)
+      return None
+
+   def tile_layers(self, x0, y0, x1, y1):
+      # bg / top palette indices and obstacle ids of tiles x0..x1-1, y0..y1-1, clipped to the map.
+      s = self.store
+      return s.bg[x0:x1, y0:y1], s.top[x0:x1, y0:y1], s.obstacle[x0:x1, y0:y1]
+
+   def tile_flags(self, x0, y0, x1, y1):
+      # Flag bytes (WALKABLE / EXPLORED) of tiles x0..x1-1, y0..y1-1, clipped to the map.
+      return self.store.flags[x0:x1, y0:y1]
+
+   def is_walkable(self, x, y):
+      # Hot in every search; reads the flag byte without building a Tile view.
+      if 0 <= x < self.cols and 0 <= y < self.rows:
+         return bool(self.store.flags[x, y] & WALKABLE)
+      return False
+
+   def iter_tiles(self):
+      for col in self.map_data:
+         yield from col
+
+   def mark_explored(self, tiles):
+      # Sets Tile.explored on every (x, y) in tiles at once; returns the newly explored ones.
+      if not tiles:
+         return []
+      xs, ys = np.array(list(tiles), dtype=np.intp).T
+      new = (self.store.flags[xs, ys] & EXPLORED) == 0
+      self.store.flags[xs, ys] |= EXPLORED
+      return list(zip(xs[new].tolist(), ys[new].tolist()))
+
+   def clear_explored(self):
+      self.store.flags &= ~EXPLORED & 0xFF
+
+   def tile_to_pixel(self, pos):
+      return pos[0] * self.tile_size, pos[1] * self.tile_size
+
+   # ── gameplay mutation API ─────────────────────────────────────────────────
+   def _terrain_replaced(self):
+      # Called after the whole map was (re)generated or loaded.
+      self.version += 1
+
+   def _tile_changed(self, x, y, op=None, was_walkable=None):
+      # Called after any gameplay mutation of tile (x, y); op is logged for delta saves.
+      if op:
+         self.mutations.append((op, x, y))
+      self.version += 1
+      for fn in self.tile_listeners:
+         fn(x, y)
+      walkable = self.is_walkable(x, y)
+      if was_walkable is not None and was_walkable != walkable:
+         for fn in self.walk_listeners:
+            fn(x, y, walkable)
+
+   def cut_tree(self, x, y):
+      t = self.get_tile_at(x, y)
+      if t and t.obstacle == "tree":
+         was = t.walkable
+         t.remove_tree()
+         self._tile_changed(x, y, "cut_tree", was)
+         return True
+      return False
+
+   def plant_tree(self, x, y):
+      t = self.get_tile_at(x, y)
+      if t and t.walkable and t.obstacle is None:
+         was = t.walkable
+         t.place_tree(self._tree(t.biom, self.play_rng))
+         self._tile_changed(x, y, "plant_tree", was)
+         return True
+      return False
+
+   def add_rock(self, x, y):
+      t = self.get_tile_at(x, y)
+      if t and t.obstacle is None:
+         was = t.walkable
+         t.place_rock(self._rock(self.play_rng))
+         self._tile_changed(x, y, "add_rock", was)
+         return True
+      return False
+
+   def remove_rock(self, x, y):
+      t = self.get_tile_at(x, y)
+      if t and t.obstacle == "rock":
+         was = t.walkable
+         t.remove_rock()
+         self._tile_changed(x, y, "remove_rock", was)
+         return True
+      return False
+
+   # ── save / load ───────────────────────────────────────────────────────────
+   # Binary layers written by save_map; surfaces are re-attached on load.
+   SAVED_LAYERS = ("biome", "obstacle", "flags")
+
+   def save_map(self, path="saved_map.hsm", compress=False):
+      # Versioned binary file (see map_format). Paths ending in .json use the JSON export.
+      if str(path).endswith(".json"):
+         return self.export_json(path)
+      seeds = (self._ex, self._ey, self._mx, self._my)
+      layers = {name: getattr(self.store, name) for name in self.SAVED_LAYERS}
+      map_format.write(path, self.cols, self.rows, seeds, layers, compress, self._history())
+
+   def load_map(self, path="saved_map.hsm", region=None):
+      # Loads a binary map file or a JSON export (detected from the file contents).
+      # region=(x0, y0, w, h) only reads that rectangle of a binary file; uncompressed
+      # files are memory-mapped, so the rest of the file is never touched.
+      if not map_format.is_map_file(path):
+         return self._load_json(path)
+
+      mf = map_format.MapFile(path)
+      if (mf.cols, mf.rows) != (self.cols, self.rows):
+         raise map_format.MapFormatError(
+            f"{path} is {mf.cols}x{mf.rows} tiles, this map is {self.cols}x{self.rows}")
+      self._ex, self._ey, self._mx, self._my = mf.seeds
+
+      x0, y0, w, h = region or (0, 0, self.cols, self.rows)
+      # A partial load leaves a mix of two maps that no seed and log can reproduce.
+      whole = (x0, y0, w, h) == (0, 0, self.cols, self.rows)
+      self._restore_history(mf.meta if whole else {})
+      win = self.store.window(x0, y0, w, h)
+      for name in self.SAVED_LAYERS:
+         getattr(win, name)[:] = mf.window(name, x0, y0, w, h)
+      self._attach_surfaces(win, x0, y0)
+      self._terrain_replaced()
+
+   def _attach_surfaces(self, store, x0=0, y0=0):
+      # Vectorized surface re-attachment after a binary load: variants are picked by
+      # position hash (like _sand) so nothing per tile runs in Python.
+      a, pal = self.assets, self.palette
+      ids = terrain_gen.OBSTACLE_ID
+      xs, ys = np.indices((store.cols, store.rows))
+      h = (xs + x0) * 2654435761 ^ (ys + y0) * 2246822519
+
+      def pick(pool, mask):
+         lut = np.array([pal.index(s) for s in pool], dtype=np.uint16)
+         return lut[h[mask] % len(lut)]
+
+      store.bg[:] = pal.index(self._grass(x0, y0))
+      shore = store.biome == terrain_gen.SHORE
+      store.bg[shore] = pick(a["sand"], shore)
+      for name in ("water_deep", "water_shallow", "water_coast"):
+         m = store.obstacle == ids[name]
+         store.bg[m] = pick(a[name], m)
+
+      store.top[:] = 0
+      tree = store.obstacle == TREE
+      pine = tree & (store.biome == terrain_gen.DARKPINE_FOREST)
+      store.top[pine] = pick(a["trees"]["darkpine"], pine)
+      store.top[tree & ~pine] = pick(a["trees"]["oak"], tree & ~pine)
+      for name, pool in (("rock", a["rocks"]), ("mountain_peak", a["mountain_peak"]),
+                         ("mountain_rock", a["mountain_rock"])):
+         m = store.obstacle == ids[name]
+         store.top[m] = pick(pool, m)
+
+   def export_json(self, path="saved_map.json"):
+      # Human-readable export: one dict per tile.
+      data = {
+         "seeds": [self._ex, self._ey, self._mx, self._my],
+         "tiles": [[t.to_dict() for t in col] for col in self.map_data],
+         **self._history(),
+      }
+      with open(path, "w") as f:
+         json.dump(data, f)
+
+   def save_delta(self, path="saved_map.delta.json"):
+      # Seed-only save: the map regenerates from self.seed and the logged gameplay
+      # mutations are replayed on load, so the file only grows with gameplay changes.
+      # Explored flags are not part of it.
+      if self.seed is None:
+         raise ValueError("this map has no known seed (loaded from a file saved without one "
+                          "or from part of a file); use save_map instead")
+      data = {
+         "format": "hideseek-delta", "version": 1,
+         "seed": self.seed, "size": [self.cols, self.rows],
+         "mutations": [list(m) for m in self.mutations],
+      }
+      with open(path, "w") as f:
+         json.dump(data, f)
+
+   def load_delta(self, path="saved_map.delta.json", backend="numpy"):
+      with open(path) as f:
+         data = json.load(f)
+      self._apply_delta(data, backend)
+
+   def _apply_delta(self, data, backend="numpy"):
+      if list(data["size"]) != [self.cols, self.rows]:
+         raise ValueError(f"delta save is for a {data['size'][0]}x{data['size'][1]} map, "
+                          f"this map is {self.cols}x{self.rows}")
+      self.seed = data["seed"]
+      self.generate_map(backend)
+      for op, x, y in data["mutations"]:
+         if op not in MUTATIONS:
+            raise ValueError(f"unknown mutation {op!r} in delta save")
+         getattr(self, op)(x, y)
+
+   def _load_json(self, path):
+      with open(path) as f:
+         data = json.load(f)
+      if data.get("format") == "hideseek-delta":
+         return self._apply_delta(data)
+      self._ex, self._ey, self._mx, self._my = data["seeds"]
+      self._restore_history(data)
+      for col in data["tiles"]:
+         for td in col:
+            x, y = td["x"], td["y"]
+            self.map_data[x][y] = Tile.from_dict(td, self.tile_size)
+      self._reapply_surfaces()
+      self._terrain_replaced()
+
+   def _history(self):
+      # Master seed and mutation log, stored with full saves so save_delta works after a load.
+      return {"seed": self.seed, "mutations": [list(m) for m in self.mutations]}
+
+   def _restore_history(self, data):
+      # Files written before the seed was stored leave it unknown (save_delta refuses).
+      self.seed = data.get("seed")
+      self.mutations = [tuple(m) for m in data.get("mutations", ())]
+
+   def _reapply_surfaces(self):
+      # After load, tile state is restored but surfaces are gone – re-attach them here.
+      for x in range(self.cols):
+         for y in range(self.rows):
+            t = self.map_data[x][y]
+            obs = t.obstacle
+
+            if t.biom == "lake":
+               key = "water_coast" if "coast" in (obs or "") \
+                     else "water_shallow" if "shallow" in (obs or "") \
+                     else "water_deep"
+               t.bg_surface = self.rng.choice(self.assets[key])
+            elif t.biom == "shore":
+               t.bg_surface = self._sand(x, y)
+            else:
+               t.bg_surface = self._grass(x, y)
+               if obs == "tree":
+                  t.place_tree(self._tree(t.biom))
+               elif obs == "rock":
+                  t.place_rock(self._rock())
+               elif obs == "mountain_peak":
+                  t.place_mountain_peak(self.rng.choice(self.assets["mountain_peak"]))
+               elif obs == "mountain_rock":
+                  t.place_mountain_rock(self.rng.choice(self.assets["mountain_rock"]))
+
@@ -0,0 +1,110 @@
+import json
+import struct
+import zlib
+import numpy as np
+
+# Versioned binary map file.
+#
+#   header   magic "HSMAP\0", version, flags, cols, rows, 4 noise seeds, layer count
+#   meta     (version 2+) byte offset and size of the meta blob
+#   index    per layer: name, dtype, byte offset, stored size
+#   layers   (cols, rows) C-order arrays indexed [x, y], each aligned to ALIGN bytes
+#   blob     (version 2+) JSON dict after the last layer: master seed, mutation log
+#
+# Uncompressed layers can be memory-mapped so only the pages that are read get loaded;
+# compressed layers are zlib streams and are inflated on first access.
+
+MAGIC   = b"HSMAP\0"
+VERSION = 2
+ALIGN   = 64
+
+FLAG_COMPRESSED = 1
+
+_HEADER = struct.Struct("<6sHHII4dH")
+_META   = struct.Struct("<QQ")
+_ENTRY  = struct.Struct("<16s8sQQ")
+
+class MapFormatError(ValueError):
+   pass
+
+def is_map_file(path):
+   with open(path, "rb") as f:
+      return f.read(len(MAGIC)) == MAGIC
+
+def write(path, cols, rows, seeds, layers, compress=False, meta=None):
+   # layers: dict name -> (cols, rows) array; meta: JSON-serialisable dict
+   flags = FLAG_COMPRESSED if compress else 0
+   blobs = []
+   for name, arr in layers.items():
+      arr = np.ascontiguousarray(arr)
+      if arr.shape != (cols, rows):
+         raise MapFormatError(f"layer {name!r} has shape {arr.shape}, expected {(cols, rows)}")
+      raw = arr.tobytes()
+      blobs.append((name, arr.dtype.str, zlib.compress(raw, 6) if compress else raw))
+
+   offset = _HEADER.size + _META.size + _ENTRY.size * len(blobs)
+   entries = []
+   for name, dtype, data in blobs:
+      offset = -(-offset // ALIGN) * ALIGN
+      entries.append((name, dtype, offset, data))
+      offset += len(data)
+   extra = json.dumps(meta or {}).encode()
+
+   with open(path, "wb") as f:
+      f.write(_HEADER.pack(MAGIC, VERSION, flags, cols, rows, *seeds, len(entries)))
+      f.write(_META.pack(offset, len(extra)))
+      for name, dtype, off, data in entries:
+         f.write(_ENTRY.pack(name.encode(), dtype.encode(), off, len(data)))
+      for name, dtype, off, data in entries:
+         f.write(b"\0" * (off - f.tell()))
+         f.write(data)
+      f.write(extra)
+
+class MapFile:
+   # Read side: header on construction, layers on demand.
+   def __init__(self, path):
+      self.path = path
+      with open(path, "rb") as f:
+         head = f.read(_HEADER.size)
+         if len(head) < _HEADER.size or head[:len(MAGIC)] != MAGIC:
+            raise MapFormatError(f"{path} is not a binary map file")
+         magic, version, flags, cols, rows, ex, ey, mx, my, count = _HEADER.unpack(head)
+         if version > VERSION:
+            raise MapFormatError(f"{path} has format version {version}, newest supported is {VERSION}")
+         meta_at = _META.unpack(f.read(_META.size)) if version >= 2 else None
+         self.index = {}
+         for _ in range(count):
+            name, dtype, off, size = _ENTRY.unpack(f.read(_ENTRY.size))
+            self.index[name.rstrip(b"\0").decode()] = (np.dtype(dtype.rstrip(b"\0").decode()), off, size)
+         self.meta = {}
+         if meta_at:
+            f.seek(meta_at[0])
+            self.meta = json.loads(f.read(meta_at[1]))
+
+      self.version    = version
+      self.compressed = bool(flags & FLAG_COMPRESSED)
+      self.cols       = cols
+      self.rows       = rows
+      self.seeds      = (ex, ey, mx, my)
+      self._cache     = {}
+
+   def layer(self, name):
+      # Full layer; a read-only memory map when the file is uncompressed.
+      if name in self._cache:
+         return self._cache[name]
+      if name not in self.index:
+         raise MapFormatError(f"{self.path} has no layer {name!r}")
+      dtype, off, size = self.index[name]
+      shape = (self.cols, self.rows)
+      if self.compressed:
+         with open(self.path, "rb") as f:
+            f.seek(off)
+            arr = np.frombuffer(zlib.decompress(f.read(size)), dtype=dtype).reshape(shape)
+      else:
+         arr = np.memmap(self.path, dtype=dtype, mode="r", offset=off, shape=shape)
+      self._cache[name] = arr
+      return arr
+
+   def window(self, name, x0, y0, w, h):
+      # Copy of one rectangle of a layer; with a memory map only its pages are read.
+      return np.array(self.layer(name)[x0:x0 + w, y0:y0 + h])
@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import path_service
+from grid_search import WalkGrid, astar
+
+# Lower goes first; anything not listed runs with the explore / wander group.
+PRIORITY = {"chase": 0, "flee": 0, "explore": 1, "wander": 1}
+# Default time the scheduler may spend solving per frame.
+FRAME_BUDGET_MS = 2.0
+
+# ── worker side (process pool) ───────────────────────────────────────────────
+_grid = None
+
+def _worker_init(shared, stride):
+   # shared is the scheduler's RawArray: workers read the grid the main process keeps current.
+   global _grid
+   _grid = (memoryview(shared).cast("B"), stride)
+
+def _worker_walkable(x, y):
+   grid, stride = _grid
+   return bool(grid[(x + 1) * stride + y + 1])
+
+def _worker_solve(start, goal):
+   return astar(_worker_walkable, start, goal)
+
+def _deliver(owner, path):
+   # Default delivery: the path from wherever the owner got to while it waited.
+   # An owner left without any path hears about an empty result too.
+   if path:
+      here = owner.get_tile_pos()
+      if here in path:
+         path = path[path.index(here) + 1:]
+      owner.set_path(path)
+   elif not owner.path:
+      owner.set_path([])
+
+class PathScheduler:
+   # Queues path requests instead of solving them inside update(), so a burst of agents
+   # needing paths on one frame is spread over the next frames. run() is called once per
+   # frame and solves requests in priority order until budget_ms is used up (always at
+   # least one, so nothing starves). Each owner has at most one live request; a newer one
+   # replaces it. Owners keep their current path until the result arrives through set_path.
+   # With workers > 0 plain start / goal requests go to one long-lived process pool and are
+   # collected on later frames. The workers read the walkable grid from shared memory, which
+   # is brought up to date before each dispatch. A request remembers the map version it was
+   # sent at; a result from an older version is delivered only if every tile of its path is
+   # still walkable, otherwise the request is queued again.
+   def __init__(self, map_ref, budget_ms=FRAME_BUDGET_MS, workers=0):
+      self.map       = map_ref
+      self.budget_ms = budget_ms
+      self.workers   = workers
+
+      self.heap    = []
+      self.pending = {}             # owner -> sequence number of its live request
+      self.seq     = itertools.count()
+
+      self.pool       = None
+      self.walk       = WalkGrid(map_ref) if workers else None
+      self.shared     = None        # RawArray copy of the walk grid the workers read
+      self.shared_ver = None
+      self.flying     = {}          # future -> (request, map version it was sent at)
+
+      self.solved = 0
+
+   # ── submission ────────────────────────────────────────────────────────────
+   def submit(self, owner, kind, solve=None, deliver=None, goal=None):
+      # Either solve() -> path runs inline, or goal is solved from the owner's tile then.
+      n = next(self.seq)
+      self.pending[owner] = n
+      heapq.heappush(self.heap, (PRIORITY.get(kind, 1), n, owner, solve, deliver or _deliver, goal))
+
+   def waiting(self, owner):
+      return owner in self.pending
+
+   def cancel(self, owner):
+      self.pending.pop(owner, None)
+
+   # ── per frame ─────────────────────────────────────────────────────────────
+   def run(self, budget_ms=None):
+      budget = self.budget_ms if budget_ms is None else budget_ms
+      deadline = time.perf_counter() + budget / 1000
+      if self.workers:
+         self._collect()
+
+      done, held = 0, []
+      while self.heap:
+         req = self.heap[0]
+         _, n, owner, solve, deliver, goal = req
+         if self.pending.get(owner) != n:
+            heapq.heappop(self.heap)
+            continue
+         if done and time.perf_counter() >= deadline:
+            break
+         if solve is None and self.workers:
+            if len(self.flying) >= self.workers * 2:
+               # Workers are saturated: set it aside so inline requests behind it still run.
+               held.append(heapq.heappop(self.heap))
+               continue
+            heapq.heappop(self.heap)
+            self._dispatch(req)
+            continue
+
+         heapq.heappop(self.heap)
+         del self.pending[owner]
+         if solve is None:
+            path = path_service.for_map(self.map).find_path(owner.get_tile_pos(), goal)
+         else:
+            path = solve()
+         deliver(owner, path)
+         done += 1
+      for req in held:
+         heapq.heappush(self.heap, req)
+      self.solved += done
+      return done
+
+   # ── process pool ──────────────────────────────────────────────────────────
+   def _publish(self):
+      # Copies the walk grid into the workers' shared memory when the map changed.
+      grid = self.walk.sync()
+      if self.shared is None:
+         self.shared = multiprocessing.RawArray("B", len(grid))
+      if self.shared_ver != self.map.version:
+         memoryview(self.shared).cast("B")[:] = grid
+         self.shared_ver = self.map.version
+
+   def _dispatch(self, req):
+      self._publish()
+      if self.pool is None:
+         self.pool = ProcessPoolExecutor(self.workers, initializer=_worker_init,
+                                         initargs=(self.shared, self.walk.stride))
+      owner, goal = req[2], req[5]
+      self.flying[self.pool.submit(_worker_solve, owner.get_tile_pos(), goal)] = (req, self.map.version)
+
+   def _still_valid(self, path):
+      return path is not None and all(self.map.is_walkable(x, y) for x, y in path)
+
+   def _collect(self):
+      for fut in [f for f in self.flying if f.done()]:
+         req, version = self.flying.pop(fut)
+         _, n, owner, _, deliver, _ = req
+         if self.pending.get(owner) != n:
+            continue
+         if fut.cancelled() or fut.exception():
+            heapq.heappush(self.heap, req)
+            continue
+         path = fut.result()
+         if version != self.map.version and not self._still_valid(path):
+            # Solved on terrain that changed since; solve again on the current grid
+            heapq.heappush(self.heap, req)
+            continue
+         del self.pending[owner]
+         deliver(owner, path)
+         self.solved += 1
+
+   def close(self):
+      if self.pool is not None:
+         self.pool.shutdown(wait=False, cancel_futures=True)
+         self.pool = None
+
+def for_map(map_ref, budget_ms=FRAME_BUDGET_MS, workers=0):
+   # Turns on queued pathfinding for map_ref; created on first use.
+   if map_ref.path_queue is None:
+      map_ref.path_queue = PathScheduler(map_ref, budget_ms, workers)
+   return map_ref.path_queue
+
+def request(owner, kind, solve=None, deliver=None, goal=None):
+   # Solves right away when the map has no scheduler, otherwise queues the request.
+   queue = owner.map.path_queue
+   if queue is not None:
+      queue.submit(owner, kind, solve, deliver, goal)
+      return
+   if solve is None:
+      path = path_service.for_map(owner.map).find_path(owner.get_tile_pos(), goal)
+   else:
+      path = solve()
+   (deliver or _deliver)(owner, path)
+
+def waiting(owner):
+   queue = owner.map.path_queue
+   return queue is not None and queue.waiting(owner)
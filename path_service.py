@@ -0,0 +1,119 @@
+from collections import OrderedDict
+
+from grid_search import AStar
+from hpa import HierarchicalPathfinder
+from jps import JumpPointSearch
+
+# Upper bound on cached (start, goal) results per map.
+MAX_CACHED_PATHS = 2048
+
+# Solvers selectable by name; each takes the map and exposes find_path(start, goal).
+BACKENDS = {
+   "astar": AStar,
+   "hpa":   HierarchicalPathfinder,
+   "jps":   JumpPointSearch,
+}
+
+class PathService:
+   # One pathfinder shared by every agent and animal on a map.
+   # Results are kept in an LRU keyed by (start, goal); a query whose start lies on a
+   # cached path to the same goal reuses that path's tail, and one whose goal lies on a
+   # cached path from the same start reuses its head. Everything cached is dropped as soon
+   # as map.version moves (any mutation, regeneration or load).
+   # Exposes find_path(start, goal) like AStar, so callers use it as a drop-in.
+   # backend picks the solver from BACKENDS ("hpa" for long routes on big maps, "jps" for
+   # exact paths across open terrain).
+   def __init__(self, map_ref, solver=None, max_entries=MAX_CACHED_PATHS, backend="astar"):
+      self.map         = map_ref
+      self.backend     = backend
+      self.solver      = solver or BACKENDS[backend](map_ref)
+      self.max_entries = max_entries
+
+      self.cache    = OrderedDict()   # (start, goal) -> path or None
+      self.by_goal  = {}              # goal -> set of cached starts
+      self.by_start = {}              # start -> set of cached goals
+      self.version  = map_ref.version
+
+      self.hits   = 0
+      self.misses = 0
+
+   # ── cache bookkeeping ─────────────────────────────────────────────────────
+   def clear(self):
+      self.cache.clear()
+      self.by_goal.clear()
+      self.by_start.clear()
+
+   def _sync(self):
+      if self.version != self.map.version:
+         self.clear()
+         self.version = self.map.version
+
+   def _store(self, start, goal, path):
+      self.cache[(start, goal)] = path
+      self.by_goal.setdefault(goal, set()).add(start)
+      self.by_start.setdefault(start, set()).add(goal)
+      while len(self.cache) > self.max_entries:
+         (s, g), _ = self.cache.popitem(last=False)
+         self.by_goal[g].discard(s)
+         if not self.by_goal[g]:
+            del self.by_goal[g]
+         self.by_start[s].discard(g)
+         if not self.by_start[s]:
+            del self.by_start[s]
+
+   def _reuse(self, start, goal):
+      # Tail of a cached path to the same goal that passes through start.
+      for s in self.by_goal.get(goal, ()):
+         path = self.cache.get((s, goal))
+         if not path or start not in path:
+            continue
+         i = path.index(start)
+         with_start = path[0] == s
+         return path[i:] if with_start else path[i + 1:]
+
+      # Head of a cached path from the same start that passes through goal.
+      for g in self.by_start.get(start, ()):
+         path = self.cache.get((start, g))
+         if not path or goal not in path:
+            continue
+         return path[:path.index(goal) + 1]
+      return None
+
+   def set_backend(self, backend):
+      # Switches solver; cached paths are still walkable routes and stay in the cache.
+      if backend != self.backend:
+         if hasattr(self.solver, "detach"):
+            self.solver.detach()
+         self.solver  = BACKENDS[backend](self.map)
+         self.backend = backend
+      return self
+
+   # ── queries ───────────────────────────────────────────────────────────────
+   def find_path(self, start, goal):
+      start, goal = tuple(start), tuple(goal)
+      self._sync()
+
+      key = (start, goal)
+      if key in self.cache:
+         self.cache.move_to_end(key)
+         self.hits += 1
+         path = self.cache[key]
+         return list(path) if path is not None else None
+
+      path = self._reuse(start, goal)
+      if path:
+         self.hits += 1
+      else:
+         self.misses += 1
+         path = self.solver.find_path(start, goal)
+         path = [tuple(p) for p in path] if path else path
+      self._store(start, goal, path)
+      return list(path) if path is not None else None
+
+def for_map(map_ref, backend=None):
+   # The map's shared PathService, created on first use; backend switches its solver.
+   if map_ref.path_service is None:
+      map_ref.path_service = PathService(map_ref, backend=backend or "astar")
+   elif backend:
+      map_ref.path_service.set_backend(backend)
+   return map_ref.path_service
@@ -0,0 +1,248 @@
+import random
+
+import entity_store
+import fov
+import spatial_index
+import tick_scheduler
+from grid_search import manhattan
+from map_core import MapCore
+from agents import Villager, Seeker
+from animals import Cow
+
+# Fixed simulation step in seconds; entity speeds are per step, so this only scales reported time.
+TIMESTEP = 1 / 60
+# Steps before a round ends with the remaining villagers counted as survivors.
+MAX_STEPS = 60 * 60 * 3
+# A villager is caught when the seeker gets this close (tiles, manhattan).
+CATCH_DISTANCE = 1
+# Cows notice villagers / seekers within this many tiles.
+COW_ALERT = 4
+
+# ── perception and catches ────────────────────────────────────────────────────
+# What an entity perceives this step and who gets caught; shared with the interactive
+# game (main.py).
+def villager_context(v, sight):
+   # A villager reacts to the nearest seeker it has line of sight to.
+   seen = [v.index.position(s) for s in sight.visible_entities(v, Seeker)]
+   if not seen:
+      return {}
+   here = v.get_tile_pos()
+   return {"enemy_visible": True, "enemy_pos": min(seen, key=lambda p: manhattan(here, p))}
+
+def cow_context(c):
+   threat = c.index.nearest(c.get_tile_pos(), (Villager, Seeker), COW_ALERT)
+   if threat is None:
+      return {}
+   return {"danger": True, "danger_pos": c.index.position(threat)}
+
+def context(e, sight):
+   if isinstance(e, Villager):
+      return villager_context(e, sight)
+   if isinstance(e, Cow):
+      return cow_context(e)
+   return {}
+
+def catch(seekers, index):
+   # Villagers within CATCH_DISTANCE of a seeker leave play; returns the ones caught now.
+   caught = []
+   for s in seekers:
+      sx, sy = s.get_tile_pos()
+      for v in index.query_radius((sx, sy), CATCH_DISTANCE, Villager):
+         x, y = index.position(v)
+         if not v.caught and abs(x - sx) + abs(y - sy) <= CATCH_DISTANCE:
+            v.caught = True
+            v.drop_route()
+            v.path = []
+            index.remove(v)
+            caught.append(v)
+   return caught
+
+class Simulation:
+   # Headless hide-and-seek: builds a map without loading any surface (a map_core.MapCore),
+   # spawns villagers, seekers and cows and steps update(context) at a fixed timestep with
+   # no frame cap. run_round() returns one round's results; the map is generated once and
+   # reused by every round. Anything that wants to watch (a renderer, a recorder) is an
+   # observer: a callable taking the simulation, run after every step.
+   # With lod=True entities update through a TickScheduler focused on the seekers, so
+   # distant quiet entities decide less often. Off by default: they still walk every step,
+   # but react up to a tier period late, so rounds end close to, not exactly like, a full run.
+   def __init__(self, width=1280, height=640, tile_size=16, seed=None, villagers=8, seekers=1,
+                cows=6, max_steps=MAX_STEPS, timestep=TIMESTEP, headless=True, backend="numpy",
+                lod=False):
+      self.seed      = random.randrange(2 ** 63) if seed is None else seed
+      self.counts    = {"villagers": villagers, "seekers": seekers, "cows": cows}
+      self.max_steps = max_steps
+      self.timestep  = timestep
+      self.observers = []
+      self.lod       = lod
+
+      if headless:
+         self.map = MapCore(width, height, tile_size, seed=self.seed)
+      else:
+         # Only a watched simulation pays for pygame and the tile surfaces
+         from map_generator import Map
+         self.map = Map(width, height, tile_size, seed=self.seed)
+      self.map.generate_map(backend)
+      self.walkable = [(x, y) for x, y in zip(*self.map.store.walkable_mask().nonzero())]
+
+      self.round = 0
+      self.steps = 0
+      self.villagers, self.seekers, self.cows = [], [], []
+
+   def attach(self, observer):
+      self.observers.append(observer)
+      return observer
+
+   # ── round setup ───────────────────────────────────────────────────────────
+   def _spawn(self, cls, n, rng):
+      ts = self.map.tile_size
+      out = []
+      for _ in range(n):
+         x, y = rng.choice(self.walkable)
+         out.append(cls(int(x) * ts, int(y) * ts, None, self.map))
+      return out
+
+   def reset(self):
+      # Fresh entities for the next round; global random (used by the entities) is reseeded
+      # so a (seed, round) pair always plays out the same.
+      rng = random.Random(f"{self.seed}:round:{self.round}")
+      random.seed(f"{self.seed}:entities:{self.round}")
+      m = self.map
+      m.entity_index = spatial_index.SpatialHash()
+      m.entity_store = entity_store.EntityStore()
+      m.tick_scheduler = None
+      if m.replanner is not None:
+         m.replanner.planners.clear()
+      m.clear_explored()
+
+      self.villagers = self._spawn(Villager, self.counts["villagers"], rng)
+      self.seekers   = self._spawn(Seeker, self.counts["seekers"], rng)
+      self.cows      = self._spawn(Cow, self.counts["cows"], rng)
+      self.steps     = 0
+      self.caught_at = {}
+      self.last_tile = {e: e.get_tile_pos() for e in self.entities()}
+      self.travelled = {e: 0 for e in self.last_tile}
+
+   def entities(self):
+      return self.villagers + self.seekers + self.cows
+
+   # ── stepping ──────────────────────────────────────────────────────────────
+   def step(self):
+      # Needs / stamina of every entity first, in one vectorized pass
+      self.map.entity_store.tick()
+      sight = fov.for_map(self.map)
+      if self.lod:
+         ai = tick_scheduler.for_map(self.map)
+         ai.focus(points=[s.get_tile_pos() for s in self.seekers])
+         ai.run(lambda e: context(e, sight))
+      else:
+         active = [v for v in self.villagers if not v.caught]
+         for v in active:
+            v.update(villager_context(v, sight))
+         for s in self.seekers:
+            s.update({})
+         for c in self.cows:
+            c.update(cow_context(c))
+
+      for v in catch(self.seekers, self.map.entity_index):
+         self.caught_at[v] = self.steps
+
+      for e, (ox, oy) in self.last_tile.items():
+         x, y = e.get_tile_pos()
+         self.travelled[e] += abs(x - ox) + abs(y - oy)
+         self.last_tile[e] = (x, y)
+
+      self.steps += 1
+      for observer in self.observers:
+         observer(self)
+
+   def done(self):
+      return self.steps >= self.max_steps or all(v.caught for v in self.villagers)
+
+   def run_round(self):
+      self.reset()
+      while not self.done():
+         self.step()
+      result = self.result()
+      self.round += 1
+      return result
+
+   def run(self, rounds):
+      return [self.run_round() for _ in range(rounds)]
+
+   def result(self):
+      n = len(self.villagers)
+      catches = sorted(self.caught_at.values())
+      return {
+         "seed": self.seed,
+         "round": self.round,
+         "steps": self.steps,
+         "time": self.steps * self.timestep,
+         "villagers": n,
+         "caught": len(catches),
+         "survival_rate": (n - len(catches)) / n if n else 1.0,
+         "catch_times": [t * self.timestep for t in catches],
+         "first_catch": catches[0] * self.timestep if catches else None,
+         "distance": {
+            "villagers": sum(self.travelled[e] for e in self.villagers),
+            "seekers":   sum(self.travelled[e] for e in self.seekers),
+            "cows":      sum(self.travelled[e] for e in self.cows),
+         },
+         "explored": int(self.map.store.explored_mask().sum()),
+      }
+
+class PygameObserver:
+   # Optional window onto a running Simulation (needs Simulation(headless=False)).
+   # Draws the map and a dot per entity after each step; fps caps the pace, 0 runs uncapped.
+   COLORS = {Villager: (40, 120, 230), Seeker: (220, 40, 40), Cow: (240, 240, 240)}
+
+   def __init__(self, screen, fps=60):
+      import pygame
+      self.pygame = pygame
+      self.screen = screen
+      self.clock  = pygame.time.Clock()
+      self.fps    = fps
+      self.closed = False
+
+   def __call__(self, sim):
+      pygame = self.pygame
+      for event in pygame.event.get():
+         if event.type == pygame.QUIT:
+            self.closed = True
+            sim.max_steps = sim.steps
+
+      m = sim.map
+      self.screen.fill((255, 255, 255))
+      m.draw(self.screen)
+      ts, zoom, cam = m.tile_size, m.zoom_factor, m.camera_offset
+      for e in sim.entities():
+         if getattr(e, "caught", False):
+            continue
+         x, y = e.get_tile_pos()
+         center = (int((x + 0.5) * ts * zoom - cam.x), int((y + 0.5) * ts * zoom - cam.y))
+         pygame.draw.circle(self.screen, self.COLORS[type(e)], center, max(2, int(ts * zoom / 3)))
+      pygame.display.flip()
+      if self.fps:
+         self.clock.tick(self.fps)
+
+if __name__ == "__main__":
+   import argparse
+   import json
+
+   parser = argparse.ArgumentParser(description="Run headless hide-and-seek rounds.")
+   parser.add_argument("--rounds", type=int, default=10)
+   parser.add_argument("--seed", type=int, default=None)
+   parser.add_argument("--watch", action="store_true", help="open a window and draw every step")
+   args = parser.parse_args()
+
+   if args.watch:
+      import pygame
+      pygame.init()
+      screen = pygame.display.set_mode((1280, 640))
+      sim = Simulation(seed=args.seed, headless=False)
+      sim.attach(PygameObserver(screen))
+   else:
+      sim = Simulation(seed=args.seed)
+
+   for _ in range(args.rounds):
+      print(json.dumps(sim.run_round()))
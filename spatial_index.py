@@ -0,0 +1,134 @@
+import math
+
+# Tiles per side of one bucket; about one vision radius so a radius query reads ~4-9 buckets.
+BUCKET_TILES = 8
+
+class SpatialHash:
+   # Uniform bucket grid over tile coordinates holding the map's entities.
+   # Entities insert themselves on creation and call move() after each move_along_path;
+   # a move that stays on the same tile costs one dict lookup. Queries only read the
+   # buckets overlapping their area, so cost follows local density, not entity count.
+   # kind filters are a class or tuple of classes (isinstance).
+   def __init__(self, bucket_tiles=BUCKET_TILES):
+      self.size    = bucket_tiles
+      self.buckets = {}           # (bx, by) -> {entity: None}, insertion ordered so runs repeat
+      self.tiles   = {}           # entity -> tile it is filed under
+      self.extent  = None         # bucket bounds ever used (bx0, by0, bx1, by1); only grows
+
+   def __len__(self):
+      return len(self.tiles)
+
+   def _bucket(self, x, y):
+      return (x // self.size, y // self.size)
+
+   def _file(self, entity, key):
+      self.buckets.setdefault(key, {})[entity] = None
+      bx, by = key
+      if self.extent is None:
+         self.extent = (bx, by, bx, by)
+      else:
+         x0, y0, x1, y1 = self.extent
+         self.extent = (min(x0, bx), min(y0, by), max(x1, bx), max(y1, by))
+
+   def _ring(self, bx, by, ring):
+      # Bucket keys on the square ring `ring` buckets away from (bx, by).
+      if ring == 0:
+         yield (bx, by)
+         return
+      for kx in range(bx - ring, bx + ring + 1):
+         yield (kx, by - ring)
+         yield (kx, by + ring)
+      for ky in range(by - ring + 1, by + ring):
+         yield (bx - ring, ky)
+         yield (bx + ring, ky)
+
+   # ── maintenance ───────────────────────────────────────────────────────────
+   def insert(self, entity):
+      tile = entity.get_tile_pos()
+      self.tiles[entity] = tile
+      self._file(entity, self._bucket(*tile))
+
+   def remove(self, entity):
+      tile = self.tiles.pop(entity, None)
+      if tile is None:
+         return
+      key = self._bucket(*tile)
+      bucket = self.buckets[key]
+      bucket.pop(entity, None)
+      if not bucket:
+         del self.buckets[key]
+
+   def move(self, entity):
+      tile = entity.get_tile_pos()
+      old = self.tiles.get(entity)
+      if old == tile:
+         return
+      if old is None:
+         self.insert(entity)
+         return
+      self.tiles[entity] = tile
+      a, b = self._bucket(*old), self._bucket(*tile)
+      if a != b:
+         bucket = self.buckets[a]
+         bucket.pop(entity, None)
+         if not bucket:
+            del self.buckets[a]
+         self._file(entity, b)
+
+   def position(self, entity):
+      return self.tiles.get(entity)
+
+   # ── queries ───────────────────────────────────────────────────────────────
+   def query_rect(self, x0, y0, x1, y1, kind=None):
+      # Entities on tiles x0..x1, y0..y1 (inclusive).
+      out = []
+      bx0, by0 = self._bucket(x0, y0)
+      bx1, by1 = self._bucket(x1, y1)
+      tiles = self.tiles
+      for bx in range(bx0, bx1 + 1):
+         for by in range(by0, by1 + 1):
+            for e in self.buckets.get((bx, by), ()):
+               x, y = tiles[e]
+               if x0 <= x <= x1 and y0 <= y <= y1 and (kind is None or isinstance(e, kind)):
+                  out.append(e)
+      return out
+
+   def query_radius(self, center, radius, kind=None, exclude=None):
+      # Entities within radius tiles (euclidean) of center.
+      cx, cy = center
+      r = int(math.ceil(radius))
+      r2 = radius * radius
+      tiles = self.tiles
+      return [e for e in self.query_rect(cx - r, cy - r, cx + r, cy + r, kind)
+              if e is not exclude and (tiles[e][0] - cx) ** 2 + (tiles[e][1] - cy) ** 2 <= r2]
+
+   def nearest(self, center, kind=None, max_radius=None, exclude=None):
+      # Closest matching entity, searching outwards ring by ring of buckets.
+      cx, cy = center
+      bx, by = self._bucket(cx, cy)
+      best, best_d2 = None, math.inf
+      limit = math.inf if max_radius is None else max_radius * max_radius
+      if self.extent is None:
+         return None
+      x0, y0, x1, y1 = self.extent
+      rings = max(bx - x0, x1 - bx, by - y0, y1 - by, 0)
+      for ring in range(rings + 1):
+         # Nothing in this ring can be closer than (ring - 1) whole buckets away.
+         near = max(0, (ring - 1) * self.size)
+         if near * near > min(best_d2, limit):
+            break
+         for key in self._ring(bx, by, ring):
+            for e in self.buckets.get(key, ()):
+               if e is exclude or (kind is not None and not isinstance(e, kind)):
+                  continue
+               x, y = self.tiles[e]
+               d2 = (x - cx) ** 2 + (y - cy) ** 2
+               if d2 < best_d2 and d2 <= limit:
+                  best, best_d2 = e, d2
+      return best
+
+def for_map(map_ref):
+   # The map's shared entity index, created on first use.
+   if map_ref.entity_index is None:
+      map_ref.entity_index = SpatialHash()
+   return map_ref.entity_index
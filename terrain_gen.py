@@ -0,0 +1,422 @@
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Array-based terrain generation backend.
+# Produces the same world as Map.generate_map() for the same seeds and random state,
+# but keeps every intermediate layer as a NumPy grid indexed [x, y].
+
+# Thresholds are not duplicated here: callers pass the map configuration
+# (see Map.gen_config()) as a dict with keys water_t, sand_t, high_t, oak_t,
+# darkpine_t, coast_d and shallow_d.
+
+# Small integer ids for biomes / obstacles; index 0 of OBSTACLES is "no obstacle".
+BIOMES    = ("grassland", "shore", "lake", "highland", "oak_forest", "darkpine_forest", "mountain")
+OBSTACLES = (None, "tree", "rock", "mountain_peak", "mountain_rock",
+             "water_deep", "water_shallow", "water_coast")
+
+BIOME_ID    = {name: i for i, name in enumerate(BIOMES)}
+OBSTACLE_ID = {name: i for i, name in enumerate(OBSTACLES)}
+
+GRASSLAND, SHORE, LAKE, HIGHLAND, OAK_FOREST, DARKPINE_FOREST, MOUNTAIN = range(len(BIOMES))
+NO_OBSTACLE, TREE, ROCK, MOUNTAIN_PEAK, MOUNTAIN_ROCK, WATER_DEEP, WATER_SHALLOW, WATER_COAST = range(len(OBSTACLES))
+
+# ── perlin noise ───────────────────────────────────────────────────────────────────────────
+# Port of noise.pnoise2 (Casey Duncan's "noise" package) evaluated over whole arrays.
+# All arithmetic stays in float32 like the C implementation so results match bit for bit.
+_PERM = np.array([
+   151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140,
+   36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247, 120,
+   234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33,
+   88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175, 74, 165, 71,
+   134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122, 60, 211, 133,
+   230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161,
+   1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130,
+   116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226, 250,
+   124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207, 206, 59, 227,
+   47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213, 119, 248, 152, 2, 44,
+   154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253, 19, 98,
+   108, 110, 79, 113, 224, 232, 178, 185, 112, 104, 218, 246, 97, 228, 251, 34,
+   242, 193, 238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14,
+   239, 107, 49, 192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115, 121,
+   50, 45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72, 243,
+   141, 128, 195, 78, 66, 215, 61, 156, 180,
+] * 2, dtype=np.int32)
+
+_GRAD_X = np.array([1, -1, 1, -1, 1, -1, 1, -1, 0, 0, 0, 0, 1, -1, 0, 0], dtype=np.float32)
+_GRAD_Y = np.array([1, 1, -1, -1, 0, 0, 0, 0, 1, -1, 1, -1, 0, 0, -1, 1], dtype=np.float32)
+
+def _grad2(h, x, y):
+   h = h & 15
+   return x * _GRAD_X[h] + y * _GRAD_Y[h]
+
+def _lerp(t, a, b):
+   return a + t * (b - a)
+
+def _noise2(x, y, repeatx, repeaty, base):
+   i = np.floor(np.fmod(x, repeatx)).astype(np.int32)
+   j = np.floor(np.fmod(y, repeaty)).astype(np.int32)
+   ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int32)
+   jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int32)
+   i = (i & 255) + base
+   j = (j & 255) + base
+   ii = (ii & 255) + base
+   jj = (jj & 255) + base
+
+   x = x - np.floor(x)
+   y = y - np.floor(y)
+   fx = x * x * x * (x * (x * 6 - 15) + 10)
+   fy = y * y * y * (y * (y * 6 - 15) + 10)
+
+   A = _PERM[i]
+   AA = _PERM[A + j]
+   AB = _PERM[A + jj]
+   B = _PERM[ii]
+   BA = _PERM[B + j]
+   BB = _PERM[B + jj]
+
+   return _lerp(fy, _lerp(fx, _grad2(_PERM[AA], x, y),
+                              _grad2(_PERM[BA], x - 1, y)),
+                    _lerp(fx, _grad2(_PERM[AB], x, y - 1),
+                              _grad2(_PERM[BB], x - 1, y - 1)))
+
+def pnoise2(x, y, octaves=1, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024, base=0):
+   # Vectorised pnoise2; x and y are broadcastable arrays of sample coordinates.
+   x = np.asarray(x, dtype=np.float64).astype(np.float32)
+   y = np.asarray(y, dtype=np.float64).astype(np.float32)
+   persistence = np.float32(persistence)
+   lacunarity  = np.float32(lacunarity)
+   repeatx     = np.float32(repeatx)
+   repeaty     = np.float32(repeaty)
+
+   if octaves == 1:
+      return _noise2(x, y, repeatx, repeaty, base).astype(np.float64)
+
+   freq  = np.float32(1.0)
+   amp   = np.float32(1.0)
+   total = np.zeros(np.broadcast(x, y).shape, dtype=np.float32)
+   peak  = np.float32(0.0)
+   for _ in range(octaves):
+      total += _noise2(x * freq, y * freq, repeatx * freq, repeaty * freq, base) * amp
+      peak += amp
+      freq *= lacunarity
+      amp *= persistence
+   return (total / peak).astype(np.float64)
+
+# Noise is evaluated in column blocks of about this many samples so temporaries stay in cache.
+_BLOCK = 1 << 16
+
+def _noise_grid(xs, ys, cols, rows, freq, ox, oy, **kw):
+   nx = np.asarray(xs, dtype=np.float64) / cols * freq + ox
+   ny = (np.asarray(ys, dtype=np.float64) / rows * freq + oy)[None, :]
+   out = np.empty((len(nx), ny.shape[1]), dtype=np.float64)
+   step = max(1, _BLOCK // max(1, ny.shape[1]))
+   for i in range(0, len(nx), step):
+      out[i:i + step] = pnoise2(nx[i:i + step, None], ny, **kw)
+   out += 1
+   out /= 2
+   return out
+
+def elevation(xs, ys, cols, rows, ex, ey):
+   # Same formula as Map._elev for tile columns xs and tile rows ys.
+   return _noise_grid(xs, ys, cols, rows, 3.5, ex, ey, octaves=6, persistence=0.5, lacunarity=2.1)
+
+def moisture(xs, ys, cols, rows, mx, my):
+   # Same formula as Map._moist.
+   return _noise_grid(xs, ys, cols, rows, 2.8, mx, my, octaves=4, persistence=0.55, lacunarity=2.0)
+
+# ── parallel noise ─────────────────────────────────────────────────────────────────────────
+# Tiles per side of one noise work unit.
+NOISE_CHUNK = 256
+
+def _noise_chunk(task):
+   # Worker entry point: elevation + moisture for one rectangle of tiles.
+   x0, x1, y0, y1, cols, rows, (ex, ey, mx, my) = task
+   xs, ys = np.arange(x0, x1), np.arange(y0, y1)
+   return x0, y0, elevation(xs, ys, cols, rows, ex, ey), moisture(xs, ys, cols, rows, mx, my)
+
+def noise_parallel(cols, rows, seeds, executor=None, workers=None, chunk=NOISE_CHUNK):
+   # Elevation and moisture grids computed chunk by chunk across a process pool.
+   # Every sample only depends on its own coordinates, so the stitched grids equal a
+   # single-process run exactly. Pass an executor to reuse one pool across many maps.
+   tasks = [(x0, min(cols, x0 + chunk), y0, min(rows, y0 + chunk), cols, rows, tuple(seeds))
+            for x0 in range(0, cols, chunk) for y0 in range(0, rows, chunk)]
+   elev  = np.empty((cols, rows), dtype=np.float64)
+   moist = np.empty((cols, rows), dtype=np.float64)
+
+   own = executor is None
+   if own:
+      executor = ProcessPoolExecutor(max_workers=workers)
+   try:
+      for x0, y0, e, m in executor.map(_noise_chunk, tasks):
+         elev[x0:x0 + e.shape[0], y0:y0 + e.shape[1]]  = e
+         moist[x0:x0 + m.shape[0], y0:y0 + m.shape[1]] = m
+   finally:
+      if own:
+         executor.shutdown()
+   return elev, moist
+
+# ── grid helpers ───────────────────────────────────────────────────────────────────────────
+def _shifted_or(mask):
+   # mask OR its 4-neighbourhood (binary dilation with a cross).
+   out = mask.copy()
+   out[1:, :]  |= mask[:-1, :]
+   out[:-1, :] |= mask[1:, :]
+   out[:, 1:]  |= mask[:, :-1]
+   out[:, :-1] |= mask[:, 1:]
+   return out
+
+def distance_to(sources, max_d):
+   # 4-connected (Manhattan) distance from every cell to the nearest True cell in
+   # `sources`, computed by repeated dilation. Cells further than max_d get max_d + 1.
+   dist = np.full(sources.shape, max_d + 1, dtype=np.int32)
+   reached = sources.copy()
+   dist[reached] = 0
+   for d in range(1, max_d + 1):
+      grown = _shifted_or(reached)
+      dist[grown & ~reached] = d
+      reached = grown
+   return dist
+
+def label(mask, connectivity=4):
+   # Connected-component labelling of a boolean grid.
+   # Returns (labels, sizes): labels is -1 outside the mask, otherwise a component id
+   # numbered in order of each component's first cell in x-major scan order.
+   cols, rows = mask.shape
+   flat = mask.ravel()
+
+   # Runs of consecutive mask cells along y inside each column are the graph nodes.
+   starts = mask.copy()
+   starts[:, 1:] &= ~mask[:, :-1]
+   run_id = np.cumsum(starts.ravel(), dtype=np.int32) - 1
+   n_runs = int(run_id[-1]) + 1 if flat.size else 0
+   if n_runs == 0:
+      return np.full(mask.shape, -1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+   run_of = np.where(flat, run_id, -1).reshape(mask.shape)
+
+   # Edges join runs in neighbouring columns that touch; only the first touching
+   # cell of each run pair is kept so the edge list stays about as long as the run list.
+   pairs = [(run_of[:-1, :], run_of[1:, :])]
+   if connectivity == 8:
+      pairs.append((run_of[:-1, :-1], run_of[1:, 1:]))
+      pairs.append((run_of[:-1, 1:], run_of[1:, :-1]))
+   edges_a, edges_b = [], []
+   for pa, pb in pairs:
+      keep = (pa >= 0) & (pb >= 0)
+      keep[:, 1:] &= (pa[:, 1:] != pa[:, :-1]) | (pb[:, 1:] != pb[:, :-1])
+      edges_a.append(pa[keep])
+      edges_b.append(pb[keep])
+   a = np.concatenate(edges_a)
+   b = np.concatenate(edges_b)
+
+   # Hook-and-jump union-find over the run graph.
+   parent = np.arange(n_runs, dtype=np.int32)
+   while True:
+      ra, rb = parent[a], parent[b]
+      lo, hi = np.minimum(ra, rb), np.maximum(ra, rb)
+      changed = lo != hi
+      if not changed.any():
+         break
+      np.minimum.at(parent, hi[changed], lo[changed])
+      while True:
+         nxt = parent[parent]
+         if (nxt == parent).all():
+            break
+         parent = nxt
+
+   # Roots are the lowest run id of each component, i.e. its first run in scan order.
+   roots, comp_of_run = np.unique(parent, return_inverse=True)
+   labels = np.where(flat, comp_of_run[np.maximum(run_id, 0)], -1).reshape(mask.shape)
+   sizes = np.bincount(labels[labels >= 0], minlength=len(roots))
+   return labels, sizes
+
+# ── generation ─────────────────────────────────────────────────────────────────────────────
+class TerrainArrays:
+   # Struct-of-arrays result of array generation, all shaped (cols, rows).
+   # bg / top hold the variant index into the matching asset pool (-1 = picker / none).
+   __slots__ = ("cols", "rows", "elev", "moist", "biome", "obstacle", "walkable", "bg", "top")
+
+   def __init__(self, cols, rows):
+      self.cols     = cols
+      self.rows     = rows
+      self.elev     = None
+      self.moist    = None
+      self.biome    = np.full((cols, rows), GRASSLAND, dtype=np.uint8)
+      self.obstacle = np.zeros((cols, rows), dtype=np.uint8)
+      self.walkable = np.ones((cols, rows), dtype=bool)
+      self.bg       = np.full((cols, rows), -1, dtype=np.int16)
+      self.top      = np.full((cols, rows), -1, dtype=np.int16)
+
+   def window(self, x0, y0, w, h):
+      # Sub-rectangle view of every layer.
+      out = TerrainArrays.__new__(TerrainArrays)
+      out.cols, out.rows = w, h
+      for name in ("elev", "moist", "biome", "obstacle", "walkable", "bg", "top"):
+         setattr(out, name, getattr(self, name)[x0:x0 + w, y0:y0 + h])
+      return out
+
+def classify(elev, moist, config):
+   # Pass-1 biome ids from noise thresholds (before trees, pruning or mountains).
+   biome = np.full(elev.shape, GRASSLAND, dtype=np.uint8)
+   land = elev >= config["water_t"]
+   biome[~land] = LAKE
+   shore = land & (elev < config["sand_t"])
+   biome[shore] = SHORE
+   rest = land & ~shore
+   high = rest & (elev > config["high_t"])
+   biome[high] = HIGHLAND
+   rest &= ~high
+   oak = rest & (moist > config["oak_t"])
+   biome[oak] = OAK_FOREST
+   biome[rest & ~oak & (moist < config["darkpine_t"])] = DARKPINE_FOREST
+   return biome
+
+def generate(cols, rows, seeds, pools, config, rng=random, elev=None, moist=None):
+   # Runs the full generate_map pipeline on arrays.
+   # seeds = (ex, ey, mx, my); pools maps asset bucket -> number of variants and is only
+   # used to draw variant indices so `rng` advances exactly like the per-tile generator.
+   # Precomputed elev / moist grids may be passed in (see parallel generation).
+   ex, ey, mx, my = seeds
+   coast_d, shallow_d = config["coast_d"], config["shallow_d"]
+   out = TerrainArrays(cols, rows)
+   out.elev  = elevation(np.arange(cols), np.arange(rows), cols, rows, ex, ey) if elev is None else elev
+   out.moist = moisture(np.arange(cols), np.arange(rows), cols, rows, mx, my) if moist is None else moist
+
+   biome = classify(out.elev, out.moist, config)
+   obstacle, walkable, bg, top = out.obstacle, out.walkable, out.bg, out.top
+
+   # Pass 1: random draws in the exact order of the scalar loop.
+   biome_flat = biome.ravel()
+   obstacle_flat, walkable_flat = obstacle.ravel(), walkable.ravel()
+   bg_flat, top_flat = bg.ravel(), top.ravel()
+   n_deep, n_oak, n_pine = pools["water_deep"], pools["oak"], pools["darkpine"]
+   randrange, rand = rng.randrange, rng.random
+   idx = np.flatnonzero((biome_flat == LAKE) | (biome_flat == OAK_FOREST) | (biome_flat == DARKPINE_FOREST))
+   water_at, water_var, tree_at, tree_var = [], [], [], []
+   for i, b in zip(idx.tolist(), biome_flat[idx].tolist()):
+      if b == LAKE:
+         water_at.append(i)
+         water_var.append(randrange(n_deep))
+      elif b == OAK_FOREST:
+         if rand() < 0.65:
+            tree_at.append(i)
+            tree_var.append(randrange(n_oak))
+      elif rand() < 0.70:
+         tree_at.append(i)
+         tree_var.append(randrange(n_pine))
+   bg_flat[water_at] = water_var
+   top_flat[tree_at] = tree_var
+   obstacle_flat[tree_at] = TREE
+
+   lake = biome == LAKE
+   obstacle[lake] = WATER_DEEP
+   walkable[lake] = False
+
+   # Clean the random water tiles noise
+   prune_small_lakes(out, biome, min_size=6, connectivity=4)
+
+   # Pass 2: water depth from distance to nearest land tile.
+   lake = biome == LAKE
+   dist = distance_to(~lake, shallow_d)
+   idx = np.flatnonzero((lake & (dist <= shallow_d)).ravel())
+   coast = dist.ravel()[idx] <= coast_d
+   n_coast, n_shallow = pools["water_coast"], pools["water_shallow"]
+   bg_flat[idx] = [randrange(n_coast if c else n_shallow) for c in coast.tolist()]
+   obstacle_flat[idx] = np.where(coast, WATER_COAST, WATER_SHALLOW)
+
+   # Pass 3: place mountains on highland tiles.
+   place_mountains(out, biome, pools, rng)
+
+   # Pass 4: scatter small rock clusters on grassland / forest edges.
+   place_rock_clusters(out, biome, pools, rng)
+
+   out.biome = biome
+   return out
+
+def generate_parallel(cols, rows, seeds, pools, config, rng=random, executor=None, workers=None,
+                      chunk=NOISE_CHUNK):
+   # Noise per chunk in worker processes, then the stitching stage: lake pruning, water
+   # depth, mountains and rock clusters run once over the assembled grid, so components
+   # crossing chunk borders are labelled and measured as a whole.
+   elev, moist = noise_parallel(cols, rows, seeds, executor, workers, chunk)
+   return generate(cols, rows, seeds, pools, config, rng, elev=elev, moist=moist)
+
+def generate_window(x0, y0, w, h, cols, rows, seeds, pools, config, rng=random, apron=8):
+   # Generates the tile rectangle [x0, x0 + w) x [y0, y0 + h) of an unbounded world.
+   # cols / rows only set the noise scale (as for a regular map of that size); the
+   # rectangle may lie anywhere, including negative coordinates.
+   # The pipeline runs on the rectangle grown by `apron` tiles on each side and the centre
+   # is cut out, so lake sizes and water depth near the edges see their neighbours.
+   # Highland blobs wider than the apron get their peak from the part that is visible.
+   xs = np.arange(x0 - apron, x0 + w + apron)
+   ys = np.arange(y0 - apron, y0 + h + apron)
+   elev  = elevation(xs, ys, cols, rows, seeds[0], seeds[1])
+   moist = moisture(xs, ys, cols, rows, seeds[2], seeds[3])
+   full = generate(len(xs), len(ys), seeds, pools, config, rng, elev=elev, moist=moist)
+   return full.window(apron, apron, w, h)
+
+def prune_small_lakes(out, biome, min_size=6, connectivity=4):
+   # Lake components smaller than min_size become plain grassland.
+   labels, sizes = label(biome == LAKE, connectivity)
+   small = (labels >= 0) & (sizes[np.maximum(labels, 0)] < min_size)
+   biome[small] = GRASSLAND
+   out.obstacle[small] = NO_OBSTACLE
+   out.walkable[small] = True
+   out.bg[small] = -1
+   out.top[small] = -1
+
+def place_mountains(out, biome, pools, rng=random):
+   labels, sizes = label(biome == HIGHLAND, 4)
+   if not len(sizes):
+      return
+   inside = labels >= 0
+   lab = labels[inside]
+
+   # Blobs under 4 tiles turn into grassland.
+   small = inside & (sizes[np.maximum(labels, 0)] < 4)
+   biome[small] = GRASSLAND
+
+   # Centroid of each blob is its peak.
+   xs, ys = np.nonzero(inside)
+   cx = (np.bincount(lab, weights=xs, minlength=len(sizes)) / np.maximum(sizes, 1)).astype(np.int64)
+   cy = (np.bincount(lab, weights=ys, minlength=len(sizes)) / np.maximum(sizes, 1)).astype(np.int64)
+   cx = np.clip(cx, 0, out.cols - 1)
+   cy = np.clip(cy, 0, out.rows - 1)
+
+   big = sizes[lab] >= 4
+   xs, ys, lab = xs[big], ys[big], lab[big]
+   peak = np.hypot(xs - cx[lab], ys - cy[lab]) <= 1.0
+
+   biome[xs, ys] = MOUNTAIN
+   out.walkable[xs, ys] = False
+   out.obstacle[xs, ys] = np.where(peak, MOUNTAIN_PEAK, MOUNTAIN_ROCK)
+
+   # Variant draws go blob by blob (in discovery order), tile by tile in scan order.
+   # The scalar generator walks each blob depth-first instead; both consume the same
+   # draws whenever the peak and rock pools have equal size, as the shipped assets do.
+   order = np.lexsort((xs * out.rows + ys, lab))
+   n_peak, n_rock = pools["mountain_peak"], pools["mountain_rock"]
+   randrange = rng.randrange
+   out.top[xs[order], ys[order]] = [randrange(n_peak if p else n_rock) for p in peak[order].tolist()]
+
+def place_rock_clusters(out, biome, pools, rng=random):
+   # Same walk as Map._place_rock_clusters, driven by the random stream.
+   cols, rows = out.cols, out.rows
+   obstacle, walkable, top = out.obstacle, out.walkable, out.top
+   n_rocks = pools["rocks"]
+
+   for _ in range((cols * rows) // 400):
+      ox = rng.randint(0, cols - 1)
+      oy = rng.randint(0, rows - 1)
+
+      if biome[ox, oy] not in (GRASSLAND, OAK_FOREST, DARKPINE_FOREST):
+         continue
+
+      cx, cy = ox, oy
+      for _ in range(rng.randint(3, 7)):
+         cx = max(0, min(cols - 1, cx + rng.randint(-1, 1)))
+         cy = max(0, min(rows - 1, cy + rng.randint(-1, 1)))
+         if walkable[cx, cy] and obstacle[cx, cy] in (NO_OBSTACLE, TREE):
+            obstacle[cx, cy] = ROCK
+            walkable[cx, cy] = False
+            top[cx, cy] = rng.randrange(n_rocks)
@@ -0,0 +1,278 @@
+import time
+import pygame
+import numpy as np
+from collections import OrderedDict
+
+from atlas import region
+from terrain_gen import TREE
+
+# Terrain is cut into square chunks of CHUNK_TILES x CHUNK_TILES tiles.
+CHUNK_TILES = 16
+
+# Upper bound on zoomed chunk surfaces kept around (LRU).
+MAX_SCALED_CHUNKS = 512
+
+# Time per frame spent pre-scaling chunks for the neighbouring zoom steps.
+PREFETCH_MS = 1.0
+
+class ChunkCache:
+   # Keeps one pre-rendered surface per terrain chunk.
+   # Chunks are rendered lazily and only re-rendered after a tile inside them changed,
+   # so a frame without mutations never touches individual tiles.
+   # Drawing is culled to the chunks under the camera; their zoomed copies live in an
+   # LRU keyed by zoom level, so panning at a fixed zoom never rescales anything.
+   # prefetch() uses spare frame time to scale the chunks around the view for the zoom steps
+   # next to the current one, so the first frame after a zoom change finds them cached.
+   # A chunk is rendered straight from the store's palette-index layers: each palette index
+   # maps to an (atlas, region) source, each tile slot to a precomputed destination, and the
+   # ground and overlay layers go out as one Surface.blits call each.
+   # bounded=False is used by streamed worlds: chunk coords are unlimited in every direction.
+   def __init__(self, map_ref, chunk_tiles=CHUNK_TILES, max_scaled=MAX_SCALED_CHUNKS, bounded=True):
+      self.map         = map_ref
+      self.bounded     = bounded
+      self.chunk_tiles = chunk_tiles
+      self.chunk_px    = chunk_tiles * map_ref.tile_size
+      self.chunk_cols  = -(-map_ref.cols // chunk_tiles)
+      self.chunk_rows  = -(-map_ref.rows // chunk_tiles)
+
+      self.surfaces = {}
+      self.dirty    = set()
+
+      self.scaled     = OrderedDict()
+      self.max_scaled = max_scaled
+      self._zooms     = set()
+
+      # Palette index -> blit source / area, extended as the palette grows.
+      self.sources = [None]
+      self.areas   = [None]
+      # Destination of tile slot (i, j) of a chunk window at i * (chunk_tiles + 1) + j;
+      # the second half holds the raised positions of tall sprites (trees).
+      ts, h = map_ref.tile_size, chunk_tiles + 1
+      flat = [(i * ts, j * ts) for i in range(chunk_tiles) for j in range(h)]
+      self.dests = flat + [(x, y - ts // 2) for x, y in flat]
+
+   # ── invalidation ─────────────────────────────────────────────────────────
+   def invalidate_all(self):
+      self.surfaces.clear()
+      self.dirty = set()
+      if self.bounded:
+         self.dirty = {(cx, cy) for cx in range(self.chunk_cols) for cy in range(self.chunk_rows)}
+      self.scaled.clear()
+
+   def forget(self, cx, cy):
+      # Drops every cached surface of one chunk (streamed chunk unloaded).
+      self.surfaces.pop((cx, cy), None)
+      self.dirty.discard((cx, cy))
+      self._drop_scaled(cx, cy)
+
+   def invalidate_chunk(self, cx, cy):
+      # Zoomed copies go right away; draw() would otherwise keep blitting them.
+      self.dirty.add((cx, cy))
+      self._drop_scaled(cx, cy)
+
+   def invalidate_tile(self, x, y):
+      # Tall sprites (trees) overhang half a tile upwards, so the chunk above can change too.
+      ct = self.chunk_tiles
+      self.invalidate_chunk(x // ct, y // ct)
+      if y % ct == 0 and (y > 0 or not self.bounded):
+         self.invalidate_chunk(x // ct, (y - 1) // ct)
+
+   # ── rendering ────────────────────────────────────────────────────────────
+   def chunk_rect(self, cx, cy):
+      # World-pixel rect of a chunk, clipped to the map edge.
+      x0 = cx * self.chunk_px
+      y0 = cy * self.chunk_px
+      if not self.bounded:
+         return pygame.Rect(x0, y0, self.chunk_px, self.chunk_px)
+      w = min(self.chunk_px, self.map.width  - x0)
+      h = min(self.chunk_px, self.map.height - y0)
+      return pygame.Rect(x0, y0, w, h)
+
+   def _sync_sources(self):
+      palette = self.map.palette
+      for i in range(len(self.sources), len(palette)):
+         src, area = region(palette[i])
+         self.sources.append(src)
+         self.areas.append(area)
+
+   def _layer(self, ids, raised=None):
+      # (source, dest, area) for every non-empty slot of one layer, x-major like the old loop.
+      i, j = np.nonzero(ids)
+      slot = i * (self.chunk_tiles + 1) + j
+      if raised is not None:
+         slot += raised[i, j] * (len(self.dests) // 2)
+      src, areas, dests = self.sources, self.areas, self.dests
+      return [(src[p], dests[k], areas[p]) for p, k in zip(ids[i, j].tolist(), slot.tolist())]
+
+   def _render(self, cx, cy):
+      rect = self.chunk_rect(cx, cy)
+      surf = pygame.Surface(rect.size, pygame.SRCALPHA)
+      ct = self.chunk_tiles
+      x0, y0 = cx * ct, cy * ct
+      # One extra row below so overhanging tree tops from the next chunk are included.
+      bg, top, obstacle = self.map.tile_layers(x0, y0, x0 + ct, y0 + ct + 1)
+
+      self._sync_sources()
+      surf.blits(self._layer(bg), doreturn=False)
+      surf.blits(self._layer(top, (obstacle == TREE).astype(np.intp)), doreturn=False)
+      return surf
+
+   def _drop_scaled(self, cx, cy):
+      for z in self._zooms:
+         self.scaled.pop((z, cx, cy), None)
+
+   def get(self, cx, cy):
+      if (cx, cy) in self.dirty or (cx, cy) not in self.surfaces:
+         self.surfaces[(cx, cy)] = self._render(cx, cy)
+         self.dirty.discard((cx, cy))
+         self._drop_scaled(cx, cy)
+      return self.surfaces[(cx, cy)]
+
+   def _scaled_chunk(self, cx, cy, zoom, size):
+      key = (round(zoom, 3), cx, cy)
+      surf = self.scaled.get(key)
+      if surf is not None:
+         self.scaled.move_to_end(key)
+         return surf
+
+      surf = pygame.transform.scale(self.get(cx, cy), size)
+      self.scaled[key] = surf
+      self._zooms.add(key[0])
+      while len(self.scaled) > self.max_scaled:
+         self.scaled.popitem(last=False)
+      return surf
+
+   def _zoomed_rect(self, cx, cy, zoom):
+      # Edges are derived from the zoomed world grid so neighbouring chunks never leave seams.
+      rect = self.chunk_rect(cx, cy)
+      dx, dy = int(rect.x * zoom), int(rect.y * zoom)
+      return dx, dy, (int(rect.right * zoom) - dx, int(rect.bottom * zoom) - dy)
+
+   def visible_chunks(self, zoom, camera_offset, view_size):
+      # Chunk coords whose zoomed rect intersects the screen.
+      vw, vh = view_size
+      span = self.chunk_px * zoom
+      cx0 = int(camera_offset.x // span)
+      cy0 = int(camera_offset.y // span)
+      cx1 = int((camera_offset.x + vw) // span)
+      cy1 = int((camera_offset.y + vh) // span)
+      if self.bounded:
+         cx0, cy0 = max(0, cx0), max(0, cy0)
+         cx1, cy1 = min(self.chunk_cols - 1, cx1), min(self.chunk_rows - 1, cy1)
+      return [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+
+   def draw(self, screen, zoom, camera_offset):
+      for cx, cy in self.visible_chunks(zoom, camera_offset, screen.get_size()):
+         if zoom == 1.0:
+            rect = self.chunk_rect(cx, cy)
+            surf = self.get(cx, cy)
+            dx, dy = rect.x, rect.y
+         else:
+            dx, dy, size = self._zoomed_rect(cx, cy, zoom)
+            surf = self._scaled_chunk(cx, cy, zoom, size)
+
+         screen.blit(surf, (dx - camera_offset.x, dy - camera_offset.y))
+
+   def prefetch(self, zoom, zooms, camera_offset, view_size, budget_ms=PREFETCH_MS):
+      # Scales the chunks that would be visible at each of zooms (view centre kept in place)
+      # until budget_ms is spent; returns how many it scaled.
+      deadline = time.perf_counter() + budget_ms / 1000
+      vw, vh = view_size
+      centre = pygame.Vector2(vw / 2, vh / 2)
+      done = 0
+      for z in zooms:
+         if z == 1.0 or z == zoom:
+            continue
+         cam = (camera_offset + centre) * (z / zoom) - centre
+         for cx, cy in self.visible_chunks(z, cam, view_size):
+            if (round(z, 3), cx, cy) in self.scaled:
+               continue
+            if time.perf_counter() >= deadline:
+               return done
+            self._scaled_chunk(cx, cy, z, self._zoomed_rect(cx, cy, z)[2])
+            done += 1
+      return done
+
+class MarkerOverlay:
+   # A dot on every tile picked by mask(x0, y0, x1, y1) (a bool array over that tile window),
+   # drawn over the terrain by the debug views. Each chunk's dots are rendered once per zoom
+   # into a transparent layer kept in an LRU; mark() draws newly picked tiles straight onto
+   # the layers already rendered, and draw() blits only the layers under the camera, so a
+   # frame never walks the whole grid. Chunk geometry is the map's ChunkCache's.
+   # radius is in screen pixels at zoom 1; scaled=False keeps it fixed at every zoom.
+   def __init__(self, map_ref, mask, color=(255, 0, 0), radius=3, scaled=True, max_layers=MAX_SCALED_CHUNKS):
+      self.map        = map_ref
+      self.mask       = mask
+      self.color      = color
+      self.radius     = radius
+      self.scaled     = scaled
+      self.layers     = OrderedDict()     # (zoom, cx, cy) -> Surface, or None without any dot
+      self.max_layers = max_layers
+      self._zooms     = set()
+
+   # ── invalidation ─────────────────────────────────────────────────────────
+   def invalidate_all(self):
+      self.layers.clear()
+
+   def invalidate_tile(self, x, y):
+      # A tile dropping out of the mask can't be patched; its chunk is rendered again.
+      ct = self.map.chunks.chunk_tiles
+      for z in self._zooms:
+         self.layers.pop((z, x // ct, y // ct), None)
+
+   def mark(self, tiles):
+      # Draws the dots of newly picked tiles onto the layers already rendered.
+      ct = self.map.chunks.chunk_tiles
+      for x, y in tiles:
+         cx, cy = x // ct, y // ct
+         for z in self._zooms:
+            key = (z, cx, cy)
+            if key not in self.layers:
+               continue
+            surf = self.layers[key]
+            if surf is None:
+               surf = self.layers[key] = self._blank(cx, cy, z)
+            self._dot(surf, cx, cy, x, y, z)
+
+   # ── rendering ────────────────────────────────────────────────────────────
+   def _blank(self, cx, cy, zoom):
+      return pygame.Surface(self.map.chunks._zoomed_rect(cx, cy, zoom)[2], pygame.SRCALPHA)
+
+   def _dot(self, surf, cx, cy, x, y, zoom):
+      ts = self.map.tile_size
+      ox, oy, _ = self.map.chunks._zoomed_rect(cx, cy, zoom)
+      centre = (int((x * ts + ts // 2) * zoom) - ox, int((y * ts + ts // 2) * zoom) - oy)
+      radius = max(1, int(self.radius * zoom)) if self.scaled else self.radius
+      pygame.draw.circle(surf, self.color, centre, radius)
+
+   def _render(self, cx, cy, zoom):
+      ct = self.map.chunks.chunk_tiles
+      x0, y0 = cx * ct, cy * ct
+      xs, ys = np.nonzero(self.mask(x0, y0, x0 + ct, y0 + ct))
+      if not len(xs):
+         return None
+      surf = self._blank(cx, cy, zoom)
+      for x, y in zip((xs + x0).tolist(), (ys + y0).tolist()):
+         self._dot(surf, cx, cy, x, y, zoom)
+      return surf
+
+   def _layer(self, cx, cy, zoom):
+      key = (round(zoom, 3), cx, cy)
+      if key in self.layers:
+         self.layers.move_to_end(key)
+         return self.layers[key]
+      surf = self.layers[key] = self._render(cx, cy, key[0])
+      self._zooms.add(key[0])
+      while len(self.layers) > self.max_layers:
+         self.layers.popitem(last=False)
+      return surf
+
+   def draw(self, screen, zoom, camera_offset):
+      chunks = self.map.chunks
+      blits = []
+      for cx, cy in chunks.visible_chunks(zoom, camera_offset, screen.get_size()):
+         surf = self._layer(cx, cy, zoom)
+         if surf is not None:
+            dx, dy, _ = chunks._zoomed_rect(cx, cy, zoom)
+            blits.append((surf, (dx - camera_offset.x, dy - camera_offset.y)))
+      screen.blits(blits, doreturn=False)
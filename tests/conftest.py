@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules live flat in the repository root; headless runs need no display.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
@@ -0,0 +1,35 @@
+from map_core import MapCore
+
+# Shared by the tests: small generated maps and path checks.
+
+def make_map(seed, size=480):
+   m = MapCore(size, size, tile_size=8, seed=seed)
+   m.generate_map("numpy")
+   return m
+
+def walkable_tiles(m):
+   return [(x, y) for x in range(m.cols) for y in range(m.rows) if m.is_walkable(x, y)]
+
+def assert_walk(m, start, goal, path):
+   # Single walkable steps from start, ending on goal.
+   prev = start
+   for tile in path:
+      assert abs(tile[0] - prev[0]) + abs(tile[1] - prev[1]) == 1
+      assert m.is_walkable(*tile)
+      prev = tile
+   assert prev == tuple(goal)
+
+def mutated_map(seed=11):
+   # A 60x60 map with a few gameplay mutations logged.
+   m = MapCore(480, 480, tile_size=8, seed=seed)
+   m.generate_map("numpy")
+   trees = [(x, y) for x in range(m.cols) for y in range(m.rows)
+            if m.get_tile_at(x, y).obstacle == "tree"]
+   for x, y in trees[:15]:
+      m.cut_tree(x, y)
+   free = [(x, y) for x in range(m.cols) for y in range(m.rows)
+           if m.get_tile_at(x, y).walkable and m.get_tile_at(x, y).obstacle is None]
+   for x, y in free[::97][:15]:
+      m.add_rock(x, y)
+   assert m.mutations
+   return m
@@ -0,0 +1,39 @@
+import pytest
+
+import asset_manager
+from asset_manager import AssetManager, SpritePool
+
+pygame = pytest.importorskip("pygame")
+
+@pytest.fixture(scope="module")
+def display():
+   pygame.display.init()
+   yield pygame.display.set_mode((64, 64))
+   pygame.display.quit()
+
+def _tiles(manager, word):
+   return [n for n in manager.names() if word in n and not n.startswith("entity-")]
+
+def test_sprite_pool_decodes_on_first_lookup(display):
+   manager = AssetManager("assets")
+   files = _tiles(manager, "grass")[:3]
+   pool = SpritePool(manager, files, 8)
+   assert len(pool) == len(files) and manager.decoded == 0
+   first = pool[0]
+   assert manager.decoded == len(files)
+   assert first.get_size() == (8, 8)
+   assert pool[-1] is pool[len(files) - 1]
+   assert list(pool) == pool[:] and len(list(pool)) == len(files)
+   with pytest.raises(IndexError):
+      pool[len(files)]
+
+def test_map_construction_decodes_no_tiles(display):
+   from map_generator import Map
+   manager = asset_manager.shared("assets")
+   before = manager.decoded
+   m = Map(160, 160, tile_size=11, seed=1)
+   assert manager.decoded == before
+   m.generate_map()
+   # Only the pools generation picked from were decoded; entity sprites never were
+   assert before < manager.decoded < before + len(manager.names())
+   assert m.assets["entities"].sprites is None
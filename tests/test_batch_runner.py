@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import batch_runner
+from batch_runner import configs, episode_key, plan, run, seeds, summarize
+
+SIM = {"width": 320, "height": 320, "tile_size": 16, "villagers": 2, "seekers": 1, "cows": 1,
+       "max_steps": 30}
+
+def test_configs_expand_the_grid():
+   sweep = {"params": {"ENERGY_DRAIN": [1, 2], "_OAK_T": [0.5, 0.6, 0.7]}}
+   grid = list(configs(sweep))
+   assert len(grid) == 6
+   assert {json.dumps(c, sort_keys=True) for c in grid} == {
+      json.dumps({"ENERGY_DRAIN": e, "_OAK_T": o}, sort_keys=True)
+      for e in (1, 2) for o in (0.5, 0.6, 0.7)}
+   assert list(configs({})) == [{}]
+
+def test_configs_reject_unknown_parameters():
+   with pytest.raises(ValueError, match="NOPE"):
+      list(configs({"params": {"NOPE": [1]}}))
+
+def test_seed_range():
+   assert seeds({"seeds": {"start": 5, "count": 3}}) == [5, 6, 7]
+   assert seeds({"seeds": [4, 2]}) == [4, 2]
+   assert seeds({}) == [0]
+
+def _episodes(tasks):
+   return [(m, s, a, r) for m, s, work in tasks for a, rounds in work for r in rounds]
+
+def test_plan_groups_by_map_config_and_seed():
+   sweep = {"params": {"ENERGY_DRAIN": [1, 2], "_OAK_T": [0.5, 0.6]}, "seeds": [1, 2], "rounds": 3}
+   tasks = plan(sweep)
+   # One task per (map config, seed): both agent configs share the generated map
+   assert sorted((json.dumps(m, sort_keys=True), s) for m, s, _ in tasks) == sorted(
+      (json.dumps({"_OAK_T": o}), s) for o in (0.5, 0.6) for s in (1, 2))
+   for map_cfg, seed, work in tasks:
+      assert [a for a, _ in work] == [{"ENERGY_DRAIN": 1}, {"ENERGY_DRAIN": 2}]
+      assert all(rounds == [0, 1, 2] for _, rounds in work)
+   assert len(_episodes(tasks)) == 2 * 2 * 2 * 3
+
+def test_plan_batches_long_runs():
+   n = batch_runner.TASK_EPISODES * 2 + 3
+   tasks = plan({"params": {"ENERGY_DRAIN": [1, 2]}, "rounds": n})
+   sizes = [sum(len(r) for _, r in work) for _, _, work in tasks]
+   assert all(size <= batch_runner.TASK_EPISODES for size in sizes)
+   assert sum(sizes) == 2 * n
+   assert sorted(r for *_, r in _episodes(tasks)) == sorted(list(range(n)) * 2)
+
+def test_plan_skips_finished_episodes():
+   sweep = {"params": {"ENERGY_DRAIN": [1, 2]}, "seeds": [3], "rounds": 2}
+   done = {episode_key({"ENERGY_DRAIN": 1}, 3, 0), episode_key({"ENERGY_DRAIN": 1}, 3, 1),
+           episode_key({"ENERGY_DRAIN": 2}, 3, 1)}
+   assert _episodes(plan(sweep, done)) == [({}, 3, {"ENERGY_DRAIN": 2}, 0)]
+   all_keys = done | {episode_key({"ENERGY_DRAIN": 2}, 3, 0)}
+   assert plan(sweep, all_keys) == []
+
+def test_finished_ignores_a_torn_line(tmp_path):
+   path = tmp_path / "results.jsonl"
+   path.write_text(json.dumps({"key": "a"}) + "\n" + json.dumps({"key": "b"}) + "\n" + '{"key": "c')
+   assert batch_runner._finished(str(path)) == {"a", "b"}
+   assert batch_runner._finished(str(tmp_path / "missing.jsonl")) == set()
+
+def test_run_through_the_pool_and_resume(tmp_path):
+   results = tmp_path / "results.jsonl"
+   sweep = {"params": {"COW_ALERT": [2, 6]}, "seeds": [1], "rounds": 2, "sim": SIM}
+   assert run(sweep, str(results), workers=2) == 4
+
+   rows = [json.loads(line) for line in results.read_text().splitlines()]
+   assert sorted(r["key"] for r in rows) == sorted(
+      episode_key({"COW_ALERT": a}, 1, r) for a in (2, 6) for r in (0, 1))
+   assert all(r["steps"] <= SIM["max_steps"] for r in rows)
+
+   # Torn last line from an interrupted run: that episode is played again, the rest skipped
+   text = results.read_text().splitlines(keepends=True)
+   results.write_text("".join(text[:-1]) + text[-1][:10])
+   assert run(sweep, str(results), workers=2) == 1
+   assert run(sweep, str(results), workers=2) == 0
+
+   lines = results.read_text().splitlines()
+   assert len([l for l in lines if l.endswith("}")]) == 4
+   summary = summarize(str(results))
+   assert sorted(s["config"]["COW_ALERT"] for s in summary) == [2, 6]
+   assert all(s["episodes"] == 2 for s in summary)
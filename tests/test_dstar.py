@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import dstar
+from grid_search import NEIGHBOURS, astar
+from helpers import assert_walk, make_map, walkable_tiles
+
+def _flip(m, tile):
+   t = m.get_tile_at(*tile)
+   if t is None:
+      return
+   if t.obstacle == "rock":
+      m.remove_rock(*tile)
+   elif t.obstacle is None:
+      m.add_rock(*tile)
+
+def _run_planner(seed, drift):
+   # Tiles flip (often on the planner's root), the agent walks its path and, with drift,
+   # the target wanders; yields (map, start, target, D* path) after every change.
+   rng = random.Random(seed)
+   m = make_map(rng.randrange(10 ** 6))
+   tiles = walkable_tiles(m)
+   start, target = rng.choice(tiles), rng.choice(tiles)
+   replanner, owner = dstar.for_map(m), object()
+   planner = replanner.track(owner, start, target)
+   for _ in range(40):
+      r = rng.random()
+      if r < drift:
+         near = [(target[0] + dx, target[1] + dy) for dx, dy in NEIGHBOURS]
+         near = [p for p in near if m.is_walkable(*p)]
+         if near:
+            target = rng.choice(near)
+      elif r < drift + 0.3:
+         path = planner.path()
+         if path:
+            start = path[0]
+      else:
+         if r < drift + 0.45:
+            tile = planner.walk.tile(planner.goal)
+         else:
+            tile = (start[0] + rng.randint(-4, 4), start[1] + rng.randint(-4, 4))
+         if tile not in (start, target):
+            _flip(m, tile)
+      planner = replanner.track(owner, start, target)
+      yield m, start, target, planner.path()
+
+@pytest.mark.parametrize("seed", range(6))
+def test_dstar_matches_fresh_astar_after_flips(seed):
+   for m, start, target, got in _run_planner(seed, drift=0):
+      ref = astar(m.is_walkable, start, target)
+      assert (got is None) == (ref is None)
+      if ref:
+         assert len(got) == len(ref)
+         assert_walk(m, start, target, got)
+
+@pytest.mark.parametrize("seed", range(6))
+def test_dstar_follows_drifting_target(seed):
+   # A drifting target is followed through a tail instead of a new search, so the path
+   # may be longer than A*'s but must still be a walk to the target when one exists.
+   for m, start, target, got in _run_planner(seed, drift=0.3):
+      ref = astar(m.is_walkable, start, target)
+      assert (got is None) == (ref is None)
+      if ref:
+         assert_walk(m, start, target, got)
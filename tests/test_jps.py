@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from grid_search import astar
+from helpers import assert_walk, make_map, walkable_tiles
+from jps import JumpPointSearch
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_jps_matches_astar_length(seed):
+   m = make_map(seed)
+   jps, rng, tiles = JumpPointSearch(m), random.Random(seed), walkable_tiles(m)
+   for _ in range(40):
+      a, b = rng.choice(tiles), rng.choice(tiles)
+      ref, got = astar(m.is_walkable, a, b), jps.find_path(a, b)
+      assert (got is None) == (ref is None)
+      if ref is not None:
+         assert len(got) == len(ref)
+         assert_walk(m, a, b, got)
+
+def test_jps_follows_mutations():
+   # The WalkGrid copy is patched through tile_listeners, so a rock on the path is avoided.
+   m = make_map(5)
+   jps, rng, tiles = JumpPointSearch(m), random.Random(5), walkable_tiles(m)
+   a, b = rng.choice(tiles), rng.choice(tiles)
+   path = jps.find_path(a, b)
+   while not path or len(path) < 6:
+      a, b = rng.choice(tiles), rng.choice(tiles)
+      path = jps.find_path(a, b)
+   mid = path[len(path) // 2]
+   assert m.add_rock(*mid)
+   got, ref = jps.find_path(a, b), astar(m.is_walkable, a, b)
+   assert (got is None) == (ref is None)
+   if ref is not None:
+      assert mid not in got and len(got) == len(ref)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import map_format
+from map_core import MapCore
+from helpers import mutated_map
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_binary_round_trip(tmp_path, compress):
+   src = mutated_map()
+   src.save_map(tmp_path / "map.hsm", compress=compress)
+   loaded = MapCore(480, 480, tile_size=8, seed=3)
+   loaded.generate_map("numpy")
+   loaded.load_map(tmp_path / "map.hsm")
+   for name in MapCore.SAVED_LAYERS:
+      assert np.array_equal(getattr(loaded.store, name), getattr(src.store, name))
+   assert np.array_equal(loaded.store.walkable_mask(), src.store.walkable_mask())
+
+def test_binary_region_load(tmp_path):
+   src = mutated_map()
+   src.save_map(tmp_path / "map.hsm")
+   other = MapCore(480, 480, tile_size=8, seed=3)
+   other.generate_map("numpy")
+   before = other.store.obstacle.copy()
+   other.load_map(tmp_path / "map.hsm", region=(5, 7, 20, 10))
+   inside = np.zeros(before.shape, bool)
+   inside[5:25, 7:17] = True
+   assert np.array_equal(other.store.obstacle[inside], src.store.obstacle[inside])
+   assert np.array_equal(other.store.obstacle[~inside], before[~inside])
+
+def test_layers_and_meta_round_trip(tmp_path):
+   rng = np.random.default_rng(0)
+   layers = {"a": rng.integers(0, 255, (7, 5), dtype=np.uint8),
+             "b": rng.random((7, 5)).astype(np.float32)}
+   meta = {"seed": 12345678901234567, "mutations": [["add_rock", 1, 2]]}
+   for compress in (False, True):
+      path = tmp_path / f"m{compress}.hsm"
+      map_format.write(path, 7, 5, (1.5, 2.5, 3.5, 4.5), layers, compress, meta)
+      mf = map_format.MapFile(path)
+      assert (mf.version, mf.compressed, mf.cols, mf.rows) == (map_format.VERSION, compress, 7, 5)
+      assert mf.seeds == (1.5, 2.5, 3.5, 4.5)
+      assert mf.meta == meta
+      for name, arr in layers.items():
+         assert mf.layer(name).dtype == arr.dtype
+         assert np.array_equal(mf.layer(name), arr)
+      assert np.array_equal(mf.window("a", 2, 1, 3, 2), layers["a"][2:5, 1:3])
+
+def test_version_1_files_still_load(tmp_path):
+   # Version 1 had no meta record: header, index, aligned layers.
+   arr = np.arange(12, dtype=np.uint8).reshape(4, 3)
+   path = tmp_path / "v1.hsm"
+   off = -(-(map_format._HEADER.size + map_format._ENTRY.size) // map_format.ALIGN) * map_format.ALIGN
+   with open(path, "wb") as f:
+      f.write(map_format._HEADER.pack(map_format.MAGIC, 1, 0, 4, 3, 0.0, 0.0, 0.0, 0.0, 1))
+      f.write(map_format._ENTRY.pack(b"obstacle", arr.dtype.str.encode(), off, arr.nbytes))
+      f.write(b"\0" * (off - f.tell()))
+      f.write(arr.tobytes())
+   mf = map_format.MapFile(path)
+   assert mf.version == 1 and mf.meta == {}
+   assert np.array_equal(mf.layer("obstacle"), arr)
+
+def test_newer_versions_are_rejected(tmp_path):
+   path = tmp_path / "future.hsm"
+   with open(path, "wb") as f:
+      f.write(map_format._HEADER.pack(map_format.MAGIC, map_format.VERSION + 1, 0, 1, 1, 0, 0, 0, 0, 0))
+   with pytest.raises(map_format.MapFormatError, match="format version"):
+      map_format.MapFile(path)
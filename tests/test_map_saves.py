@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from helpers import mutated_map
+from map_core import MapCore
+
+LAYERS = ("biome", "obstacle")
+
+def _same_layers(a, b):
+   return all(np.array_equal(getattr(a.store, k), getattr(b.store, k)) for k in LAYERS)
+
+@pytest.mark.parametrize("name", ["map.hsm", "map.json"])
+def test_delta_save_after_full_load(tmp_path, name):
+   # generate -> mutate -> save_map -> fresh map -> load_map -> save_delta -> load_delta
+   src = mutated_map()
+   src.save_map(tmp_path / name)
+
+   loaded = MapCore(480, 480, tile_size=8, seed=99)
+   loaded.generate_map("numpy")
+   loaded.cut_tree(*next((x, y) for x in range(loaded.cols) for y in range(loaded.rows)
+                         if loaded.get_tile_at(x, y).obstacle == "tree"))
+   loaded.load_map(tmp_path / name)
+   assert loaded.seed == src.seed
+   assert loaded.mutations == src.mutations
+
+   loaded.save_delta(tmp_path / "map.delta.json")
+   replayed = MapCore(480, 480, tile_size=8, seed=5)
+   replayed.load_delta(tmp_path / "map.delta.json")
+   assert _same_layers(src, replayed)
+   assert _same_layers(loaded, replayed)
+
+def test_delta_save_refuses_without_seed(tmp_path):
+   src = mutated_map()
+   src.save_map(tmp_path / "map.hsm")
+   part = MapCore(480, 480, tile_size=8, seed=3)
+   part.generate_map("numpy")
+   part.load_map(tmp_path / "map.hsm", region=(0, 0, 10, 10))
+   with pytest.raises(ValueError, match="no known seed"):
+      part.save_delta(tmp_path / "map.delta.json")
+
+def test_streamed_save_keeps_seed_and_mutations(tmp_path):
+   from world_stream import StreamedMap
+   src = StreamedMap(320, 320, tile_size=16, seed=7, cache_dir=str(tmp_path))
+   src.generate_map("numpy")
+   tree = next((x, y) for x in range(40) for y in range(40)
+               if src.get_tile_at(x, y).obstacle == "tree")
+   src.cut_tree(*tree)
+   src.save_map(tmp_path / "world.json")
+
+   loaded = StreamedMap(320, 320, tile_size=16, seed=1, cache_dir=str(tmp_path))
+   loaded.load_map(tmp_path / "world.json")
+   assert loaded.seed == 7
+   assert loaded.mutations == [("cut_tree", *tree)]
+   assert loaded.get_tile_at(*tree).obstacle is None
+
+def test_streamed_load_drops_cached_overlays(tmp_path):
+   from terrain_render import MarkerOverlay
+   from world_stream import StreamedMap
+   src = StreamedMap(320, 320, tile_size=16, seed=7, cache_dir=str(tmp_path))
+   src.generate_map("numpy")
+   src.save_map(tmp_path / "world.json")
+
+   loaded = StreamedMap(320, 320, tile_size=16, seed=1, cache_dir=str(tmp_path))
+   loaded.obstacle_overlay = MarkerOverlay(loaded, lambda *a: None)
+   loaded.obstacle_overlay.layers[(1.0, 0, 0)] = None
+   version = loaded.version
+   loaded.load_map(tmp_path / "world.json")
+   assert loaded.version > version
+   assert not loaded.obstacle_overlay.layers
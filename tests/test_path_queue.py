@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+import path_queue
+from grid_search import astar
+from helpers import make_map, walkable_tiles
+
+class Walker:
+   # Just enough of an entity for the scheduler: a tile, a path and the map.
+   def __init__(self, map_ref, tile):
+      self.map  = map_ref
+      self.tile = tile
+      self.path = []
+
+   def get_tile_pos(self):
+      return self.tile
+
+   def set_path(self, path):
+      self.path = list(path)
+
+def _far_pair(m):
+   tiles = walkable_tiles(m)
+   for a in tiles[::17]:
+      for b in tiles[::-13]:
+         path = astar(m.is_walkable, a, b)
+         if path and len(path) > 30:
+            return a, b, path
+   pytest.fail("no long path on the test map")
+
+def _drain(queue, walkers, timeout=20):
+   end = time.time() + timeout
+   while any(queue.waiting(w) for w in walkers):
+      assert time.time() < end, "pool results never arrived"
+      queue.run()
+      time.sleep(0.005)
+
+@pytest.fixture
+def pooled():
+   m = make_map(4)
+   queue = path_queue.for_map(m, workers=2)
+   yield m, queue
+   queue.close()
+
+def test_inline_requests_run_by_priority():
+   m = make_map(4)
+   queue = path_queue.for_map(m)
+   order = []
+   for kind in ("explore", "wander", "flee", "chase"):
+      w = Walker(m, walkable_tiles(m)[0])
+      path_queue.request(w, kind, solve=lambda kind=kind: order.append(kind) or [])
+   queue.run(budget_ms=1000)
+   assert order[:2] == ["flee", "chase"] and set(order[2:]) == {"explore", "wander"}
+
+def test_pool_survives_terrain_changes(pooled):
+   m, queue = pooled
+   a, b, path = _far_pair(m)
+   w = Walker(m, a)
+   path_queue.request(w, "explore", goal=b)
+   _drain(queue, [w])
+   assert w.path == path
+   pool = queue.pool
+
+   # Block the middle of that path: the same pool answers, around the new rock
+   mid = path[len(path) // 2]
+   m.cut_tree(*mid)
+   assert m.add_rock(*mid)
+   w.path = []
+   path_queue.request(w, "explore", goal=b)
+   _drain(queue, [w])
+   assert queue.pool is pool
+   assert w.path == astar(m.is_walkable, a, b)
+   assert w.path is None or mid not in w.path
+
+def test_stale_result_through_a_new_rock_is_solved_again(pooled):
+   m, queue = pooled
+   a, b, path = _far_pair(m)
+   w = Walker(m, a)
+   path_queue.request(w, "explore", goal=b)
+   queue.run()
+   assert queue.flying
+
+   # Terrain changes while the worker searches the old grid
+   mid = path[len(path) // 2]
+   m.cut_tree(*mid)
+   assert m.add_rock(*mid)
+   _drain(queue, [w])
+   assert w.path and mid not in w.path
+   assert all(m.is_walkable(*t) for t in w.path)
+
+def test_flee_waits_for_the_queue():
+   from agents import Villager
+   from animals import Cow
+   m = make_map(4)
+   queue = path_queue.for_map(m)
+   ts = m.tile_size
+   tiles = walkable_tiles(m)
+   here = tiles[len(tiles) // 2]
+   villager, cow = Villager(here[0] * ts, here[1] * ts, None, m), Cow(here[0] * ts, here[1] * ts, None, m)
+   danger = next(t for t in tiles if 1 < abs(t[0] - here[0]) + abs(t[1] - here[1]) < 4)
+
+   villager.flee(danger)
+   cow.flee(danger)
+   assert queue.waiting(villager) and queue.waiting(cow)
+   assert not villager.path and not cow.path
+
+   queue.run(budget_ms=1000)
+   assert not queue.waiting(villager) and not queue.waiting(cow)
+   dist = lambda t: abs(t[0] - danger[0]) + abs(t[1] - danger[1])
+   for e in (villager, cow):
+      assert e.path and dist(e.path[-1]) > dist(here)
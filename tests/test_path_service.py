@@ -0,0 +1,104 @@
+import pytest
+
+import path_service
+from grid_search import AStar, astar
+from map_core import MapCore
+from path_service import PathService
+
+class CountingSolver(AStar):
+   # Plain A* that records every query it actually had to solve.
+   def __init__(self, map_ref):
+      super().__init__(map_ref)
+      self.calls = []
+
+   def find_path(self, start, goal):
+      self.calls.append((start, goal))
+      return super().find_path(start, goal)
+
+@pytest.fixture
+def game_map():
+   m = MapCore(480, 480, tile_size=8, seed=4)
+   m.generate_map("numpy")
+   return m
+
+def _long_pair(m, length=20):
+   # Two walkable tiles at least `length` steps apart by path.
+   tiles = [(x, y) for x in range(0, m.cols, 7) for y in range(0, m.rows, 7) if m.is_walkable(x, y)]
+   for a in tiles:
+      for b in tiles:
+         path = astar(m.is_walkable, a, b)
+         if path and len(path) >= length:
+            return a, b, path
+   pytest.fail("no long enough path on the test map")
+
+def _service(m, **kwargs):
+   solver = CountingSolver(m)
+   return PathService(m, solver=solver, **kwargs), solver
+
+def test_default_backend_matches_astar(game_map):
+   a, b, path = _long_pair(game_map)
+   service = path_service.for_map(game_map)
+   assert isinstance(service.solver, AStar)
+   assert service.find_path(a, b) == path
+   assert path_service.for_map(game_map) is service
+
+def test_repeat_query_is_a_hit(game_map):
+   service, solver = _service(game_map)
+   a, b, path = _long_pair(game_map)
+   first = service.find_path(a, b)
+   first.append((-1, -1))                 # callers get copies, never the cached list
+   assert service.find_path(a, b) == path
+   assert len(solver.calls) == 1
+   assert (service.hits, service.misses) == (1, 1)
+
+def test_unreachable_results_are_cached(game_map):
+   service, solver = _service(game_map)
+   blocked = next((x, y) for x in range(game_map.cols) for y in range(game_map.rows)
+                  if not game_map.is_walkable(x, y))
+   a, _, _ = _long_pair(game_map)
+   assert service.find_path(a, blocked) is None
+   assert service.find_path(a, blocked) is None
+   assert len(solver.calls) == 1
+
+def test_start_on_cached_path_reuses_its_tail(game_map):
+   service, solver = _service(game_map)
+   a, b, path = _long_pair(game_map)
+   service.find_path(a, b)
+   mid = path[len(path) // 2]
+   assert service.find_path(mid, b) == path[len(path) // 2 + 1:]
+   assert len(solver.calls) == 1
+
+def test_goal_on_cached_path_reuses_its_head(game_map):
+   service, solver = _service(game_map)
+   a, b, path = _long_pair(game_map)
+   service.find_path(a, b)
+   mid = path[len(path) // 2]
+   assert service.find_path(a, mid) == path[:len(path) // 2 + 1]
+   assert len(solver.calls) == 1
+
+def test_lru_evicts_least_recently_used(game_map):
+   service, solver = _service(game_map, max_entries=2)
+   _, _, path = _long_pair(game_map)
+   # Distinct starts and goals, so no query can be answered from another one's path
+   first, second, third = (path[1], path[3]), (path[5], path[7]), (path[9], path[11])
+   service.find_path(*first)
+   service.find_path(*second)
+   service.find_path(*first)               # refreshes the first entry
+   service.find_path(*third)
+   assert len(solver.calls) == 3
+   assert list(service.cache) == [first, third]
+   assert set(service.by_start) == {path[1], path[9]}
+   assert set(service.by_goal) == {path[3], path[11]}
+
+def test_map_version_drops_cache(game_map):
+   service, solver = _service(game_map)
+   a, b, path = _long_pair(game_map)
+   service.find_path(a, b)
+   # Block the middle of the cached path: the next query must search again and avoid it
+   mid = path[len(path) // 2]
+   assert game_map.add_rock(*mid)
+   assert game_map.version != service.version
+   again = service.find_path(a, b)
+   assert len(solver.calls) == 2
+   assert again == astar(game_map.is_walkable, a, b)
+   assert again is None or mid not in again
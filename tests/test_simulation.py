@@ -0,0 +1,53 @@
+import pytest
+
+import simulation
+from simulation import Simulation
+
+def _round(seed, **kwargs):
+   sim = Simulation(seed=seed, villagers=6, seekers=1, cows=3, max_steps=300, **kwargs)
+   result = sim.run_round()
+   positions = [(e.x, e.y) for e in sim.entities()]
+   return result, positions
+
+@pytest.mark.parametrize("seed", [1, 7])
+def test_headless_round_is_deterministic(seed):
+   result, positions = _round(seed)
+   assert result["steps"] == 300 or result["caught"] == result["villagers"]
+   # Everyone actually walked
+   assert all(result["distance"][kind] > 0 for kind in ("villagers", "seekers", "cows"))
+   assert _round(seed) == (result, positions)
+
+def test_lod_round_is_deterministic():
+   assert _round(1, lod=True) == _round(1, lod=True)
+
+def test_rounds_differ_between_seeds():
+   assert _round(1)[1] != _round(2)[1]
+
+def test_villager_sees_the_nearest_seeker():
+   sim = Simulation(seed=1, villagers=1, seekers=2, cows=0, max_steps=1)
+   sim.reset()
+   v, near, far = sim.villagers[0], *sim.seekers
+
+   class Sight:
+      def visible_entities(self, viewer, kind=None):
+         return [far, near]
+
+   ts = sim.map.tile_size
+   x, y = v.get_tile_pos()
+   for seeker, dx in ((near, 1), (far, 3)):
+      seeker.x, seeker.y = (x + dx) * ts, y * ts
+      sim.map.entity_index.move(seeker)
+   assert simulation.villager_context(v, Sight())["enemy_pos"] == (x + 1, y)
+
+def test_caught_villager_drops_its_route():
+   sim = Simulation(seed=1, villagers=1, seekers=1, cows=0, max_steps=10)
+   sim.reset()
+   v, s = sim.villagers[0], sim.seekers[0]
+   goal = next(t for t in sim.walkable if abs(t[0] - v.get_tile_pos()[0]) > 4)
+   v.travel(tuple(int(c) for c in goal))
+   assert v.route is not None
+
+   s.x, s.y = v.x, v.y
+   sim.map.entity_index.move(s)
+   sim.step()
+   assert v.caught and v.route is None and v.path == []
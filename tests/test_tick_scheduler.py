@@ -0,0 +1,55 @@
+import pytest
+
+import tick_scheduler
+from animals import Cow
+from grid_search import astar
+from helpers import make_map, walkable_tiles
+
+def _walker(seed=4, length=40):
+   # A cow at the start of a long path on a fresh map.
+   m = make_map(seed)
+   tiles = walkable_tiles(m)
+   a, path = next((a, p) for a in tiles[::31] for b in tiles[::-29]
+                  if (p := astar(m.is_walkable, a, b)) and len(p) >= length)
+   ts = m.tile_size
+   cow = Cow(a[0] * ts, a[1] * ts, None, m)
+   cow.set_path(path)
+   return m, cow
+
+def _far_focus(m, cow):
+   # A focus point more than MID_TILES away, so the cow sits in the slowest tier.
+   x, y = cow.get_tile_pos()
+   return [(x + tick_scheduler.MID_TILES + 10, y + tick_scheduler.MID_TILES + 10)]
+
+def test_tiers_by_distance_and_state():
+   m, cow = _walker()
+   ai = tick_scheduler.for_map(m)
+   ai.focus(points=[cow.get_tile_pos()])
+   assert ai.tiers().tolist() == [0]
+   ai.focus(points=_far_focus(m, cow))
+   assert ai.tiers().tolist() == [2]
+   cow.state = "fleeing"
+   assert ai.tiers().tolist() == [0]
+
+@pytest.mark.parametrize("frames", [5, 37, 120])
+def test_skipped_entities_cover_the_same_ground(frames):
+   near_map, near = _walker()
+   far_map, far = _walker()
+   near_ai, far_ai = tick_scheduler.for_map(near_map), tick_scheduler.for_map(far_map)
+   for _ in range(frames):
+      near_ai.focus(points=[near.get_tile_pos()])
+      near_ai.run()
+      far_ai.focus(points=_far_focus(far_map, far))
+      far_ai.run()
+   assert far_ai.ran < near_ai.ran == frames
+   assert (far.x, far.y) == (near.x, near.y)
+   assert far.path == near.path
+   assert far.index.position(far) == far.get_tile_pos()
+
+def test_idle_entities_are_not_walked():
+   m, cow = _walker()
+   cow.set_path([])
+   ai = tick_scheduler.for_map(m)
+   ai.focus(points=_far_focus(m, cow))
+   due, walking = ai.due()
+   assert walking == []
@@ -0,0 +1,91 @@
+import numpy as np
+
+import entity_store
+
+# Frames between decisions per tier: 0 every frame, 1 nearby, 2 far away.
+TIER_PERIODS = (1, 4, 16)
+# Tiles around a focus area still ticked every frame / at tier 1.
+NEAR_TILES = 8
+MID_TILES = 32
+# States that always tick every frame, wherever the entity is.
+ACTIVE_STATES = ("chasing", "fleeing", "reacting")
+
+def view_rect(map_ref, width, height):
+   # Tiles covered by a width x height viewport at the map's camera and zoom.
+   ts = map_ref.tile_size * map_ref.zoom_factor
+   cam = map_ref.camera_offset
+   return (int(cam.x // ts), int(cam.y // ts), int((cam.x + width) // ts), int((cam.y + height) // ts))
+
+class TickScheduler:
+   # Decides which entities run update() on a frame. Entities in an active state or near a
+   # focus area (the camera view, the seekers) tick every frame; the rest drop to tiers that
+   # decide every 4th / 16th frame. A tier's entities are spread over its frames by slot
+   # (entity s runs when (frame + s) % period == 0), so the work per frame stays flat as the
+   # population grows. Needs and stamina keep advancing for every row in EntityStore.tick(),
+   # and every entity with a path still takes its step each frame through walk(), which
+   # moves without deciding. Only decisions are deferred: a skipped entity covers the same
+   # ground as under full updates and reacts to what happened up to period - 1 frames late.
+   def __init__(self, map_ref, periods=TIER_PERIODS, near=NEAR_TILES, mid=MID_TILES):
+      self.map     = map_ref
+      self.periods = np.array(periods)
+      self.near    = near
+      self.mid     = mid
+      self.rects   = []
+      self.frame   = 0
+      self.ran     = 0
+      self.walked  = 0
+
+   # ── focus ─────────────────────────────────────────────────────────────────
+   def focus(self, rects=(), points=()):
+      # Areas that keep full detail this frame: tile rects (x0, y0, x1, y1) and tiles.
+      self.rects = [tuple(r) for r in rects] + [(x, y, x, y) for x, y in points]
+
+   def tiers(self):
+      # Tier of every row of the map's store.
+      store = entity_store.for_map(self.map)
+      n = store.size
+      ts = self.map.tile_size
+      tx, ty = store.x[:n] // ts, store.y[:n] // ts
+
+      # Chebyshev distance in tiles to the closest focus rect
+      dist = np.full(n, np.inf)
+      for x0, y0, x1, y1 in self.rects:
+         dx = np.maximum(np.maximum(x0 - tx, tx - x1), 0)
+         dy = np.maximum(np.maximum(y0 - ty, ty - y1), 0)
+         np.minimum(dist, np.maximum(dx, dy), out=dist)
+
+      tier = np.where(dist <= self.near, 0, np.where(dist <= self.mid, 1, 2))
+      active = np.isin(store.state[:n], [entity_store.state_code(s) for s in ACTIVE_STATES])
+      tier[active] = 0
+      return tier
+
+   # ── per frame ─────────────────────────────────────────────────────────────
+   def due(self):
+      # (entities that decide this frame, entities that only walk their path this frame).
+      store = entity_store.for_map(self.map)
+      n = store.size
+      slots = np.arange(n)
+      period = self.periods[self.tiers()]
+      run = (self.frame + slots) % period == 0
+      active = store.active[:n]
+      self.frame += 1
+      handles = store.handles
+      return ([handles[s] for s in np.flatnonzero(active & run)],
+              [handles[s] for s in np.flatnonzero(active & ~run & store.moving[:n])])
+
+   def run(self, context=None):
+      # Updates this frame's entities; context(entity) builds each one's update context.
+      due, walking = self.due()
+      for e in walking:
+         e.walk()
+      for e in due:
+         e.update(context(e) if context else {})
+      self.ran += len(due)
+      self.walked += len(walking)
+      return len(due)
+
+def for_map(map_ref):
+   # The map's level-of-detail scheduler, created on first use.
+   if map_ref.tick_scheduler is None:
+      map_ref.tick_scheduler = TickScheduler(map_ref)
+   return map_ref.tick_scheduler
@@ -0,0 +1,93 @@
+import numpy as np
+
+from terrain_gen import BIOMES, OBSTACLES, BIOME_ID, OBSTACLE_ID, TREE
+
+# Bits of TileStore.flags
+WALKABLE = 1
+EXPLORED = 2
+
+class SurfacePalette:
+   # Interns surfaces (or any render handle) so tiles store a small index instead of a reference.
+   # Index 0 is reserved for "no surface".
+   def __init__(self):
+      self.items = [None]
+      self._index = {}
+
+   def index(self, surf):
+      if surf is None:
+         return 0
+      i = self._index.get(id(surf))
+      if i is None:
+         i = len(self.items)
+         self.items.append(surf)
+         self._index[id(surf)] = i
+      return i
+
+   def __getitem__(self, i):
+      return self.items[i]
+
+   def __len__(self):
+      return len(self.items)
+
+class TileStore:
+   # Struct-of-arrays tile grid indexed [x, y]: a handful of bytes per tile instead of
+   # one Python object with its own strings, surface references and Vector2.
+   __slots__ = ("cols", "rows", "biome", "obstacle", "flags", "bg", "top", "palette")
+
+   def __init__(self, cols, rows, palette=None):
+      self.cols     = cols
+      self.rows     = rows
+      self.biome    = np.zeros((cols, rows), dtype=np.uint8)
+      self.obstacle = np.zeros((cols, rows), dtype=np.uint8)
+      self.flags    = np.full((cols, rows), WALKABLE, dtype=np.uint8)
+      self.bg       = np.zeros((cols, rows), dtype=np.uint16)
+      self.top      = np.zeros((cols, rows), dtype=np.uint16)
+      self.palette  = palette if palette is not None else SurfacePalette()
+
+   def window(self, x0, y0, w, h):
+      # TileStore over a sub-rectangle; arrays are views, the palette is shared.
+      out = TileStore.__new__(TileStore)
+      out.cols, out.rows, out.palette = w, h, self.palette
+      for name in ("biome", "obstacle", "flags", "bg", "top"):
+         setattr(out, name, getattr(self, name)[x0:x0 + w, y0:y0 + h])
+      return out
+
+   # ── whole-grid views ──────────────────────────────────────────────────────
+   def walkable_mask(self):
+      return (self.flags & WALKABLE) != 0
+
+   def explored_mask(self):
+      return (self.flags & EXPLORED) != 0
+
+   def tree_mask(self):
+      return self.obstacle == TREE
+
+   # ── per-tile field access (used by Tile views) ────────────────────────────
+   def get_biome(self, i, j):
+      return BIOMES[self.biome[i, j]]
+
+   def set_biome(self, i, j, name):
+      self.biome[i, j] = BIOME_ID[name]
+
+   def get_obstacle(self, i, j):
+      return OBSTACLES[self.obstacle[i, j]]
+
+   def set_obstacle(self, i, j, name):
+      self.obstacle[i, j] = OBSTACLE_ID[name]
+
+   def get_flag(self, i, j, bit):
+      return bool(self.flags[i, j] & bit)
+
+   def set_flag(self, i, j, bit, on):
+      if on:
+         self.flags[i, j] |= bit
+      else:
+         self.flags[i, j] &= ~bit & 0xFF
+
+   def set_tile(self, i, j, biome, obstacle, walkable, bg, top):
+      # Rewrites every field of one tile at once; bg / top are surfaces.
+      self.biome[i, j]    = BIOME_ID[biome]
+      self.obstacle[i, j] = OBSTACLE_ID[obstacle]
+      self.flags[i, j]    = (self.flags[i, j] & EXPLORED) | (WALKABLE if walkable else 0)
+      self.bg[i, j]       = self.palette.index(bg)
+      self.top[i, j]      = self.palette.index(top)
@@ -0,0 +1,285 @@
+import os
+import json
+import random
+import tempfile
+import numpy as np
+
+import terrain_gen
+from collections import OrderedDict
+from map_core import TileGrid
+from map_generator import Map
+from terrain_render import ChunkCache
+from tile_store import TileStore, EXPLORED
+
+# Tiles per side of one streamed chunk (also the render chunk size).
+STREAM_CHUNK = 32
+
+class StreamedMap(Map):
+   # Unbounded world built from chunks generated on demand from the map seeds.
+   # update_streaming() keeps chunks within load_radius of the camera view and of every
+   # focus point (agents) resident and unloads chunks beyond keep_radius of all of them.
+   # Untouched chunks are dropped since they regenerate identically; chunks changed through
+   # the mutation API are written to cache_dir and patched back in when they reload.
+   # get_tile_at / is_walkable / the mutation API load missing chunks transparently; chunks
+   # loaded that way count against max_chunks too, least recently used going first.
+   # Explored flags are kept per chunk and saved with it like a mutation.
+   # There is no single TileStore, so the whole-map caches (WalkGrid and everything on it:
+   # flow fields, D*, JPS, the path queue; FieldOfView) refuse a StreamedMap with a TypeError.
+   bounded = False
+
+   def __init__(self, width, height, tile_size=16, chunk_tiles=STREAM_CHUNK,
+                load_radius=1, keep_radius=2, max_chunks=64, cache_dir=None, seed=None):
+      super().__init__(width, height, tile_size, seed)
+
+      # cols / rows stay the window size and only set the noise scale.
+      self.map_data    = None
+      self.chunk_tiles = chunk_tiles
+      self.load_radius = load_radius
+      self.keep_radius = max(keep_radius, load_radius)
+      self.max_chunks  = max_chunks
+      self.cache_dir   = cache_dir or tempfile.mkdtemp(prefix="hideseek-chunks-")
+
+      self.store    = None
+      self.loaded   = OrderedDict()   # (cx, cy) -> TileGrid over that chunk's TileStore, LRU first
+      self.modified = set()   # loaded chunks that differ from their generated state
+      self.on_disk  = set()   # chunks with a saved diff in cache_dir
+
+      self.chunks = ChunkCache(self, chunk_tiles=chunk_tiles, bounded=False)
+
+   # ── chunk lifecycle ──────────────────────────────────────────────────────
+   def _chunk_rng(self, cx, cy):
+      # Per-chunk RNG so a chunk regenerates identically whenever it is reloaded.
+      return random.Random(f"{self._ex!r}:{self._ey!r}:{self._mx!r}:{self._my!r}:{cx}:{cy}")
+
+   def _chunk_path(self, cx, cy):
+      return os.path.join(self.cache_dir, f"chunk_{cx}_{cy}.npz")
+
+   def _load_chunk(self, cx, cy):
+      ct = self.chunk_tiles
+      x0, y0 = cx * ct, cy * ct
+      seeds = (self._ex, self._ey, self._mx, self._my)
+      arr = terrain_gen.generate_window(x0, y0, ct, ct, self.cols, self.rows, seeds,
+                                        self._pool_sizes(), self.gen_config(), self._chunk_rng(cx, cy))
+
+      store = TileStore(ct, ct, self.palette)
+      self._materialize(arr, store, x0, y0)
+      grid = TileGrid(store, self.tile_size, x0, y0)
+      if (cx, cy) in self.on_disk:
+         self._restore_chunk(cx, cy, grid)
+         self.modified.add((cx, cy))
+
+      self.loaded[(cx, cy)] = grid
+      # Trees in this chunk's top row overhang into the chunk above.
+      self.chunks.invalidate_chunk(cx, cy - 1)
+      return grid
+
+   def _save_chunk(self, cx, cy):
+      store = self.loaded[(cx, cy)].store
+      np.savez_compressed(self._chunk_path(cx, cy), obstacle=store.obstacle, flags=store.flags)
+      self.on_disk.add((cx, cy))
+
+   def _restore_chunk(self, cx, cy, grid):
+      # Re-applies the saved obstacle layer over the freshly generated chunk.
+      with np.load(self._chunk_path(cx, cy)) as data:
+         obstacle = data["obstacle"]
+         flags    = data["flags"]
+
+      # Variants come from the chunk's own RNG so other chunks' generation is left alone.
+      rng = self._chunk_rng(cx, cy)
+      store = grid.store
+      for i, j in zip(*np.nonzero(obstacle != store.obstacle)):
+         t = grid.tile(i, j)
+         obs = terrain_gen.OBSTACLES[obstacle[i, j]]
+         if t.obstacle == "tree":
+            t.remove_tree()
+         elif t.obstacle == "rock":
+            t.remove_rock()
+         if obs == "tree":
+            t.place_tree(self._tree(t.biom, rng))
+         elif obs == "rock":
+            t.place_rock(self._rock(rng))
+      store.flags[:] = flags
+
+   def _unload_chunk(self, cx, cy):
+      if (cx, cy) in self.modified:
+         self._save_chunk(cx, cy)
+         self.modified.discard((cx, cy))
+      del self.loaded[(cx, cy)]
+      self.chunks.forget(cx, cy)
+
+   def _view_chunk_rect(self, view_size):
+      vw, vh = view_size or (self.width, self.height)
+      span = self.chunk_tiles * self.tile_size * self.zoom_factor
+      cam = self.camera_offset
+      return (int(cam.x // span), int(cam.y // span),
+              int((cam.x + vw) // span), int((cam.y + vh) // span))
+
+   def update_streaming(self, points=(), view_size=None):
+      # points: tile positions of agents / animals that must keep their surroundings loaded.
+      ct = self.chunk_tiles
+      boxes = [self._view_chunk_rect(view_size)]
+      for x, y in points:
+         cx, cy = int(x) // ct, int(y) // ct
+         boxes.append((cx, cy, cx, cy))
+
+      def distance(key):
+         cx, cy = key
+         return min(max(x0 - cx, cx - x1, y0 - cy, cy - y1, 0) for x0, y0, x1, y1 in boxes)
+
+      r = self.load_radius
+      for x0, y0, x1, y1 in boxes:
+         for cx in range(x0 - r, x1 + r + 1):
+            for cy in range(y0 - r, y1 + r + 1):
+               if (cx, cy) not in self.loaded:
+                  self._load_chunk(cx, cy)
+
+      far = [key for key in self.loaded if distance(key) > self.keep_radius]
+      for key in far:
+         self._unload_chunk(*key)
+
+      # Hard memory bound: drop the furthest chunks outside the load radius.
+      if len(self.loaded) > self.max_chunks:
+         spare = sorted((k for k in self.loaded if distance(k) > r), key=distance, reverse=True)
+         for key in spare[:len(self.loaded) - self.max_chunks]:
+            self._unload_chunk(*key)
+
+   def _chunk(self, cx, cy, keep=()):
+      # A loaded chunk for a direct tile access, loading it on demand. Past max_chunks the
+      # least recently used chunks go, except this one and those in keep.
+      grid = self.loaded.get((cx, cy))
+      if grid is not None:
+         self.loaded.move_to_end((cx, cy))
+         return grid
+      grid = self._load_chunk(cx, cy)
+      spare = [k for k in self.loaded if k != (cx, cy) and k not in keep]
+      for key in spare[:max(0, len(self.loaded) - self.max_chunks)]:
+         self._unload_chunk(*key)
+      return grid
+
+   # ── tile access ───────────────────────────────────────────────────────────
+   def get_tile_at(self, x, y):
+      ct = self.chunk_tiles
+      cx, cy = x // ct, y // ct
+      return self._chunk(cx, cy).tile(x - cx * ct, y - cy * ct)
+
+   def _stitch(self, names, x0, y0, x1, y1):
+      # The named TileStore layers over a tile window, stitched from every chunk the
+      # window overlaps (loading them).
+      ct = self.chunk_tiles
+      w, h = x1 - x0, y1 - y0
+      out = None
+      window = [(cx, cy) for cx in range(x0 // ct, (x1 - 1) // ct + 1)
+                         for cy in range(y0 // ct, (y1 - 1) // ct + 1)]
+      for cx, cy in window:
+         grid = self._chunk(cx, cy, window)
+         ax0, ay0 = max(x0, cx * ct), max(y0, cy * ct)
+         ax1, ay1 = min(x1, (cx + 1) * ct), min(y1, (cy + 1) * ct)
+         src = (slice(ax0 - cx * ct, ax1 - cx * ct), slice(ay0 - cy * ct, ay1 - cy * ct))
+         dst = (slice(ax0 - x0, ax1 - x0), slice(ay0 - y0, ay1 - y0))
+         layers = [getattr(grid.store, name) for name in names]
+         if out is None:
+            out = [np.zeros((w, h), layer.dtype) for layer in layers]
+         for a, layer in zip(out, layers):
+            a[dst] = layer[src]
+      return out
+
+   def tile_layers(self, x0, y0, x1, y1):
+      # Like Map.tile_layers, over the loaded (or loading) chunks.
+      return tuple(self._stitch(("bg", "top", "obstacle"), x0, y0, x1, y1))
+
+   def tile_flags(self, x0, y0, x1, y1):
+      return self._stitch(("flags",), x0, y0, x1, y1)[0]
+
+   def is_walkable(self, x, y):
+      return self.get_tile_at(x, y).walkable
+
+   def mark_explored(self, tiles):
+      # Per chunk flags; a chunk that gained explored tiles is saved when it unloads.
+      ct = self.chunk_tiles
+      by_chunk = {}
+      for x, y in dict.fromkeys(tiles):
+         by_chunk.setdefault((x // ct, y // ct), []).append((x, y))
+      new = []
+      for (cx, cy), pts in by_chunk.items():
+         flags = self._chunk(cx, cy, by_chunk).store.flags
+         xs, ys = (np.array(pts, dtype=np.intp) - (cx * ct, cy * ct)).T
+         fresh = (flags[xs, ys] & EXPLORED) == 0
+         flags[xs, ys] |= EXPLORED
+         if fresh.any():
+            self.modified.add((cx, cy))
+            new += [p for p, f in zip(pts, fresh.tolist()) if f]
+      if self.explored_overlay:
+         self.explored_overlay.mark(new)
+      return new
+
+   def clear_explored(self):
+      for grid in self.loaded.values():
+         grid.store.flags &= ~EXPLORED & 0xFF
+      # Chunks saved to disk carry their flags with them
+      for cx, cy in self.on_disk - set(self.loaded):
+         path = self._chunk_path(cx, cy)
+         with np.load(path) as data:
+            obstacle, flags = data["obstacle"], data["flags"]
+         np.savez_compressed(path, obstacle=obstacle, flags=flags & (~EXPLORED & 0xFF))
+      if self.explored_overlay:
+         self.explored_overlay.invalidate_all()
+
+   def iter_tiles(self):
+      for grid in list(self.loaded.values()):
+         for col in grid:
+            yield from col
+
+   def screen_to_tile(self, mouse_pos):
+      mx, my = mouse_pos
+      tx = int((mx + self.camera_offset.x) / self.zoom_factor // self.tile_size)
+      ty = int((my + self.camera_offset.y) / self.zoom_factor // self.tile_size)
+      return (tx, ty)
+
+   def clamp_camera(self, sw, sh):
+      # No edges to clamp against.
+      pass
+
+   def _tile_changed(self, x, y, op=None, was_walkable=None):
+      super()._tile_changed(x, y, op, was_walkable)
+      ct = self.chunk_tiles
+      self.modified.add((x // ct, y // ct))
+
+   # ── generation / persistence ──────────────────────────────────────────────
+   def generate_map(self, *args, **kwargs):
+      # Chunks generate lazily; this only forgets everything produced so far.
+      for cx, cy in self.on_disk:
+         try:
+            os.remove(self._chunk_path(cx, cy))
+         except OSError:
+            pass
+      self.loaded.clear()
+      self.modified.clear()
+      self.on_disk.clear()
+      self._terrain_replaced()
+
+   def save_map(self, path="saved_map.json"):
+      # Flushes changed chunks into cache_dir and records where they live.
+      for cx, cy in list(self.modified):
+         self._save_chunk(cx, cy)
+      data = {
+         "seeds": [self._ex, self._ey, self._mx, self._my],
+         "chunk_tiles": self.chunk_tiles,
+         "cache_dir": os.path.abspath(self.cache_dir),
+         "chunks": sorted(self.on_disk),
+         **self._history(),
+      }
+      with open(path, "w") as f:
+         json.dump(data, f)
+
+   def load_map(self, path="saved_map.json"):
+      with open(path) as f:
+         data = json.load(f)
+      self._restore_history(data)
+      self._ex, self._ey, self._mx, self._my = data["seeds"]
+      self.chunk_tiles = data["chunk_tiles"]
+      self.cache_dir = data["cache_dir"]
+      self.loaded.clear()
+      self.modified.clear()
+      self.on_disk = {tuple(c) for c in data["chunks"]}
+      self.chunks = ChunkCache(self, chunk_tiles=self.chunk_tiles, bounded=False)
+      self._terrain_replaced()